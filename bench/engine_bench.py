@@ -0,0 +1,205 @@
+"""GameLoop 引擎基准：用固定策略的桩AI、零阶段时长跑完整对局，测量纯引擎开销。
+
+用法::
+
+    python -m bench.engine_bench                       # 12/50/200 人局各跑若干局并输出报告
+    python -m bench.engine_bench --save-baseline bench/baseline.json
+    python -m bench.engine_bench --baseline bench/baseline.json --tolerance 0.2
+
+指定 --baseline 时作为回归门禁：任一规模的 games/sec 比基线低超过 tolerance 即以非零状态退出。
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from config.game_config import AI_CONFIG, PHASE_CONFIG, ROLE_COOLDOWNS
+from core.engine.game_loop import GameLoop
+from services.game_state_store import GameStateStore
+from utils.logger import logger
+
+DEFAULT_SIZES = (12, 50, 200)
+# 各阶段处理函数，分别计时；其余开销（阶段切换、胜负判定等）计入 other
+_PHASE_HANDLERS = {
+    "night": "_handle_night_phase",
+    "discussion": "_handle_discussion_phase",
+    "vote": "_handle_vote_phase",
+}
+_ROUTER_METHODS = ("broadcast", "send_private", "send_team")
+
+
+class StubAIService:
+    """确定性的桩决策服务：狼人刀第一个非狼玩家，白天所有人投第一个非自己的存活玩家。
+
+    票型集中保证每天都有人出局，对局轮数随人数线性增长，便于横向比较。
+    """
+
+    def get_player_action(self, player_id, role, game_state, phase):
+        if game_state.get("action") in ("heal", "poison"):
+            return {"target_id": None}
+        alive = game_state["alive_players"]
+        if role == "werewolf":
+            players = game_state["players"]
+            targets = [pid for pid in alive if players[pid].role.get_role_name() != "werewolf"]
+        else:
+            targets = [pid for pid in alive if pid != player_id]
+        return {"target_id": targets[0] if targets else None}
+
+    def get_team_action(self, player_ids, role, game_state, phase):
+        targets = [pid for pid in game_state["alive_players"] if pid not in player_ids]
+        return {"target_id": targets[0] if targets else None}
+
+    def get_player_speech(self, player_id, role, game_state):
+        return f"{player_id} 过"
+
+    def stream_player_speech(self, player_id, role, game_state, on_delta):
+        speech = self.get_player_speech(player_id, role, game_state)
+        on_delta(speech)
+        return speech
+
+
+def role_distribution(size: int) -> Dict[str, int]:
+    """按人数缩放的角色配置：四分之一狼人，神职各一名，其余为村民。"""
+    werewolves = max(size // 4, 1)
+    specials = {"seer": 1, "witch": 1, "hunter": 1, "guard": 1} if size >= 8 else {}
+    return {"werewolf": werewolves, "villager": size - werewolves - len(specials), **specials}
+
+
+def build_config(size: int) -> Dict[str, Any]:
+    phase_config = deepcopy(PHASE_CONFIG)
+    for settings in phase_config.values():
+        settings["duration"] = 0
+    return {
+        "PHASE_CONFIG": phase_config,
+        "ROLE_COOLDOWNS": deepcopy(ROLE_COOLDOWNS),
+        "SEER_CONFIG": {"max_checks": 3, "allow_self_check": False},
+        "ROLE_DISTRIBUTION": role_distribution(size),
+        "WITCH_CONFIG": {"can_save_self": True},
+        "HUNTER_CONFIG": {"can_shoot_dead": True},
+        "GUARD_CONFIG": {"max_protects": 3},
+        "AI_CONFIG": dict(AI_CONFIG),
+        "SIMULATION_MODE": True,
+        "players": [f"player{i}" for i in range(1, size + 1)],
+    }
+
+
+def run_game(size: int, seed: int, *, with_store: bool, timings: Optional[Dict[str, float]] = None) -> GameLoop:
+    """跑完一局；传入 timings 时把各阶段与消息路由的耗时（秒）累加进去。"""
+    config = build_config(size)
+    config["RANDOM_SEED"] = seed
+    store = GameStateStore() if with_store else None
+    game = GameLoop(config, state_store=store, ai_service=StubAIService())
+    if timings is not None:
+        for name, method in _PHASE_HANDLERS.items():
+            setattr(game, method, _timed(getattr(game, method), timings, name))
+        for method in _ROUTER_METHODS:
+            router = game.message_router
+            setattr(router, method, _timed(getattr(router, method), timings, "router"))
+    game.initialize_game(config["players"])
+    game.run()
+    if store is not None:
+        store.finish_match(game.match_id, outcome=game.match_outcome())
+    return game
+
+
+def bench_size(size: int, games: int) -> Dict[str, Any]:
+    """对单个规模分别测量：有/无状态存储的吞吐、分阶段耗时与单局内存分配。"""
+    timings: Dict[str, float] = defaultdict(float)
+    rounds = 0
+    started = time.perf_counter()
+    for seed in range(games):
+        rounds += run_game(size, seed, with_store=True, timings=timings).game_state["round_number"]
+    with_store = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for seed in range(games):
+        run_game(size, seed, with_store=False)
+    without_store = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        run_game(size, 0, with_store=True)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    phase_total = sum(timings[name] for name in _PHASE_HANDLERS)
+    return {
+        "players": size,
+        "games": games,
+        "avg_rounds": rounds / games,
+        "games_per_sec": games / with_store,
+        "ms_per_game": with_store / games * 1000,
+        "phase_ms_per_game": {
+            **{name: timings[name] / games * 1000 for name in _PHASE_HANDLERS},
+            "other": max(with_store - phase_total, 0.0) / games * 1000,
+        },
+        "router_ms_per_game": timings["router"] / games * 1000,
+        "store_overhead_ms_per_game": (with_store - without_store) / games * 1000,
+        "peak_alloc_kb": peak / 1024,
+        "retained_alloc_kb": current / 1024,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """返回吞吐低于基线超过 tolerance 的规模说明，空列表表示通过。"""
+    regressions = []
+    for result in results:
+        expected = baseline.get(str(result["players"]), {}).get("games_per_sec")
+        if expected and result["games_per_sec"] < expected * (1 - tolerance):
+            regressions.append(
+                f"{result['players']}人局: {result['games_per_sec']:.2f} games/s，基线 {expected:.2f} games/s"
+            )
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="GameLoop 引擎基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="对局人数")
+    parser.add_argument("--games", type=int, default=5, help="每个规模跑的局数")
+    parser.add_argument("--baseline", type=Path, default=None, help="基线结果文件，超出容差视为回归")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的吞吐下降比例")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="把本次结果写为基线")
+    parser.add_argument("--verbose", action="store_true", help="保留引擎的逐阶段日志（会显著拖慢基准）")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if not args.verbose:
+        logger.logger.setLevel(logging.WARNING)
+
+    results = [bench_size(size, args.games) for size in args.sizes]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        baseline = {str(result["players"]): result for result in results}
+        args.save_baseline.write_text(json.dumps(baseline, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"性能回归: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def _timed(method: Callable[..., Any], timings: Dict[str, float], name: str) -> Callable[..., Any]:
+    def call(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timings[name] += time.perf_counter() - started
+
+    return call
+
+
+if __name__ == "__main__":
+    sys.exit(main())
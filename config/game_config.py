@@ -60,4 +60,37 @@ WEREWOLF_CONFIG = {
 
 GUARD_CONFIG = {
     'consecutive_protection': False  # 是否允许连续守护同一玩家
-} 
\ No newline at end of file
+}
+
+AI_CONFIG = {
+    'max_concurrency': 8,  # 同一阶段内并发发起的AI请求上限，1 表示串行
+    'wolf_pack_decision': False,  # 狼人夜晚是否合并为一次阵营决策请求
+    'stream_speech': True,  # 观战模式下流式写入发言，生成过程中即可看到内容
+}
+
+STORAGE_CONFIG = {
+    'journal_enabled': True,  # 观战模式下把对局变更追加写入日志，重启后自动恢复
+    'journal_dir': 'logs/journal',  # 相对项目根目录
+    'journal_fsync': 'interval',  # always / interval / never
+    'journal_fsync_interval': 1.0,  # interval 策略下两次 fsync 的最小间隔（秒）
+    # 驻留内存的对局上限，超出后把最久未访问的已结束对局换出到存档目录，None 表示不限
+    'max_resident_matches': 20,
+    'max_resident_entries': 100000,  # 驻留对局的日志条目总数上限
+    'archive_enabled': False,  # 对局结束后写入 SQLite 归档，开启后提供 /api/archive/* 查询接口
+    'archive_path': 'logs/archive.sqlite3',  # 相对项目根目录
+    'save_format': 'jsonl.gz',  # 手动存档格式：json（缩进排版）或 jsonl.gz（压缩，逐条日志一行）
+}
+
+CONTROLLER_CONFIG = {
+    'max_concurrent_games': 4,  # 观战模式下同时运行的对局上限，1 表示一次只跑一局
+    'max_finished_games': 256,  # 控制器保留状态的已结束对局数，超出后丢弃最早结束的
+}
+
+WEB_CONFIG = {
+    'server': 'waitress',  # dev（Flask开发服务器）或 waitress（多线程生产服务器，需安装 waitress）
+    'threads': 32,  # waitress 工作线程数，每条 SSE 推送连接会占用一个线程
+    'compress_min_size': 1024,  # 响应体不小于该字节数时 gzip 压缩，None 表示关闭压缩
+    'sse_max_duration': 300.0,  # 单条 SSE 连接最长保持秒数，到期后浏览器自动重连；None 表示不限
+    # 同时打开的 SSE 连接上限，启动时不超过 threads-8，为控制接口留出工作线程；超出的观众退回轮询
+    'sse_max_streams': 24,
+}
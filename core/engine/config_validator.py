@@ -55,7 +55,8 @@ class ConfigValidator:
                 f"角色数量({total_roles})与玩家数量({len(players)})不匹配"
             )
             
-        # 验证阶段配置
+        # 验证阶段配置（模拟模式不等待阶段时长，允许为0）
+        simulation_mode = bool(config.get('SIMULATION_MODE', False))
         phase_config = config['PHASE_CONFIG']
         required_phases = [GamePhase.DAY_DISCUSSION, GamePhase.DAY_VOTE, GamePhase.NIGHT]
         for phase in required_phases:
@@ -64,7 +65,9 @@ class ConfigValidator:
             phase_settings = phase_config[phase]
             if 'duration' not in phase_settings:
                 raise ValueError(f"阶段 {phase.name} 缺少持续时间配置")
-            if phase_settings['duration'] <= 0:
+            if simulation_mode and phase_settings['duration'] < 0:
+                raise ValueError(f"阶段 {phase.name} 的持续时间不能为负数")
+            if not simulation_mode and phase_settings['duration'] <= 0:
                 raise ValueError(f"阶段 {phase.name} 的持续时间必须大于0")
                 
         # 验证角色冷却时间
@@ -91,5 +94,11 @@ class ConfigValidator:
             guard_config = config['GUARD_CONFIG']
             if 'max_protects' in guard_config and guard_config['max_protects'] <= 0:
                 raise ValueError("守卫最大守护次数必须大于0")
-                
+
+        if 'AI_CONFIG' in config:
+            ai_config = config['AI_CONFIG']
+            concurrency = ai_config.get('max_concurrency', 1)
+            if not isinstance(concurrency, int) or concurrency < 1:
+                raise ValueError("AI最大并发数必须是大于0的整数")
+
         return True  # 所有检查通过 
\ No newline at end of file
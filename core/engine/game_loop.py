@@ -1,8 +1,11 @@
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
 from threading import Event, Lock, Thread
+from uuid import uuid4
 from typing import Dict, Any, List, Tuple, Optional, Callable
 from core.engine.phase_manager import PhaseManager, GamePhase
+from core.engine.roster import AliveRoster
 from modules.roles.role_factory import RoleFactory
 from modules.roles.cupid import Cupid
 from core.engine.victory_checker import Team
@@ -21,12 +24,17 @@ from services.game_state_store import GameStateStore
 
 class GameLoop:
     """游戏核心循环"""
-    def __init__(self, config: Dict[str, Any], state_store: Optional[GameStateStore] = None):
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        state_store: Optional[GameStateStore] = None,
+        ai_service: Optional[AIDecisionService] = None,
+    ):
         ConfigValidator.validate(config)  # 验证配置
         self.phase_manager = PhaseManager()
         self.players: Dict[str, Player] = {}
         self.game_state = {
-            'alive_players': [],
+            'alive_players': AliveRoster(),  # 存活名册，按座位排序并按角色建索引
             'dead_players': [],
             'current_phase': None,
             'day_number': 0,
@@ -35,15 +43,23 @@ class GameLoop:
             'config': config,  # 添加配置到游戏状态
             'players': {},  # 添加玩家字典引用
             'speech_history': [],  # 添加发言历史记录
+            'speech_archive': [],  # 往轮发言，用于生成上下文摘要
             'match_id': None,
         }
         self.pending_actions: List[Any] = []  # 待处理动作队列
         self.message_router = MessageRouter()
         self.config = config
         self.vote_manager = VoteManager()  # 添加投票管理器
-        self.ai_service = AIDecisionService()  # 初始化AI服务
+        self.ai_service = ai_service or AIDecisionService()  # 初始化AI服务，可由控制器跨对局共享
+        self.ai_concurrency = config.get('AI_CONFIG', {}).get('max_concurrency', 1)
+        self.simulation_mode = bool(config.get('SIMULATION_MODE', False))  # 模拟模式下阶段处理完立即推进
+        # 未指定种子时随机生成一个，种子随对局数据保存，按同一种子重跑即可复现角色分配，便于回放
+        seed = config.get('RANDOM_SEED')
+        self.seed: int = random.SystemRandom().randrange(2 ** 32) if seed is None else int(seed)
+        self.rng = random.Random(self.seed)  # 对局内所有随机选择都使用该随机数生成器
         self.state_store = state_store
         self.match_id: Optional[str] = None
+        self.winner: Optional[Team] = None
         self._pause_event = Event()
         self._stop_event = Event()
         self._status_lock = Lock()
@@ -110,6 +126,8 @@ class GameLoop:
         try:
             self.run()
         finally:
+            if self.state_store and self.match_id:
+                self.state_store.finish_match(self.match_id, outcome=self.match_outcome())
             callback = None
             with self._status_lock:
                 callback = self._on_finish
@@ -118,6 +136,14 @@ class GameLoop:
             if callback:
                 callback()
 
+    def match_outcome(self) -> Dict[str, Any]:
+        """对局结果：胜利阵营以及每名玩家的角色与最终阵营。"""
+        return {
+            "winner": self.winner.name if self.winner else None,
+            "roles": {pid: type(player.role).__name__.lower() for pid, player in self.players.items()},
+            "teams": {pid: player.role.team.name for pid, player in self.players.items()},
+        }
+
     def _prepare_for_run(self) -> None:
         with self._status_lock:
             self._stop_event.clear()
@@ -153,6 +179,11 @@ class GameLoop:
                 lambda message, ch=channel: self._handle_router_message(ch, message),
             )
 
+    @property
+    def roster(self) -> AliveRoster:
+        """存活名册，即 game_state['alive_players']。"""
+        return self.game_state['alive_players']
+
     def _handle_router_message(self, channel: str, message: Dict[str, Any]) -> None:
         if not self.state_store:
             return
@@ -174,6 +205,7 @@ class GameLoop:
             round_number=round_number,
             phase=phase,
             metadata=metadata_to_store,
+            match_id=self.match_id,
         )
 
     def initialize_game(self, players: list):
@@ -182,7 +214,7 @@ class GameLoop:
         logger.info("游戏初始化开始")
         
         # 初始化玩家列表
-        self.game_state['alive_players'] = players.copy()
+        self.game_state['alive_players'] = AliveRoster(players)
         
         # 分配角色
         for player_id in players:
@@ -191,15 +223,19 @@ class GameLoop:
             role = RoleFactory.create_role(role_name, player_id, self.config)
             role.set_game_state(self.game_state)  # 设置游戏状态
             self.players[player_id] = Player(player_id, role)
+            self.roster.assign_role(player_id, type(role))
             logger.role_reveal(player_id, role_name)
             
         # 更新游戏状态中的玩家引用
         self.game_state['players'] = self.players
 
         if self.state_store:
-            self.match_id = self.state_store.start_match(players)
-            self.game_state['match_id'] = self.match_id
+            self.match_id = self.state_store.start_match(players, seed=self.seed)
             self._sync_store_players()
+        else:
+            self.match_id = uuid4().hex
+        self.game_state['match_id'] = self.match_id
+        logger.info(f"对局 {self.match_id} 随机种子: {self.seed}")
             
         # 注册到胜利检查器
         for player in self.players.values():
@@ -266,7 +302,8 @@ class GameLoop:
                 if self.state_store:
                     self.state_store.set_phase(
                         getattr(current_phase, "name", str(current_phase)),
-                        self.game_state['round_number']
+                        self.game_state['round_number'],
+                        match_id=self.match_id,
                     )
             
                 # 更新所有存活角色的技能冷却
@@ -315,6 +352,7 @@ class GameLoop:
                 # 检查游戏是否结束
                 if self.phase_manager.check_victory():
                     winner = self.phase_manager.victory_checker.get_winner()
+                    self.winner = winner
                     logger.info(f"游戏结束！胜利阵营：{winner}")
                     logger.info(f"存活玩家: {', '.join(self.game_state['alive_players'])}")
                     break
@@ -325,7 +363,7 @@ class GameLoop:
                     break
 
                 # 等待阶段时间
-                if phase_info['duration'] > 0:
+                if phase_info['duration'] > 0 and not self.simulation_mode:
                     self._sleep_with_control(phase_info['duration'])
                     if self._stop_event.is_set():
                         break
@@ -362,21 +400,35 @@ class GameLoop:
         self.game_state['night_deaths'] = set()
         
         # 狼人行动
-        werewolves = [p for p in self.game_state['alive_players'] if isinstance(self.players[p].role, Werewolf)]
+        werewolves = self.roster.with_role(Werewolf)
         if werewolves:
             logger.info("=== 狼人请睁眼，选择你要击杀的目标 ===")
-            # 让每个狼人选择目标
             targets = {}
-            for wolf_id in werewolves:
-                decision = self.ai_service.get_player_action(
-                    wolf_id,
+            if self.config.get('AI_CONFIG', {}).get('wolf_pack_decision', False):
+                # 狼队统一商议，只发起一次请求
+                decision = self.ai_service.get_team_action(
+                    werewolves,
                     'werewolf',
                     self.game_state,
                     'NIGHT'
                 )
-                target_id = decision.get('target_id')
-                if target_id:
-                    targets[wolf_id] = target_id
+                if decision.get('target_id'):
+                    targets[werewolves[0]] = decision['target_id']
+            else:
+                # 让每个狼人并发选择目标
+                decisions = self._collect_ai_results(
+                    werewolves,
+                    lambda wolf_id: self.ai_service.get_player_action(
+                        wolf_id,
+                        'werewolf',
+                        self.game_state,
+                        'NIGHT'
+                    ),
+                )
+                for wolf_id in werewolves:
+                    target_id = decisions[wolf_id].get('target_id')
+                    if target_id:
+                        targets[wolf_id] = target_id
             logger.info("=== 狼人请闭眼 ===")
             
             # 统计投票结果
@@ -385,14 +437,13 @@ class GameLoop:
                 vote_count = Counter(targets.values())
                 # 获取票数最多的目标
                 target_id = max(vote_count.items(), key=lambda x: x[1])[0]
-                if not any(isinstance(self.players[p].role, Guard) and 
-                          self.players[p].role.last_protected == target_id 
-                          for p in self.game_state['alive_players']):
+                if not any(self.players[p].role.last_protected == target_id
+                           for p in self.roster.with_role(Guard)):
                     self.game_state['night_deaths'].add(target_id)
                     logger.info(f"狼人选择了 {target_id}")
         
         # 女巫行动
-        witches = [p for p in self.game_state['alive_players'] if isinstance(self.players[p].role, Witch)]
+        witches = self.roster.with_role(Witch)
         for witch_id in witches:
             logger.info("=== 女巫请睁眼 ===")
             witch = self.players[witch_id].role
@@ -428,7 +479,7 @@ class GameLoop:
             logger.info("=== 女巫请闭眼 ===")
         
         # 守卫行动
-        guards = [p for p in self.game_state['alive_players'] if isinstance(self.players[p].role, Guard)]
+        guards = self.roster.with_role(Guard)
         for guard_id in guards:
             logger.info("=== 守卫请睁眼，选择要守护的对象 ===")
             decision = self.ai_service.get_player_action(
@@ -448,7 +499,7 @@ class GameLoop:
             logger.info("=== 守卫请闭眼 ===")
         
         # 预言家行动
-        seers = [p for p in self.game_state['alive_players'] if isinstance(self.players[p].role, Seer)]
+        seers = self.roster.with_role(Seer)
         for seer_id in seers:
             logger.info("=== 预言家请睁眼，选择要查验的对象 ===")
             target_id = self._get_seer_target(seer_id)
@@ -483,8 +534,7 @@ class GameLoop:
                 if hasattr(self.players[player_id].role, 'handle_death'):
                     self.players[player_id].role.handle_death(self)
                 # 从存活列表移除
-                if player_id in self.game_state['alive_players']:
-                    self.game_state['alive_players'].remove(player_id)
+                if self.roster.discard(player_id):
                     self.game_state['dead_players'].append(player_id)
                 # 通知胜利检查器
                 self.phase_manager.victory_checker.remove_player(player_id)
@@ -496,8 +546,7 @@ class GameLoop:
                 if hasattr(self.players[player_id].role, 'handle_death'):
                     self.players[player_id].role.handle_death(self)
                 # 从存活列表移除
-                if player_id in self.game_state['alive_players']:
-                    self.game_state['alive_players'].remove(player_id)
+                if self.roster.discard(player_id):
                     self.game_state['dead_players'].append(player_id)
                 # 通知胜利检查器
                 self.phase_manager.victory_checker.remove_player(player_id)
@@ -529,7 +578,8 @@ class GameLoop:
         if self.state_store:
             self.state_store.update_players(
                 self.game_state['alive_players'],
-                self.game_state['dead_players']
+                self.game_state['dead_players'],
+                match_id=self.match_id,
             )
 
     def _get_stealable_roles(self) -> list:
@@ -546,7 +596,7 @@ class GameLoop:
                 available_roles = self._get_stealable_roles()
                 if available_roles:
                     # 随机选择一个可用角色
-                    new_role = random.choice(available_roles)
+                    new_role = self.rng.choice(available_roles)
                     self._reassign_role(thief.id, new_role)
                     logger.game_event(
                         "THIEF_TIMEOUT",
@@ -560,6 +610,7 @@ class GameLoop:
         self.phase_manager.victory_checker.remove_player(player_id)
         # 创建新角色并注册
         self.players[player_id].role = RoleFactory.create_role(new_role, player_id, self.config)
+        self.roster.assign_role(player_id, type(self.players[player_id].role))
         self.phase_manager.victory_checker.register_player(
             player_id, 
             self.players[player_id].role.team
@@ -578,40 +629,69 @@ class GameLoop:
         """处理讨论阶段"""
         logger.info("进入讨论阶段")
         
-        # 清空当前轮次的发言历史
+        # 归档上一轮发言后清空当前轮次的发言历史
+        self.game_state['speech_archive'].extend(self.game_state['speech_history'])
         self.game_state['speech_history'] = []
         
+        stream_speech = bool(self.config.get('AI_CONFIG', {}).get('stream_speech', False))
+
         # 让每个存活的玩家发言
         for player_id in self.game_state['alive_players']:
-            speech = self.ai_service.get_player_speech(
-                player_id,
-                type(self.players[player_id].role).__name__.lower(),
-                self.game_state
+            role_name = type(self.players[player_id].role).__name__.lower()
+            phase_name = getattr(
+                self.game_state['current_phase'],
+                "name",
+                str(self.game_state['current_phase'])
             )
+            if stream_speech and self.state_store:
+                speech = self._stream_speech(player_id, role_name, phase_name)
+            else:
+                speech = self.ai_service.get_player_speech(
+                    player_id,
+                    role_name,
+                    self.game_state
+                )
+                if speech and self.state_store:
+                    self.state_store.record_speech(
+                        player_id=player_id,
+                        role=role_name,
+                        content=speech,
+                        round_number=self.game_state['round_number'],
+                        phase=phase_name,
+                        match_id=self.match_id,
+                    )
             if speech:
                 # 记录发言
                 self.game_state['speech_history'].append({
                     'player_id': player_id,
-                    'role': type(self.players[player_id].role).__name__.lower(),
+                    'role': role_name,
                     'content': speech,
                     'round': self.game_state['round_number']
                 })
-                if self.state_store:
-                    self.state_store.record_speech(
-                        player_id=player_id,
-                        role=type(self.players[player_id].role).__name__.lower(),
-                        content=speech,
-                        round_number=self.game_state['round_number'],
-                        phase=getattr(
-                            self.game_state['current_phase'],
-                            "name",
-                            str(self.game_state['current_phase'])
-                        ),
-                    )
                 logger.info(f"{player_id} 说: {speech}")
 
         logger.info("讨论阶段结束，准备进入投票阶段")
         
+    def _stream_speech(self, player_id: str, role_name: str, phase_name: str) -> Optional[str]:
+        """流式生成发言，边生成边写入状态存储供观战端实时展示"""
+        entry_index = self.state_store.begin_speech(
+            player_id=player_id,
+            role=role_name,
+            round_number=self.game_state['round_number'],
+            phase=phase_name,
+            match_id=self.match_id,
+        )
+        if entry_index is None:
+            return self.ai_service.get_player_speech(player_id, role_name, self.game_state)
+        speech = self.ai_service.stream_player_speech(
+            player_id,
+            role_name,
+            self.game_state,
+            on_delta=lambda text: self.state_store.update_speech(entry_index, text, match_id=self.match_id),
+        )
+        self.state_store.update_speech(entry_index, speech or "", final=True, match_id=self.match_id)
+        return speech
+
     def _handle_vote_phase(self):
         """处理投票阶段"""
         logger.info("=== 投票阶段开始 ===")
@@ -620,9 +700,11 @@ class GameLoop:
         self.vote_manager.reset()
         self.game_state['day_deaths'] = set()
         
-        # 收集所有玩家的投票
-        for voter_id in self.game_state['alive_players']:
-            target_id = self._get_vote_target(voter_id)
+        # 并发收集所有玩家的投票，再按座位顺序计票
+        voters = list(self.game_state['alive_players'])
+        vote_targets = self._collect_ai_results(voters, self._get_vote_target)
+        for voter_id in voters:
+            target_id = vote_targets[voter_id]
             if target_id:
                 self.vote_manager.cast_vote(voter_id, target_id)
                 logger.info(f"{voter_id} 投票给了 {target_id}")
@@ -682,6 +764,27 @@ class GameLoop:
         
         logger.info("=== 投票阶段结束 ===")
 
+    def _collect_ai_results(
+        self,
+        player_ids: List[str],
+        fetch: Callable[[str], Any],
+    ) -> Dict[str, Any]:
+        """为多名玩家获取AI结果，按 max_concurrency 限制并发
+
+        Args:
+            player_ids: 玩家ID列表，结果按此顺序返回
+            fetch: 针对单个玩家发起AI请求的函数
+
+        Returns:
+            Dict[str, Any]: 玩家ID -> AI结果
+        """
+        workers = min(self.ai_concurrency, len(player_ids))
+        if workers <= 1:
+            return {player_id: fetch(player_id) for player_id in player_ids}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-decision") as executor:
+            results = list(executor.map(fetch, player_ids))
+        return dict(zip(player_ids, results))
+
     def _get_seer_target(self, seer_id: str) -> Optional[str]:  
         """获取预言家的查验目标"""
         decision = self.ai_service.get_player_action(
@@ -725,7 +828,7 @@ class GameLoop:
         available_roles = []
         for role, count in role_dist.items():
             available_roles.extend([role] * count)
-        random.shuffle(available_roles)
+        self.rng.shuffle(available_roles)
         return available_roles
         
     def _assign_role(self, player_id: str) -> str:
@@ -741,10 +844,8 @@ class GameLoop:
             player_id: 死亡玩家ID
             reason: 死亡原因
         """
-        if player_id in self.game_state['alive_players']:
-            # 从存活列表移除
-            self.game_state['alive_players'].remove(player_id)
-            # 添加到死亡列表
+        if self.roster.discard(player_id):
+            # 已从存活名册移除，添加到死亡列表
             self.game_state['dead_players'].append(player_id)
             # 通知胜利检查器
             self.phase_manager.victory_checker.remove_player(player_id)
@@ -0,0 +1,102 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Type, Union, overload
+
+
+class AliveRoster(Sequence[str]):
+    """存活玩家名册：按座位顺序排列的有序集合，附带按角色类型划分的索引。
+
+    作为 game_state['alive_players'] 使用，兼容原来的列表读法（迭代、下标、len、in、join），
+    但成员判断与移除是 O(1)，按角色取存活玩家不再需要每晚对全体玩家做 isinstance 扫描。
+    下标访问与迭代基于按需重建的顺序快照，迭代过程中有玩家死亡也不会出错。
+    """
+
+    def __init__(self, players: Iterable[str] = ()) -> None:
+        self._seats: Dict[str, int] = {}  # 玩家ID -> 座位号，也充当有序的存活集合
+        self._roles: Dict[str, type] = {}  # 存活玩家ID -> 角色类型
+        self._by_role: Dict[type, Dict[str, None]] = {}  # 角色类型 -> 该角色的存活玩家（座位顺序）
+        self._order: Optional[List[str]] = None
+        for seat, player_id in enumerate(players):
+            self._seats[player_id] = seat
+
+    # ------------------------------------------------------------------
+    # 列表兼容接口
+    # ------------------------------------------------------------------
+
+    def __contains__(self, player_id: object) -> bool:
+        return player_id in self._seats
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ordered())
+
+    def __len__(self) -> int:
+        return len(self._seats)
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        return self._ordered()[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (AliveRoster, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"AliveRoster({self._ordered()!r})"
+
+    def index(self, player_id: str, start: int = 0, stop: Optional[int] = None) -> int:
+        return self._ordered().index(player_id, start, len(self) if stop is None else stop)
+
+    def copy(self) -> List[str]:
+        return list(self._ordered())
+
+    def remove(self, player_id: str) -> None:
+        """与 list.remove 一致，玩家不在名册中时抛出 ValueError。"""
+        if player_id not in self._seats:
+            raise ValueError(f"{player_id} 不在存活名册中")
+        self.discard(player_id)
+
+    # ------------------------------------------------------------------
+    # 名册维护与角色索引
+    # ------------------------------------------------------------------
+
+    def discard(self, player_id: str) -> bool:
+        """移除存活玩家并同步角色索引，返回玩家此前是否存活。"""
+        if self._seats.pop(player_id, None) is None:
+            return False
+        role_type = self._roles.pop(player_id, None)
+        if role_type is not None:
+            self._by_role[role_type].pop(player_id, None)
+        self._order = None
+        return True
+
+    def assign_role(self, player_id: str, role_type: type) -> None:
+        """登记（或在盗贼换角色后更新）存活玩家的角色类型。"""
+        if player_id not in self._seats:
+            return
+        previous = self._roles.get(player_id)
+        if previous is role_type:
+            return
+        if previous is not None:
+            self._by_role[previous].pop(player_id, None)
+        self._roles[player_id] = role_type
+        bucket = self._by_role.setdefault(role_type, {})
+        bucket[player_id] = None
+        if previous is not None and len(bucket) > 1:
+            # 换角色的玩家追加在末尾，重排以保持座位顺序
+            self._by_role[role_type] = dict.fromkeys(sorted(bucket, key=self._seats.__getitem__))
+
+    def with_role(self, role_type: Type) -> List[str]:
+        """按座位顺序返回角色为 role_type（含其子类）的存活玩家。"""
+        buckets = [bucket for cls, bucket in self._by_role.items() if issubclass(cls, role_type) and bucket]
+        if len(buckets) == 1:
+            return list(buckets[0])
+        return sorted((pid for bucket in buckets for pid in bucket), key=self._seats.__getitem__)
+
+    def _ordered(self) -> List[str]:
+        if self._order is None:
+            self._order = list(self._seats)
+        return self._order
@@ -1,3 +1,4 @@
+from collections import Counter
 from enum import Enum, auto
 from typing import Dict, Set, Optional
 
@@ -10,11 +11,19 @@ class Team(Enum):
     NEUTRAL = auto()  # 中立阵营
 
 class VictoryChecker:
-    """胜利条件检查器"""
+    """胜利条件检查器
+
+    各阵营存活人数在注册、死亡、改阵营时增量维护，胜负判定为 O(1)；
+    判定结果缓存到下一次名册变化为止，每个阶段重复检查不会重复计算。
+    """
+    _UNCHECKED = object()  # 缓存失效标记（None 是合法结果：尚无阵营胜利）
+
     def __init__(self):
         self.players: Dict[str, Team] = {}  # 玩家ID -> 阵营
         self.alive_players: Set[str] = set()  # 存活玩家ID集合
         self.dead_players: Set[str] = set()   # 死亡玩家ID集合
+        self._alive_counts: Counter = Counter()  # 阵营 -> 存活人数
+        self._cached_winner = self._UNCHECKED
         
     def register_player(self, player_id: str, team: Team):
         """注册玩家及其阵营
@@ -23,8 +32,14 @@ class VictoryChecker:
             player_id: 玩家ID
             team: 玩家所属阵营
         """
+        if player_id in self.alive_players:
+            # 重复注册（如成为情侣）等同于改阵营
+            self._alive_counts[self.players[player_id]] -= 1
         self.players[player_id] = team
         self.alive_players.add(player_id)
+        self.dead_players.discard(player_id)
+        self._alive_counts[team] += 1
+        self._cached_winner = self._UNCHECKED
         
     def remove_player(self, player_id: str):
         """移除玩家（死亡）
@@ -35,6 +50,8 @@ class VictoryChecker:
         if player_id in self.alive_players:
             self.alive_players.remove(player_id)
             self.dead_players.add(player_id)
+            self._alive_counts[self.players[player_id]] -= 1
+            self._cached_winner = self._UNCHECKED
             
     def get_alive_players(self) -> Set[str]:
         """获取存活玩家列表"""
@@ -53,17 +70,31 @@ class VictoryChecker:
         Returns:
             Optional[Team]: 胜利阵营，如果没有胜利则返回None
         """
-        # 统计存活玩家阵营
-        alive_teams = {
-            team: sum(1 for pid in self.alive_players if self.players[pid] == team)
-            for team in Team
-        }
+        if self._cached_winner is self._UNCHECKED:
+            self._cached_winner = self._check_team_victory()
+        if self._cached_winner is not None:
+            return self._cached_winner
+            
+        # 中立阵营胜利条件（如果有配置），取决于传入的配置，不进缓存
+        if game_state and 'NEUTRAL_VICTORY_CONDITIONS' in game_state['config']:
+            neutral_config = game_state['config']['NEUTRAL_VICTORY_CONDITIONS']
+            neutral_count = self._alive_counts[Team.NEUTRAL]
+            
+            # 检查存活人数是否达到要求
+            if neutral_count >= neutral_config['min_players']:
+                # 检查存活率是否达到要求
+                total_alive = len(self.alive_players)
+                if neutral_count / total_alive >= neutral_config['required_survival_rate']:
+                    return Team.NEUTRAL
+                    
+        return None  # 没有阵营达成胜利条件
+
+    def _check_team_victory(self) -> Optional[Team]:
+        """按各阵营存活人数判定情侣、狼人、好人胜利。"""
+        alive_teams = self._alive_counts
         
         # 情侣胜利条件：所有情侣存活且其他玩家全部死亡
-        if alive_teams[Team.LOVERS] >= 2 and sum(
-            count for team, count in alive_teams.items()
-            if team != Team.LOVERS
-        ) == 0:
+        if alive_teams[Team.LOVERS] >= 2 and len(self.alive_players) == alive_teams[Team.LOVERS]:
             return Team.LOVERS
             
         # 狼人胜利条件：狼人数量大于等于好人数量
@@ -75,20 +106,7 @@ class VictoryChecker:
         # 好人胜利条件：所有狼人死亡且有好人存活
         if werewolf_count == 0 and villager_count > 0:
             return Team.VILLAGER
-            
-        # 中立阵营胜利条件（如果有配置）
-        if game_state and 'NEUTRAL_VICTORY_CONDITIONS' in game_state['config']:
-            neutral_config = game_state['config']['NEUTRAL_VICTORY_CONDITIONS']
-            neutral_count = alive_teams[Team.NEUTRAL]
-            
-            # 检查存活人数是否达到要求
-            if neutral_count >= neutral_config['min_players']:
-                # 检查存活率是否达到要求
-                total_alive = sum(alive_teams.values())
-                if neutral_count / total_alive >= neutral_config['required_survival_rate']:
-                    return Team.NEUTRAL
-                    
-        return None  # 没有阵营达成胜利条件
+        return None
         
     def get_winner(self) -> Optional[Team]:
         """获取胜利阵营"""
@@ -127,4 +145,8 @@ class VictoryChecker:
             new_team: 新阵营
         """
         if player_id in self.players:
+            if player_id in self.alive_players:
+                self._alive_counts[self.players[player_id]] -= 1
+                self._alive_counts[new_team] += 1
+                self._cached_winner = self._UNCHECKED
             self.players[player_id] = new_team 
\ No newline at end of file
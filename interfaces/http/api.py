@@ -1,37 +1,139 @@
 from __future__ import annotations
 
+import gzip
+import json
+import time
 from pathlib import Path
-from typing import Optional
+from threading import Lock
+from typing import Any, Callable, Iterator, Optional
+from uuid import uuid4
 
-from flask import Flask, abort, jsonify, send_from_directory, request
+from flask import Flask, Response, abort, jsonify, send_from_directory, request
 
 from services.game_state_store import GameStateStore
+from services.match_archive import MatchArchive
+from utils.logger import logger
+
+SERVERS = {"dev", "waitress"}
+_COMPRESSIBLE_MIMETYPES = {"application/json", "text/html", "text/css", "application/javascript"}
 
 
 def create_app(
     state_store: GameStateStore,
     static_dir: Path,
     controller: Optional["GameController"] = None,
+    archive: Optional[MatchArchive] = None,
+    *,
+    compress_min_size: Optional[int] = None,
+    compress_level: int = 5,
+    sse_max_duration: Optional[float] = None,
+    sse_max_streams: Optional[int] = None,
 ) -> Flask:
-    """构建用于观战的Flask应用。"""
+    """构建用于观战的Flask应用。
+
+    compress_min_size 不为空时，对不小于该字节数的响应按 Accept-Encoding 做 gzip 压缩；
+    sse_max_duration 限制单条推送连接的时长，到期后由浏览器带 Last-Event-ID 自动重连；
+    sse_max_streams 限制同时打开的推送连接数，超出时返回 503，前端退回轮询，
+    保证线程池中始终留有处理控制接口的工作线程。
+    """
     app = Flask(__name__, static_folder=str(static_dir), static_url_path="")
+    # 版本号在进程重启后会从头计数，附加实例标识避免命中重启前缓存的旧响应
+    etag_prefix = uuid4().hex[:8]
+    stream_lock = Lock()
+    open_streams = 0
+
+    if compress_min_size is not None:
+        @app.after_request
+        def compress(response: Response) -> Response:
+            return _compress_response(response, compress_min_size, compress_level)
 
     @app.get("/api/matches")
     def list_matches():
-        return jsonify({"matches": state_store.list_matches()})
+        try:
+            limit = _int_arg("limit", 50)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        filters = {
+            key: request.args.get(key)
+            for key in ("cursor", "status", "phase", "created_after", "created_before")
+        }
+
+        # 查询参数属于URL的一部分，同一URL下列表版本号即可区分内容
+        try:
+            return _conditional_json(
+                f"{etag_prefix}-{state_store.catalog_version()}",
+                lambda: state_store.page_matches(limit=min(max(limit, 1), 500), **filters),
+            )
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
 
     @app.get("/api/matches/<match_id>/speech-log")
     def speech_log(match_id: str):
-        match = state_store.get_match(match_id)
-        if match is None:
+        after = request.args.get("after")
+        after_seq: Optional[int] = None
+        if after is not None:
+            try:
+                after_seq = int(after)
+            except ValueError:
+                return jsonify({"error": "after 必须是整数"}), 400
+        version = state_store.match_version(match_id)
+        if version is None:
+            abort(404)
+
+        def build() -> Any:
+            payload = (
+                state_store.get_match(match_id)
+                if after_seq is None
+                else state_store.get_log_since(match_id, after_seq)
+            )
+            if payload is None:
+                abort(404)
+            return payload
+
+        return _conditional_json(f"{etag_prefix}-{version}", build)
+
+    @app.get("/api/matches/<match_id>/events")
+    def match_events(match_id: str):
+        # 断线重连时浏览器会带上 Last-Event-ID，从该序号之后继续推送
+        last_event_id = request.headers.get("Last-Event-ID") or request.args.get("after") or "0"
+        try:
+            after_seq = int(last_event_id)
+        except ValueError:
+            return jsonify({"error": "Last-Event-ID 必须是整数"}), 400
+        if state_store.get_log_since(match_id, after_seq) is None:
             abort(404)
-        return jsonify(match)
+        nonlocal open_streams
+        with stream_lock:
+            if sse_max_streams is not None and open_streams >= sse_max_streams:
+                response = jsonify({"error": "推送连接数已达上限，请改用轮询"})
+                response.status_code = 503
+                response.headers["Retry-After"] = "30"
+                return response
+            open_streams += 1
+        released = False
+
+        def release() -> None:
+            nonlocal open_streams, released
+            with stream_lock:
+                if not released:
+                    released = True
+                    open_streams -= 1
+
+        response = Response(
+            _sse_stream(state_store, match_id, after_seq, max_duration=sse_max_duration),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(release)
+        return response
 
     @app.get("/api/game/status")
     def game_status():
         if controller is None:
             return jsonify({"error": "游戏控制器未启用"}), 503
-        return jsonify(controller.get_status())
+        version = controller.status_version()
+        etag = f"{etag_prefix}-{version}" if version is not None else None
+        return _conditional_json(etag, controller.get_status)
 
     @app.post("/api/game/start")
     def game_start():
@@ -41,8 +143,11 @@ def create_app(
         players = payload.get("players")
         if players is not None and not isinstance(players, list):
             return jsonify({"error": "players 字段必须是数组"}), 400
+        seed = payload.get("seed")
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+            return jsonify({"error": "seed 字段必须是整数"}), 400
         try:
-            result = controller.start(players=players)
+            result = controller.start(players=players, seed=seed)
             return jsonify(result)
         except (RuntimeError, ValueError) as exc:
             return jsonify({"error": str(exc)}), 400
@@ -74,9 +179,55 @@ def create_app(
         payload = request.get_json(silent=True) or {}
         filename = payload.get("filename")
         try:
-            result = controller.save(filename=filename)
+            result = controller.save(filename=filename, match_id=payload.get("match_id"))
             return jsonify(result)
-        except (RuntimeError, FileNotFoundError) as exc:
+        except (RuntimeError, FileNotFoundError, ValueError) as exc:
+            return jsonify({"error": str(exc)}), 400
+
+    @app.get("/api/games")
+    def games_list():
+        if controller is None:
+            return jsonify({"error": "游戏控制器未启用"}), 503
+        status = controller.get_status()
+        return jsonify(
+            {
+                "games": controller.list_games(),
+                "running_games": status["running_games"],
+                "max_concurrent_games": status["max_concurrent_games"],
+            }
+        )
+
+    @app.get("/api/ai/prefix-reuse")
+    def ai_prefix_reuse():
+        if controller is None:
+            return jsonify({"error": "游戏控制器未启用"}), 503
+        return jsonify({"kinds": controller.prefix_reuse_stats()})
+
+    @app.get("/api/games/<match_id>/status")
+    def game_status_by_match(match_id: str):
+        if controller is None:
+            return jsonify({"error": "游戏控制器未启用"}), 503
+        try:
+            controller.get_status(match_id)
+        except KeyError:
+            abort(404)
+        version = controller.status_version(match_id)
+        etag = f"{etag_prefix}-{version}" if version is not None else None
+        return _conditional_json(etag, lambda: controller.get_status(match_id))
+
+    @app.post("/api/games/<match_id>/<action>")
+    def game_action_by_match(match_id: str, action: str):
+        if controller is None:
+            return jsonify({"error": "游戏控制器未启用"}), 503
+        handlers = {"pause": controller.pause, "resume": controller.resume, "stop": controller.stop}
+        if action not in handlers:
+            abort(404)
+        try:
+            handlers[action](match_id)
+            return jsonify(controller.get_status(match_id))
+        except KeyError:
+            abort(404)
+        except RuntimeError as exc:
             return jsonify({"error": str(exc)}), 400
 
     @app.get("/api/game/saves")
@@ -85,6 +236,21 @@ def create_app(
             return jsonify({"error": "游戏控制器未启用"}), 503
         return jsonify({"saves": controller.list_saves()})
 
+    @app.get("/api/game/saves/<filename>/preview")
+    def game_save_preview(filename: str):
+        if controller is None:
+            return jsonify({"error": "游戏控制器未启用"}), 503
+        try:
+            limit = _int_arg("limit", 20)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        try:
+            return jsonify(controller.preview(filename, limit=max(limit, 0)))
+        except FileNotFoundError as exc:
+            return jsonify({"error": f"存档不存在: {exc}"}), 404
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+
     @app.post("/api/game/load")
     def game_load():
         if controller is None:
@@ -99,8 +265,68 @@ def create_app(
             return jsonify(result)
         except FileNotFoundError as exc:
             return jsonify({"error": f"存档不存在: {exc}"}), 404
-        except RuntimeError as exc:
+        except (RuntimeError, ValueError) as exc:
+            return jsonify({"error": str(exc)}), 400
+
+    @app.post("/api/game/replay")
+    def game_replay():
+        if controller is None:
+            return jsonify({"error": "游戏控制器未启用"}), 503
+        payload = request.get_json(silent=True) or {}
+        filename = payload.get("filename")
+        if not filename:
+            return jsonify({"error": "缺少 filename"}), 400
+        try:
+            result = controller.replay(filename)
+            return jsonify(result)
+        except FileNotFoundError as exc:
+            return jsonify({"error": f"存档不存在: {exc}"}), 404
+        except (RuntimeError, ValueError) as exc:
+            return jsonify({"error": str(exc)}), 400
+
+    @app.get("/api/archive/matches")
+    def archive_matches():
+        if archive is None:
+            return jsonify({"error": "对局归档未启用"}), 503
+        try:
+            limit, offset = _int_arg("limit", 50), _int_arg("offset", 0)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        matches = archive.list_matches(
+            limit=min(limit, 500), offset=offset, winner=request.args.get("winner")
+        )
+        return jsonify({"matches": matches})
+
+    @app.get("/api/archive/matches/<match_id>/entries")
+    def archive_entries(match_id: str):
+        if archive is None:
+            return jsonify({"error": "对局归档未启用"}), 503
+        try:
+            round_number = _int_arg("round", None)
+            limit, after = _int_arg("limit", 500), _int_arg("after", 0)
+        except ValueError as exc:
             return jsonify({"error": str(exc)}), 400
+        entries = archive.get_entries(
+            match_id,
+            round_number=round_number,
+            channel=request.args.get("channel"),
+            player_id=request.args.get("player_id"),
+            limit=min(limit, 5000),
+            after=after,
+        )
+        return jsonify({"match_id": match_id, "entries": entries})
+
+    @app.get("/api/archive/stats/roles")
+    def archive_role_stats():
+        if archive is None:
+            return jsonify({"error": "对局归档未启用"}), 503
+        return jsonify({"roles": archive.role_win_rates()})
+
+    @app.get("/api/archive/stats/votes")
+    def archive_vote_stats():
+        if archive is None:
+            return jsonify({"error": "对局归档未启用"}), 503
+        return jsonify({"votes": archive.vote_patterns()})
 
     @app.get("/")
     def index():
@@ -109,6 +335,89 @@ def create_app(
     return app
 
 
+def _int_arg(name: str, default: Optional[int]) -> Optional[int]:
+    """读取整数查询参数，格式错误时抛出 ValueError。"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须是整数") from None
+
+
+def _conditional_json(etag: Optional[str], build: Callable[[], Any]) -> Response:
+    """带ETag的JSON响应；If-None-Match 命中时直接返回304，不构建响应体。
+
+    版本号在构建响应体之前读取，期间若有新变化只会让客户端下次多拉取一次，不会漏掉更新。
+    """
+    if etag is None:
+        return jsonify(build())
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _compress_response(response: Response, min_size: int, level: int) -> Response:
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in _COMPRESSIBLE_MIMETYPES
+        or not request.accept_encodings.quality("gzip")
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers["Content-Encoding"] = "gzip"
+    return response
+
+
+def _sse_stream(
+    state_store: GameStateStore,
+    match_id: str,
+    after: int,
+    heartbeat: float = 15.0,
+    max_duration: Optional[float] = None,
+) -> Iterator[str]:
+    """对局变化时推送一条 update 事件，空闲时发送注释行保活。
+
+    对局结束后推送最后的 update 和一条 end 事件再关闭连接，前端收到 end 后不再重连；
+    对局仍在进行而连接超过 max_duration 时直接结束，由浏览器自动重连。
+    """
+    cursor = after
+    deadline = time.monotonic() + max_duration if max_duration is not None else None
+    if deadline is not None:
+        # 主动断开后让浏览器尽快重连
+        yield "retry: 1000\n\n"
+    while True:
+        delta = state_store.get_log_since(match_id, cursor)
+        if delta is None:
+            return
+        if delta["cursor"] > cursor:
+            cursor = delta["cursor"]
+            yield f"id: {cursor}\nevent: update\ndata: {json.dumps(delta, ensure_ascii=False)}\n\n"
+        if delta["finished_at"] is not None:
+            yield f"id: {cursor}\nevent: end\ndata: {json.dumps({'finished_at': delta['finished_at']})}\n\n"
+            return
+        timeout = heartbeat
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            timeout = min(heartbeat, remaining)
+        if not state_store.wait_for_update(match_id, cursor, timeout=timeout):
+            yield ": keep-alive\n\n"
+
+
 def run_app(
     state_store: GameStateStore,
     *,
@@ -116,8 +425,36 @@ def run_app(
     port: int = 8000,
     static_dir: Optional[Path] = None,
     controller: Optional["GameController"] = None,
+    archive: Optional[MatchArchive] = None,
+    server: str = "dev",
+    threads: int = 8,
+    compress_min_size: Optional[int] = None,
+    sse_max_duration: Optional[float] = None,
+    sse_max_streams: Optional[int] = None,
 ) -> None:
-    """启动Flask应用，供后台线程调用。"""
+    """启动Flask应用，供后台线程调用。
+
+    server 为 waitress 时使用多线程的生产级 WSGI 服务器，与游戏共用进程内的状态存储；
+    未安装 waitress 时退回 Flask 开发服务器。
+    """
+    if server not in SERVERS:
+        raise ValueError(f"不支持的Web服务器: {server}")
     resolved_static = Path(static_dir or Path(__file__).resolve().parent / "static")
-    app = create_app(state_store, resolved_static, controller)
-    app.run(host=host, port=port, use_reloader=False)
+    app = create_app(
+        state_store,
+        resolved_static,
+        controller,
+        archive,
+        compress_min_size=compress_min_size,
+        sse_max_duration=sse_max_duration,
+        sse_max_streams=sse_max_streams,
+    )
+    if server == "waitress":
+        try:
+            from waitress import serve
+        except ImportError:
+            logger.warning("未安装 waitress，改用 Flask 开发服务器")
+        else:
+            serve(app, host=host, port=port, threads=threads, ident="llm-lrs")
+            return
+    app.run(host=host, port=port, use_reloader=False, threaded=True)
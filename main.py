@@ -1,11 +1,13 @@
 import argparse
 import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
-from config.game_config import PHASE_CONFIG, ROLE_COOLDOWNS
+from config.game_config import AI_CONFIG, CONTROLLER_CONFIG, PHASE_CONFIG, ROLE_COOLDOWNS, STORAGE_CONFIG, WEB_CONFIG
 from services.game_controller import GameController
 from services.game_state_store import GameStateStore
+from services.match_archive import MatchArchive
+from services.match_journal import MatchJournal
 from utils.logger import logger
 
 
@@ -19,20 +21,71 @@ def parse_args() -> argparse.Namespace:
         type=Path,
         default=None,
     )
+    parser.add_argument(
+        "--web-server",
+        choices=["dev", "waitress"],
+        default=WEB_CONFIG['server'],
+        help="观战服务使用的WSGI服务器",
+    )
+    parser.add_argument(
+        "--web-threads",
+        type=int,
+        default=WEB_CONFIG['threads'],
+        help="waitress 工作线程数",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="无界面快速模拟：阶段处理完成后立即推进，不等待阶段时长",
+    )
     parser.add_argument(
         "--auto-start",
         action="store_true",
         help="启动后自动开局（web模式默认等待前端触发）",
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="对局随机种子，默认每局随机生成；种子随对局数据与存档保存，可按同一种子重跑",
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        metavar="SAVE",
+        help="按存档目录中该存档记录的玩家与随机种子重跑对局（配合 AI_CACHE_MODE=replay 逐字复现）",
+    )
     return parser.parse_args()
 
 
-if __name__ == "__main__":
-    args = parse_args()
+def build_state_store(root: Path, save_dir: Path, archive: Optional[MatchArchive] = None) -> GameStateStore:
+    """创建状态存储；启用对局日志时先从日志恢复上次运行留下的对局。
 
-    players = [f"player{i}" for i in range(1, 13)]  # 12人局
+    超出驻留上限的已结束对局换出到存档目录。
+    """
+    journal = None
+    if STORAGE_CONFIG['journal_enabled']:
+        journal = MatchJournal(
+            root / STORAGE_CONFIG['journal_dir'],
+            fsync=STORAGE_CONFIG['journal_fsync'],
+            fsync_interval=STORAGE_CONFIG['journal_fsync_interval'],
+        )
+    state_store = GameStateStore(
+        journal=journal,
+        archive=archive,
+        spill_dir=save_dir,
+        max_matches=STORAGE_CONFIG['max_resident_matches'],
+        max_entries=STORAGE_CONFIG['max_resident_entries'],
+    )
+    recovered = state_store.recover()
+    if recovered:
+        logger.info(f"从对局日志恢复 {len(recovered)} 局对局")
+    return state_store
 
-    base_config = {
+
+def build_base_config(players: List[str], *, simulate: bool = False) -> Dict[str, Any]:
+    """标准12人局的对局配置，命令行对局与批量锦标赛共用。"""
+    return {
         'PHASE_CONFIG': PHASE_CONFIG,
         'ROLE_COOLDOWNS': ROLE_COOLDOWNS,
         'SEER_CONFIG': {
@@ -57,15 +110,34 @@ if __name__ == "__main__":
         'GUARD_CONFIG': {
             'max_protects': 3
         },
+        'AI_CONFIG': dict(AI_CONFIG),
+        'SIMULATION_MODE': simulate,
         'players': players,
     }
 
-    state_store = GameStateStore() if args.web else None
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    players = [f"player{i}" for i in range(1, 13)]  # 12人局
+    base_config = build_base_config(players, simulate=args.simulate)
+    if args.seed is not None:
+        base_config['RANDOM_SEED'] = args.seed
+
+    root = Path(__file__).resolve().parent
+    save_dir = root / "logs" / "saves"
+    archive: Optional[MatchArchive] = None
+    if args.web and STORAGE_CONFIG['archive_enabled']:
+        archive = MatchArchive(root / STORAGE_CONFIG['archive_path'])
+    state_store = build_state_store(root, save_dir, archive) if args.web else None
     controller = GameController(
         base_config=base_config,
         players=players,
         state_store=state_store,
-        save_dir=Path(__file__).resolve().parent / "logs" / "saves",
+        save_dir=save_dir,
+        save_format=STORAGE_CONFIG['save_format'],
+        max_concurrent_games=CONTROLLER_CONFIG['max_concurrent_games'] if args.web else 1,
+        max_finished_games=CONTROLLER_CONFIG['max_finished_games'],
     )
 
     web_thread: Optional[threading.Thread] = None
@@ -81,6 +153,13 @@ if __name__ == "__main__":
                 'port': args.web_port,
                 'static_dir': static_dir,
                 'controller': controller,
+                'archive': archive,
+                'server': args.web_server,
+                'threads': args.web_threads,
+                'compress_min_size': WEB_CONFIG['compress_min_size'],
+                'sse_max_duration': WEB_CONFIG['sse_max_duration'],
+                # 线程数调小时同步收紧推送连接上限，至少留出8个线程处理控制接口
+                'sse_max_streams': max(min(WEB_CONFIG['sse_max_streams'], args.web_threads - 8), 1),
             },
             daemon=True,
         )
@@ -88,7 +167,12 @@ if __name__ == "__main__":
         logger.info(f"观战面板已启动，监听 {args.web_host}:{args.web_port}")
 
     try:
-        if not args.web or args.auto_start:
+        if args.replay:
+            logger.info(f"按存档 {args.replay} 重跑对局")
+            controller.replay(args.replay)
+            if not args.web:
+                controller.wait_for_completion()
+        elif not args.web or args.auto_start:
             logger.info("自动启动一局狼人杀对局")
             controller.start()
             if not args.web:
@@ -97,6 +181,6 @@ if __name__ == "__main__":
             web_thread.join()
     except KeyboardInterrupt:
         logger.info("收到中断信号，准备停止对局")
-        controller.stop()
+        controller.stop_all()
     finally:
         controller.wait_for_completion()
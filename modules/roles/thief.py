@@ -75,11 +75,10 @@ class Thief(BaseRole):
             game_loop: 游戏循环实例
         """
         if not self.has_stolen and self.config['THIEF_CONFIG']['must_steal']:
-            # 随机选择一个角色
-            import random
+            # 随机选择一个角色，使用对局的随机数生成器，按种子重跑时结果一致
             available_roles = self.get_stealable_roles()
             if available_roles:
-                role = random.choice(available_roles)
+                role = game_loop.rng.choice(available_roles)
                 self.steal(role, game_loop.game_state)
                 game_loop.message_router.broadcast(
                     f"盗贼 {self.player_id} 超时，随机选择了 {role} 角色",
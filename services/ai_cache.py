@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from threading import Lock
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, Optional
+
+from services.mock_ai import stream_chunks
+from utils.logger import logger
+
+CACHE_MODES = {"off", "record", "replay", "auto"}
+
+
+class CacheMissError(RuntimeError):
+    """回放模式下找不到对应的补全记录"""
+
+
+def completion_key(kwargs: Dict[str, Any]) -> str:
+    """根据模型、提示词与采样参数计算补全记录的键"""
+    messages = kwargs.get("messages", [])
+    system_prompt = "\n".join(m["content"] for m in messages if m.get("role") == "system")
+    user_prompt = "\n".join(m["content"] for m in messages if m.get("role") != "system")
+    payload = {
+        "model": kwargs.get("model"),
+        "system": system_prompt,
+        "user": user_prompt,
+        "temperature": kwargs.get("temperature"),
+        "max_tokens": kwargs.get("max_tokens"),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """以 JSON Lines 追加写入的补全记录存储，线程安全"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = Lock()
+        self._entries: Dict[str, str] = {}
+        self._load()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, content: str, model: Optional[str] = None) -> None:
+        with self._lock:
+            if self._entries.get(key) == content:
+                return
+            self._entries[key] = content
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as fp:
+                fp.write(json.dumps({"key": key, "model": model, "content": content}, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as fp:
+            for line_no, line in enumerate(fp, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"跳过损坏的AI缓存记录: {self.path}:{line_no}")
+                    continue
+                self._entries[record["key"]] = record["content"]
+
+
+_CACHES: Dict[Path, CompletionCache] = {}
+_CACHES_LOCK = Lock()
+
+
+def get_completion_cache(path: Path) -> CompletionCache:
+    """同一路径在进程内只加载一次，多个服务实例共享"""
+    resolved = Path(path).resolve()
+    with _CACHES_LOCK:
+        cache = _CACHES.get(resolved)
+        if cache is None:
+            cache = CompletionCache(resolved)
+            _CACHES[resolved] = cache
+        return cache
+
+
+def _cached_response(content: str, model: Optional[str]) -> SimpleNamespace:
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        model=model,
+    )
+
+
+def _response_content(response: Any) -> Optional[str]:
+    for choice in getattr(response, "choices", None) or []:
+        content = getattr(getattr(choice, "message", None), "content", None)
+        if content:
+            return content
+    return None
+
+
+def _chunk_content(chunk: Any) -> str:
+    for choice in getattr(chunk, "choices", None) or []:
+        content = getattr(getattr(choice, "delta", None), "content", None)
+        if content:
+            return content
+    return ""
+
+
+class RecordingChatClient:
+    """包装聊天补全客户端，按模式记录或回放补全结果
+
+    - record: 总是请求模型并写入记录
+    - replay: 只从记录读取，未命中时抛出 CacheMissError
+    - auto: 命中时回放，未命中时请求模型并记录
+    """
+
+    def __init__(self, inner: Any, cache: CompletionCache, mode: str) -> None:
+        if mode not in CACHE_MODES - {"off"}:
+            raise ValueError(f"不支持的AI缓存模式: {mode}")
+        self.inner = inner
+        self.cache = cache
+        self.mode = mode
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs: Any) -> Any:
+        key, hit = self._lookup(kwargs)
+        if hit is not None:
+            if kwargs.get("stream"):
+                return stream_chunks(hit.choices[0].message.content, kwargs.get("model"))
+            return hit
+        response = self.inner.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(key, kwargs, response)
+        self._store(key, kwargs, response)
+        return response
+
+    def _record_stream(self, key: str, kwargs: Dict[str, Any], chunks: Iterator[Any]) -> Iterator[Any]:
+        """透传流式片段，流结束后把拼接好的完整内容写入记录"""
+        parts = []
+        for chunk in chunks:
+            parts.append(_chunk_content(chunk))
+            yield chunk
+        content = "".join(parts)
+        if content:
+            self.cache.put(key, content, model=kwargs.get("model"))
+
+    def close(self) -> None:
+        close = getattr(self.inner, "close", None)
+        if callable(close):
+            close()
+
+    def _lookup(self, kwargs: Dict[str, Any]):
+        key = completion_key(kwargs)
+        if self.mode in {"replay", "auto"}:
+            content = self.cache.get(key)
+            if content is not None:
+                return key, _cached_response(content, kwargs.get("model"))
+            if self.mode == "replay":
+                raise CacheMissError(f"AI缓存未命中: {key}")
+        return key, None
+
+    def _store(self, key: str, kwargs: Dict[str, Any], response: Any) -> None:
+        content = _response_content(response)
+        if content is not None:
+            self.cache.put(key, content, model=kwargs.get("model"))
+
+
+class RecordingAsyncChatClient(RecordingChatClient):
+    """RecordingChatClient 的异步版本"""
+
+    async def create(self, **kwargs: Any) -> Any:
+        # 异步流式请求直接透传，不做记录与回放
+        if kwargs.get("stream"):
+            return await self.inner.chat.completions.create(**kwargs)
+        key, hit = self._lookup(kwargs)
+        if hit is not None:
+            return hit
+        response = await self.inner.chat.completions.create(**kwargs)
+        self._store(key, kwargs, response)
+        return response
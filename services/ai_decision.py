@@ -1,14 +1,46 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-from openai import OpenAI
-from typing import Dict, Any, Optional
+from openai import AsyncOpenAI, OpenAI
+from threading import Lock
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from services.ai_cache import RecordingAsyncChatClient, RecordingChatClient, get_completion_cache
+from services.mock_ai import MockAsyncChatClient, MockChatClient
+from services.prompt_layout import PrefixReuseTracker, PromptLayout
+from services.speech_context import SpeechContextBuilder
 from utils.logger import logger
+import importlib.util
 import os
+from pathlib import Path
+
+# 进程级客户端注册表：(provider, base_url, api_key) -> OpenAI 客户端
+# 所有对局共享同一连接池，避免每局重新建连
+_CLIENT_REGISTRY: Dict[Tuple[str, Optional[str], Optional[str]], OpenAI] = {}
+_CLIENT_REGISTRY_LOCK = Lock()
+
+
+def reset_client_registry() -> None:
+    """关闭并清空共享客户端（测试或进程退出时使用）"""
+    with _CLIENT_REGISTRY_LOCK:
+        clients = list(_CLIENT_REGISTRY.values())
+        _CLIENT_REGISTRY.clear()
+    for client in clients:
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+
+
+ACTION_SYSTEM_PROMPT = "你是一个狼人杀游戏中的AI玩家，需要根据当前游戏状态做出最优决策。"
+SPEECH_SYSTEM_PROMPT = (
+    "你是一个狼人杀游戏中的AI玩家，需要根据当前游戏状态生成合适的发言。\n"
+    "发言应该符合你的角色身份，并有助于你的阵营获胜。\n"
+    "发言要考虑其他玩家的发言内容，做出合理的回应或质疑。"
+)
+
 
 class AIDecisionService:
     """AI决策服务，使用OpenAI API来为玩家生成决策和发言"""
-    
+
     def __init__(self):
         """初始化AI决策服务
         
@@ -18,10 +50,16 @@ class AIDecisionService:
         # 从环境变量获取配置
         self.ai_provider = os.getenv("AI_PROVIDER", "openai")  # 新增AI提供商配置
 
-        self.client = self._build_client()
+        # AI_CACHE_MODE: off/record/replay/auto，replay 模式完全不访问模型
+        self.cache_mode = os.getenv("AI_CACHE_MODE", "off").lower()
+        self.client = self._with_cache(None if self.cache_mode == "replay" else self._build_client())
+        self._async_client: Optional[AsyncOpenAI] = None  # 首次异步调用时再创建
+        self.speech_context = SpeechContextBuilder.from_env()  # 控制发言历史的提示长度
+        self.prefix_tracker = PrefixReuseTracker()  # 同一对局内相邻同类请求可复用的提示前缀长度
+        default_models = {"openai": "gpt-4-mini", "mock": "mock"}
         self.model = os.getenv(
             "OPENAI_MODEL_NAME",
-            os.getenv("AI_MODEL_NAME", "gpt-4-mini" if self.ai_provider == "openai" else "llama2")
+            os.getenv("AI_MODEL_NAME", default_models.get(self.ai_provider, "llama2"))
         )
 
     def get_player_action(self, player_id: str, role: str, game_state: Dict[str, Any], phase: str) -> Dict[str, Any]:
@@ -37,25 +75,22 @@ class AIDecisionService:
             Dict[str, Any]: 决策结果，包含target_id等信息
         """
         prompt = self._build_prompt(player_id, role, game_state, phase)
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个狼人杀游戏中的AI玩家，需要根据当前游戏状态做出最优决策。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=400
-            )
-            content = self._extract_choice_content(response, context="action")
-            if content is None:
-                return {"target_id": None}
+        return self._request_decision(prompt, game_state)
 
-            decision = self._parse_response(content)
-            return self._normalize_decision(decision, game_state)
-        except Exception as e:
-            logger.exception(f"AI决策出错: {str(e)}")
-            return {"target_id": None}
+    def get_team_action(self, player_ids: List[str], role: str, game_state: Dict[str, Any], phase: str) -> Dict[str, Any]:
+        """为同一阵营的多名玩家一次性获取共同决策（如狼人夜晚统一击杀目标）
+        
+        Args:
+            player_ids: 参与商议的玩家ID列表
+            role: 阵营共同角色
+            game_state: 当前游戏状态
+            phase: 当前游戏阶段
+            
+        Returns:
+            Dict[str, Any]: 决策结果，包含target_id等信息
+        """
+        prompt = self._build_team_prompt(player_ids, role, game_state, phase)
+        return self._request_decision(prompt, game_state)
             
     def get_player_speech(self, player_id: str, role: str, game_state: Dict[str, Any]) -> Optional[str]:
         """生成玩家发言
@@ -70,22 +105,83 @@ class AIDecisionService:
         """
         prompt = self._build_speech_prompt(player_id, role, game_state)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是一个狼人杀游戏中的AI玩家，需要根据当前游戏状态生成合适的发言。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4096
+            response = self.client.chat.completions.create(**self._speech_request_kwargs(prompt, game_state))
+            return self._speech_from_response(response)
+        except Exception as e:
+            logger.exception(f"AI发言生成出错: {str(e)}")
+            return "我需要更多时间思考。"
+
+    def stream_player_speech(
+        self,
+        player_id: str,
+        role: str,
+        game_state: Dict[str, Any],
+        on_delta: Callable[[str], None],
+    ) -> Optional[str]:
+        """以流式方式生成玩家发言，每收到新片段就回调当前可展示的完整文本
+        
+        Args:
+            player_id: 玩家ID
+            role: 玩家角色
+            game_state: 当前游戏状态
+            on_delta: 回调函数，参数为截至目前的可见发言（已去除思考过程）
+            
+        Returns:
+            Optional[str]: 最终发言内容
+        """
+        prompt = self._build_speech_prompt(player_id, role, game_state)
+        try:
+            stream = self.client.chat.completions.create(
+                **self._speech_request_kwargs(prompt, game_state), stream=True
             )
-            content = self._extract_choice_content(response, context="speech")
-            if content is None:
+            content = ""
+            visible = ""
+            for chunk in stream:
+                piece = self._extract_delta_content(chunk)
+                if not piece:
+                    continue
+                content += piece
+                current = self._visible_speech(content)
+                if current != visible:
+                    visible = current
+                    on_delta(visible)
+            if not content:
+                logger.error(f"AI流式响应缺少内容，player={player_id}")
                 return "我需要更多时间思考。"
-            return content.split("</think>")[-1]
+            return self._visible_speech(content)
+        except Exception as e:
+            logger.exception(f"AI流式发言生成出错: {str(e)}")
+            return "我需要更多时间思考。"
+
+    async def get_player_action_async(self, player_id: str, role: str, game_state: Dict[str, Any], phase: str) -> Dict[str, Any]:
+        """get_player_action 的异步版本，基于 AsyncOpenAI 客户端"""
+        prompt = self._build_prompt(player_id, role, game_state, phase)
+        return await self._request_decision_async(prompt, game_state)
+
+    async def get_team_action_async(self, player_ids: List[str], role: str, game_state: Dict[str, Any], phase: str) -> Dict[str, Any]:
+        """get_team_action 的异步版本，基于 AsyncOpenAI 客户端"""
+        prompt = self._build_team_prompt(player_ids, role, game_state, phase)
+        return await self._request_decision_async(prompt, game_state)
+
+    async def get_player_speech_async(self, player_id: str, role: str, game_state: Dict[str, Any]) -> Optional[str]:
+        """get_player_speech 的异步版本，基于 AsyncOpenAI 客户端"""
+        prompt = self._build_speech_prompt(player_id, role, game_state)
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._speech_request_kwargs(prompt, game_state)
+            )
+            return self._speech_from_response(response)
         except Exception as e:
             logger.exception(f"AI发言生成出错: {str(e)}")
             return "我需要更多时间思考。"
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """共享的异步客户端，同一服务实例内的并发请求复用其连接池"""
+        if self._async_client is None:
+            inner = None if self.cache_mode == "replay" else self._build_async_client()
+            self._async_client = self._with_cache(inner, async_mode=True)
+        return self._async_client
             
     def _build_prompt(self, player_id: str, role: str, game_state: Dict[str, Any], phase: str) -> str:
         """构建决策提示
@@ -99,21 +195,37 @@ class AIDecisionService:
         Returns:
             str: 构建的提示文本
         """
-        alive_players = game_state['alive_players']
-        dead_players = game_state['dead_players']
-        round_number = game_state['round_number']
-        
-        prompt = f"""
-        你是玩家 {player_id}，角色是 {role}。
-        现在是第 {round_number} 轮的 {phase} 阶段。
+        layout = PromptLayout(
+            public=self._public_state_lines(game_state, f"{phase} 阶段"),
+            private=[f"你是玩家 {player_id}，角色是 {role}。"],
+            instruction=[
+                "请根据当前游戏状态，选择一个目标玩家。",
+                '回复文本格式: {"target_id": "playerX"}',
+            ],
+        )
+        return layout.render()
         
-        存活玩家: {', '.join(alive_players)}
-        已死亡玩家: {', '.join(dead_players)}
+    def _build_team_prompt(self, player_ids: List[str], role: str, game_state: Dict[str, Any], phase: str) -> str:
+        """构建阵营共同决策提示
         
-        请根据当前游戏状态，选择一个目标玩家。
-        回复文本格式: {{"target_id": "playerX"}}
+        Args:
+            player_ids: 参与商议的玩家ID列表
+            role: 阵营共同角色
+            game_state: 当前游戏状态
+            phase: 当前游戏阶段
+            
+        Returns:
+            str: 构建的提示文本
         """
-        return prompt
+        layout = PromptLayout(
+            public=self._public_state_lines(game_state, f"{phase} 阶段"),
+            private=[f"你代表 {role} 阵营的全体成员: {', '.join(player_ids)}。"],
+            instruction=[
+                "你们需要商议后，为整个阵营选择一个共同的目标玩家。",
+                '回复文本格式: {"target_id": "playerX"}',
+            ],
+        )
+        return layout.render()
         
     def _build_speech_prompt(self, player_id: str, role: str, game_state: Dict[str, Any]) -> str:
         """构建发言提示
@@ -126,30 +238,22 @@ class AIDecisionService:
         Returns:
             str: 构建的提示文本
         """
-        alive_players = game_state['alive_players']
-        dead_players = game_state['dead_players']
-        round_number = game_state['round_number']
-        speech_history = game_state.get('speech_history', [])
-        
-        # 构建发言历史文本
-        speech_history_text = ""
-        if speech_history:
-            speech_history_text = "\n发言历史:\n"
-            for speech in speech_history:
-                speech_history_text += f"玩家{speech['player_id']}({speech['role']}): {speech['content']}\n"
-        
-        prompt = f"""
-        你是玩家 {player_id}，角色是 {role}。
-        现在是第 {round_number} 轮的讨论阶段。
-        
-        存活玩家: {', '.join(alive_players)}
-        已死亡玩家: {', '.join(dead_players)}
-        {speech_history_text}
-        请根据你的角色和当前游戏状态，生成一段合适的发言。
-        发言应该符合你的角色身份，并有助于你的阵营获胜。
-        发言要考虑其他玩家的发言内容，做出合理的回应或质疑。
-        """
-        return prompt
+        # 构建发言历史文本（近期原文 + 早前摘要，受token预算限制）
+        speech_history_text = self.speech_context.build(game_state).strip()
+        layout = PromptLayout(
+            public=self._public_state_lines(game_state, "讨论阶段") + [speech_history_text],
+            private=[f"你是玩家 {player_id}，角色是 {role}。"],
+            instruction=["请生成你的发言。"],
+        )
+        return layout.render()
+
+    def _public_state_lines(self, game_state: Dict[str, Any], phase_text: str) -> List[str]:
+        """所有玩家共享的公共游戏状态，放在用户提示最前以便复用前缀"""
+        return [
+            f"现在是第 {game_state['round_number']} 轮的{phase_text}。",
+            f"存活玩家: {', '.join(game_state['alive_players'])}",
+            f"已死亡玩家: {', '.join(game_state['dead_players'])}",
+        ]
         
     def _parse_response(self, response: str) -> Dict[str, Any]:
         """解析API响应
@@ -177,6 +281,89 @@ class AIDecisionService:
             return {"target_id": None}
         return {"target_id": None}
 
+    def _request_decision(self, prompt: str, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """发送决策请求并解析出规范化的目标"""
+        try:
+            response = self.client.chat.completions.create(**self._action_request_kwargs(prompt, game_state))
+            return self._decision_from_response(response, game_state)
+        except Exception as e:
+            logger.exception(f"AI决策出错: {str(e)}")
+            return {"target_id": None}
+
+    async def _request_decision_async(self, prompt: str, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """_request_decision 的异步版本"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._action_request_kwargs(prompt, game_state)
+            )
+            return self._decision_from_response(response, game_state)
+        except Exception as e:
+            logger.exception(f"AI决策出错: {str(e)}")
+            return {"target_id": None}
+
+    def _action_request_kwargs(self, prompt: str, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """构建决策请求参数"""
+        self._report_prefix_reuse(game_state, "action", ACTION_SYSTEM_PROMPT, prompt)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": ACTION_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 400,
+        }
+
+    def _speech_request_kwargs(self, prompt: str, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """构建发言请求参数"""
+        self._report_prefix_reuse(game_state, "speech", SPEECH_SYSTEM_PROMPT, prompt)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SPEECH_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 4096,
+        }
+
+    def _report_prefix_reuse(self, game_state: Dict[str, Any], kind: str, system_prompt: str, prompt: str) -> None:
+        full_text = f"{system_prompt}\n{prompt}"
+        reused = self.prefix_tracker.observe(game_state.get("match_id"), kind, full_text)
+        logger.debug(f"[{kind}] 提示前缀可复用 {reused}/{len(full_text)} 字符")
+
+    def _decision_from_response(self, response: Any, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """从补全结果中解析决策"""
+        content = self._extract_choice_content(response, context="action")
+        if content is None:
+            return {"target_id": None}
+
+        decision = self._parse_response(content)
+        return self._normalize_decision(decision, game_state)
+
+    def _speech_from_response(self, response: Any) -> str:
+        """从补全结果中提取发言，去掉思考过程"""
+        content = self._extract_choice_content(response, context="speech")
+        if content is None:
+            return "我需要更多时间思考。"
+        return content.split("</think>")[-1]
+
+    @staticmethod
+    def _extract_delta_content(chunk: Any) -> Optional[str]:
+        """提取流式片段中的增量文本"""
+        for choice in getattr(chunk, "choices", None) or []:
+            content = getattr(getattr(choice, "delta", None), "content", None)
+            if content:
+                return content
+        return None
+
+    @staticmethod
+    def _visible_speech(content: str) -> str:
+        """思考过程尚未结束时不展示任何内容，结束后只展示 </think> 之后的文本"""
+        if "<think>" in content and "</think>" not in content:
+            return ""
+        return content.split("</think>")[-1]
+
     def _extract_choice_content(self, response: Any, context: str) -> Optional[str]:
         """提取补全内容，若缺失则记录日志"""
         choices = getattr(response, "choices", None) or []
@@ -190,7 +377,59 @@ class AIDecisionService:
         return None
 
     def _build_client(self) -> OpenAI:
-        """根据提供商构建 OpenAI 客户端配置"""
+        """根据提供商获取共享的 OpenAI 客户端，同一连接参数只建一次"""
+        if self.ai_provider == "mock":
+            # 离线模拟后端，不联网也不进入共享注册表
+            return MockChatClient()
+        client_kwargs = self._client_kwargs()
+        key = (self.ai_provider, client_kwargs.get("base_url"), client_kwargs.get("api_key"))
+        with _CLIENT_REGISTRY_LOCK:
+            client = _CLIENT_REGISTRY.get(key)
+            if client is None:
+                client = OpenAI(**client_kwargs, **self._http_client_kwargs(async_mode=False))
+                _CLIENT_REGISTRY[key] = client
+            return client
+
+    def _build_async_client(self) -> AsyncOpenAI:
+        """根据提供商构建 AsyncOpenAI 客户端配置
+
+        异步连接池绑定事件循环，因此按服务实例创建而不进入进程级注册表。
+        """
+        if self.ai_provider == "mock":
+            return MockAsyncChatClient()
+        return AsyncOpenAI(**self._client_kwargs(), **self._http_client_kwargs(async_mode=True))
+
+    def _with_cache(self, client: Any, async_mode: bool = False) -> Any:
+        """按 AI_CACHE_MODE 为客户端套上记录/回放层"""
+        if self.cache_mode == "off":
+            return client
+        cache = get_completion_cache(Path(os.getenv("AI_CACHE_PATH", "logs/ai_cache.jsonl")))
+        wrapper_cls = RecordingAsyncChatClient if async_mode else RecordingChatClient
+        return wrapper_cls(client, cache, self.cache_mode)
+
+    def _http_client_kwargs(self, async_mode: bool) -> Dict[str, Any]:
+        """按环境变量定制连接池大小与 HTTP/2，未配置时沿用 openai 默认值"""
+        max_connections = os.getenv("AI_HTTP_MAX_CONNECTIONS")
+        max_keepalive = os.getenv("AI_HTTP_MAX_KEEPALIVE")
+        http2 = os.getenv("AI_HTTP2", "").lower() in {"1", "true", "yes"}
+        if not (max_connections or max_keepalive or http2):
+            return {}
+
+        import httpx
+        from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("未安装 h2 依赖，HTTP/2 回退为 HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=int(max_connections or 100),
+            max_keepalive_connections=int(max_keepalive or 20),
+        )
+        client_cls = DefaultAsyncHttpxClient if async_mode else DefaultHttpxClient
+        return {"http_client": client_cls(limits=limits, http2=http2)}
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        """同步与异步客户端共用的连接参数"""
         api_key = os.getenv("OPENAI_API_KEY") if self.ai_provider == "openai" else "not-needed"
         # openai 官方客户端在 base_url 为空时使用默认域名
         default_base_url = None if self.ai_provider == "openai" else "http://localhost:11434/v1"
@@ -199,8 +438,7 @@ class AIDecisionService:
         client_kwargs = {"api_key": api_key}
         if base_url:
             client_kwargs["base_url"] = base_url
-
-        return OpenAI(**client_kwargs)
+        return client_kwargs
 
     def _normalize_decision(self, decision: Dict[str, Any], game_state: Dict[str, Any]) -> Dict[str, Any]:
         # 校验并规范化AI输出的目标
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import json
+from collections import OrderedDict
 from copy import deepcopy
 from datetime import datetime
 from pathlib import Path
@@ -9,11 +9,45 @@ from typing import Any, Dict, List, Optional
 
 from utils.logger import logger
 from core.engine.game_loop import GameLoop
+from services.ai_decision import AIDecisionService
 from services.game_state_store import GameStateStore
+from services.save_format import SAVE_FORMATS, format_of, read_match, write_match
+
+
+ACTIVE_STATES = {"running", "paused", "stopping"}
+
+
+class _ManagedGame:
+    """控制器中的一局对局：运行期间持有游戏循环，结束后只保留状态信息。"""
+
+    __slots__ = ("game", "status", "last_error", "phase", "round")
+
+    def __init__(self, game: GameLoop) -> None:
+        self.game: Optional[GameLoop] = game
+        self.status = "running"
+        self.last_error: Optional[str] = None
+        self.phase: Optional[str] = None
+        self.round: Optional[int] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    def detach(self) -> None:
+        """对局结束后记录最终阶段并释放游戏循环。"""
+        if self.game is not None:
+            phase = self.game.phase_manager.current_phase
+            self.phase = getattr(phase, "name", None)
+            self.round = self.game.game_state.get("round_number")
+            self.game = None
 
 
 class GameController:
-    """管理游戏生命周期，提供启动/暂停/保存等能力。"""
+    """管理游戏生命周期，提供启动/暂停/保存等能力。
+
+    控制器维护一个按 match_id 索引的对局池，最多同时运行 max_concurrent_games 局；
+    不指定 match_id 的操作作用于最近启动的对局。
+    """
 
     def __init__(
         self,
@@ -22,26 +56,40 @@ class GameController:
         players: List[str],
         state_store: Optional[GameStateStore] = None,
         save_dir: Optional[Path] = None,
+        ai_service: Optional[AIDecisionService] = None,
+        save_format: str = "json",
+        max_concurrent_games: int = 1,
+        max_finished_games: int = 256,
     ) -> None:
+        if save_format not in SAVE_FORMATS:
+            raise ValueError(f"不支持的存档格式: {save_format}")
+        if max_concurrent_games < 1:
+            raise ValueError("max_concurrent_games 必须大于等于1")
         self._base_config = deepcopy(base_config)
         self._players_template = list(players)
         self._state_store = state_store
         self._save_dir = Path(save_dir or Path("logs") / "saves")
         self._save_dir.mkdir(parents=True, exist_ok=True)
+        self._save_format = save_format
+        self._max_concurrent_games = max_concurrent_games
+        self._max_finished_games = max_finished_games  # 保留状态信息的已结束对局数
         self._lock = Lock()
-        self._game: Optional[GameLoop] = None
-        self._status: str = "idle"
-        self._last_error: Optional[str] = None
+        self._games: "OrderedDict[str, _ManagedGame]" = OrderedDict()
         self._current_match_id: Optional[str] = None
+        self._version = 0  # 状态每变化一次递增，与对局序号组合成状态接口的ETag
+        self._ai_service = ai_service  # 所有对局共享同一AI服务与连接池
 
     # ------------------------------------------------------------------
     # 生命周期控制
     # ------------------------------------------------------------------
 
-    def start(self, players: Optional[List[str]] = None) -> Dict[str, Any]:
+    def start(self, players: Optional[List[str]] = None, *, seed: Optional[int] = None) -> Dict[str, Any]:
+        """启动一局新对局；seed 为空时使用基础配置中的种子，仍为空则由游戏循环随机生成。"""
         with self._lock:
-            if self._game and self._game.is_running():
-                raise RuntimeError("当前已有正在运行的对局")
+            if self._active_count() >= self._max_concurrent_games:
+                if self._max_concurrent_games == 1:
+                    raise RuntimeError("当前已有正在运行的对局")
+                raise RuntimeError(f"同时运行的对局已达上限（{self._max_concurrent_games}局）")
 
             chosen_players = list(players) if players else list(self._players_template)
             if not chosen_players:
@@ -49,95 +97,143 @@ class GameController:
 
             config = deepcopy(self._base_config)
             config['players'] = chosen_players
+            if seed is not None:
+                config['RANDOM_SEED'] = seed
 
-            self._game = GameLoop(config, state_store=self._state_store)
-            self._game.initialize_game(chosen_players)
-            self._current_match_id = self._game.match_id
-            self._status = "running"
-            self._last_error = None
+            if self._ai_service is None:
+                self._ai_service = AIDecisionService()
+            game = GameLoop(config, state_store=self._state_store, ai_service=self._ai_service)
+            game.initialize_game(chosen_players)
+            match_id = game.match_id
+            managed = _ManagedGame(game)
+            self._games[match_id] = managed
+            self._current_match_id = match_id
+            self._touch()
 
             def _on_finish() -> None:
                 with self._lock:
-                    self._status = "finished"
+                    managed.detach()
+                    self._set_status(managed, "stopped" if managed.status == "stopping" else "finished")
+                    self._prune_finished()
 
             try:
-                self._game.start_async(on_finish=_on_finish)
+                game.start_async(on_finish=_on_finish)
             except Exception as exc:  # noqa: BLE001
-                self._status = "error"
-                self._last_error = str(exc)
+                managed.last_error = str(exc)
+                managed.detach()
+                self._set_status(managed, "error")
                 logger.exception("启动游戏循环失败")
                 raise
 
-            return {"match_id": self._current_match_id}
+            return {"match_id": match_id, "seed": game.seed}
 
-    def pause(self) -> None:
+    def replay(self, filename: str) -> Dict[str, Any]:
+        """按存档中记录的玩家与随机种子重跑一局，配合AI回放缓存可逐字复现原对局。"""
+        path = self._save_path(filename)
+        if not path.exists():
+            raise FileNotFoundError(filename)
+        header = read_match(path, limit=0)
+        if header.get("seed") is None:
+            raise ValueError(f"存档未记录随机种子，无法重跑: {filename}")
+        return self.start(players=header.get("players") or None, seed=header["seed"])
+
+    def pause(self, match_id: Optional[str] = None) -> None:
         with self._lock:
-            if not self._game or not self._game.is_running():
+            managed = self._resolve(match_id)
+            if managed is None or managed.game is None or not managed.active:
                 raise RuntimeError("没有正在运行的对局可供暂停")
-            if self._game.is_paused():
+            if managed.game.is_paused():
                 return
-            if self._game.pause():
-                self._status = "paused"
+            if managed.game.pause():
+                self._set_status(managed, "paused")
 
-    def resume(self) -> None:
+    def resume(self, match_id: Optional[str] = None) -> None:
         with self._lock:
-            if not self._game or not self._game.is_running():
+            managed = self._resolve(match_id)
+            if managed is None or managed.game is None or not managed.active:
                 raise RuntimeError("没有正在运行的对局可供继续")
-            if self._game.is_paused() and self._game.resume():
-                self._status = "running"
+            if managed.game.is_paused() and managed.game.resume():
+                self._set_status(managed, "running")
 
-    def stop(self) -> None:
+    def stop(self, match_id: Optional[str] = None) -> None:
         with self._lock:
-            if not self._game or not self._game.is_running():
+            managed = self._resolve(match_id)
+            if managed is None or managed.game is None or not managed.active:
                 return
-            if self._game.stop():
-                self._status = "stopping"
-        self._game.wait_for_completion()
+            game = managed.game
+            if game.stop():
+                self._set_status(managed, "stopping")
+        game.wait_for_completion()
+
+    def stop_all(self) -> None:
+        """停止所有运行中的对局并等待其结束。"""
         with self._lock:
-            if self._status == "stopping":
-                self._status = "stopped"
+            match_ids = [match_id for match_id, managed in self._games.items() if managed.active]
+        for match_id in match_ids:
+            self.stop(match_id)
 
     # ------------------------------------------------------------------
     # 状态与保存
     # ------------------------------------------------------------------
 
-    def get_status(self) -> Dict[str, Any]:
+    def get_status(self, match_id: Optional[str] = None) -> Dict[str, Any]:
+        """返回指定对局（默认最近启动的对局）的状态以及对局池概况。
+
+        指定的 match_id 不存在时抛出 KeyError。
+        """
         with self._lock:
-            payload: Dict[str, Any] = {
-                "state": self._status,
-                "is_running": bool(self._game and self._game.is_running()),
-                "is_paused": bool(self._game and self._game.is_paused()),
-                "match_id": self._current_match_id,
+            managed = self._resolve(match_id)
+            resolved_id = match_id or self._current_match_id
+            payload = self._describe(resolved_id, managed) if managed else {
+                "state": "idle",
+                "is_running": False,
+                "is_paused": False,
+                "match_id": None,
             }
-            if self._game:
-                phase = self._game.phase_manager.current_phase
-                payload["phase"] = getattr(phase, "name", None)
-                payload["round"] = self._game.game_state.get("round_number")
-            if self._last_error:
-                payload["last_error"] = self._last_error
+            payload["running_games"] = self._active_count()
+            payload["max_concurrent_games"] = self._max_concurrent_games
             return payload
 
+    def list_games(self) -> List[Dict[str, Any]]:
+        """按启动顺序返回控制器中所有对局的状态。"""
+        with self._lock:
+            return [self._describe(match_id, managed) for match_id, managed in self._games.items()]
+
+    def status_version(self, match_id: Optional[str] = None) -> Optional[str]:
+        """返回状态版本标识，状态或当前对局有变化时随之改变；未接入状态存储时返回None。"""
+        if self._state_store is None:
+            return None
+        with self._lock:
+            version = self._version
+            resolved_id = match_id or self._current_match_id
+        match_version = self._state_store.match_version(resolved_id) if resolved_id else None
+        return f"{version}-{match_version or 0}"
+
+    def prefix_reuse_stats(self) -> Dict[str, Dict[str, float]]:
+        """共享AI服务按请求类型汇总的提示前缀复用统计，尚未创建AI服务时为空。"""
+        tracker = getattr(self._ai_service, "prefix_tracker", None)
+        return tracker.stats() if tracker is not None else {}
+
     def wait_for_completion(self, timeout: Optional[float] = None) -> None:
-        game = None
+        """等待所有运行中的对局结束。"""
         with self._lock:
-            game = self._game
-        if game is not None:
+            games = [managed.game for managed in self._games.values() if managed.game is not None]
+        for game in games:
             game.wait_for_completion(timeout=timeout)
 
-    def save(self, filename: Optional[str] = None) -> Dict[str, Any]:
+    def save(self, filename: Optional[str] = None, match_id: Optional[str] = None) -> Dict[str, Any]:
         if not self._state_store:
             raise RuntimeError("当前运行模式不支持保存对局")
-        match = self._state_store.get_match()
+        match = self._state_store.get_match(match_id)
         if not match:
-            raise RuntimeError("暂无活跃对局可保存")
+            raise RuntimeError("暂无活跃对局可保存" if match_id is None else f"对局不存在: {match_id}")
 
         match_id = match.get("match_id") or "unknown"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        name = filename or f"{match_id}_{timestamp}.json"
-        path = self._save_dir / name
+        name = filename or f"{match_id}_{timestamp}.{self._save_format}"
+        path = self._save_path(name)
 
-        with path.open("w", encoding="utf-8") as fp:
-            json.dump(match, fp, ensure_ascii=False, indent=2)
+        write_match(path, match)
 
         logger.info(f"保存对局数据至 {path}")
         return {
@@ -146,32 +242,93 @@ class GameController:
             "match_id": match_id,
         }
 
+    # 以下辅助方法的调用方需持有 self._lock
+
+    def _set_status(self, managed: _ManagedGame, status: str) -> None:
+        managed.status = status
+        self._touch()
+
+    def _touch(self) -> None:
+        self._version += 1
+
+    def _resolve(self, match_id: Optional[str]) -> Optional[_ManagedGame]:
+        if match_id is None:
+            return self._games.get(self._current_match_id) if self._current_match_id else None
+        managed = self._games.get(match_id)
+        if managed is None:
+            raise KeyError(match_id)
+        return managed
+
+    def _active_count(self) -> int:
+        return sum(1 for managed in self._games.values() if managed.active)
+
+    def _describe(self, match_id: str, managed: _ManagedGame) -> Dict[str, Any]:
+        game = managed.game
+        payload: Dict[str, Any] = {
+            "state": managed.status,
+            "is_running": bool(game and game.is_running()),
+            "is_paused": bool(game and game.is_paused()),
+            "match_id": match_id,
+        }
+        if game is not None:
+            phase = game.phase_manager.current_phase
+            payload["phase"] = getattr(phase, "name", None)
+            payload["round"] = game.game_state.get("round_number")
+        else:
+            payload["phase"] = managed.phase
+            payload["round"] = managed.round
+        if managed.last_error:
+            payload["last_error"] = managed.last_error
+        return payload
+
+    def _prune_finished(self) -> None:
+        finished = [match_id for match_id, managed in self._games.items() if not managed.active]
+        for match_id in finished[:max(len(finished) - self._max_finished_games, 0)]:
+            del self._games[match_id]
+
+    def _save_path(self, filename: str) -> Path:
+        """把存档文件名解析为存档目录下的路径，拒绝借助 ..、绝对路径或符号链接逃出存档目录的文件名。"""
+        save_dir = self._save_dir.resolve()
+        path = (save_dir / filename).resolve()
+        if path.parent != save_dir:
+            raise ValueError(f"非法的存档文件名: {filename}")
+        return path
+
     def list_saves(self) -> List[Dict[str, Any]]:
         if not self._save_dir.exists():
             return []
         saves: List[Dict[str, Any]] = []
-        for path in sorted(self._save_dir.glob("*.json")):
+        paths = [*self._save_dir.glob("*.json"), *self._save_dir.glob("*.jsonl.gz")]
+        for path in sorted(paths):
             stat = path.stat()
             saves.append(
                 {
                     "filename": path.name,
                     "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
                     "size": stat.st_size,
+                    "format": format_of(path),
                 }
             )
         return saves
 
+    def preview(self, filename: str, limit: int = 20) -> Dict[str, Any]:
+        """读取存档的概要与前 limit 条日志，压缩存档只解压需要的部分。"""
+        path = self._save_path(filename)
+        if not path.exists():
+            raise FileNotFoundError(filename)
+        return read_match(path, limit=limit)
+
     def load(self, filename: str, *, activate: bool = True) -> Dict[str, Any]:
         if not self._state_store:
             raise RuntimeError("当前运行模式不支持加载对局")
-        path = self._save_dir / filename
+        path = self._save_path(filename)
         if not path.exists():
-            raise FileNotFoundError(str(path))
+            raise FileNotFoundError(filename)
 
-        with path.open("r", encoding="utf-8") as fp:
-            payload = json.load(fp)
+        payload = read_match(path)
 
-        activate_flag = bool(activate) and not (self._game and self._game.is_running())
+        with self._lock:
+            activate_flag = bool(activate) and self._active_count() == 0
         match_id = self._state_store.import_match(payload, activate=activate_flag)
         logger.info(f"从存档 {path} 加载对局 {match_id}")
         return {"match_id": match_id}
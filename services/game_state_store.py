@@ -1,63 +1,257 @@
 from __future__ import annotations
 
+import json
+import tempfile
+from bisect import bisect_left, bisect_right, insort
 from copy import deepcopy
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timezone
-from threading import Lock
-from typing import Any, Dict, List, Optional
+from itertools import count
+from pathlib import Path
+from threading import Condition, Lock
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
 from uuid import uuid4
 
+from services.match_archive import MatchArchive
+from services.match_journal import MatchJournal
+from utils.logger import logger
+
+# 换出目录中记录已换出对局概要的索引文件，重启后据此恢复换出表而无需读取各换出文件
+# （不带 .json 后缀，避免出现在存档列表中）
+_SPILL_INDEX_NAME = ".spill_index"
+
+# 分页游标中创建时间与 match_id 的分隔符（match_id 为十六进制或存档文件中的标识）
+_CURSOR_SEPARATOR = "~"
+
+# 存档中由快照字段承载的键，其余键原样保留在 extra 中
+_SNAPSHOT_KEYS = {
+    "match_id", "created_at", "players", "alive_players", "dead_players",
+    "phase", "round", "speech_log", "last_seq", "finished_at",
+}
+
 
 def _utc_iso() -> str:
     """Return current UTC time in ISO 8601 format."""
     return datetime.now(timezone.utc).isoformat()
 
 
+@dataclass(frozen=True)
+class _MatchSnapshot:
+    """对局在某一序号时的不可变视图。
+
+    日志与更新记录是只追加的共享列表，快照只记录发布时的长度；
+    读者按长度切片即可，无需加锁，也不会看到发布之后追加的条目。
+    """
+
+    match_id: str
+    created_at: Optional[str]
+    players: Tuple[str, ...]
+    alive_players: Tuple[str, ...]
+    dead_players: Tuple[str, ...]
+    phase: Optional[str]
+    round: Optional[int]
+    last_seq: int
+    log: List[Dict[str, Any]]
+    log_length: int
+    updates: List[Tuple[int, int]]  # (序号, 日志下标)，按序号递增追加
+    updates_length: int
+    finished_at: Optional[str] = None
+    extra: Mapping[str, Any] = field(default_factory=lambda: MappingProxyType({}))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "match_id": self.match_id,
+            "created_at": self.created_at,
+            "round": self.round,
+            "phase": self.phase,
+            "alive_players": list(self.alive_players),
+            "status": "finished" if self.finished_at else "in_progress",
+        }
+
+    def to_payload(self) -> Dict[str, Any]:
+        payload = dict(self.extra)
+        payload.update(
+            {
+                "match_id": self.match_id,
+                "created_at": self.created_at,
+                "players": list(self.players),
+                "alive_players": list(self.alive_players),
+                "dead_players": list(self.dead_players),
+                "phase": self.phase,
+                "round": self.round,
+                "speech_log": self.log[:self.log_length],
+                "last_seq": self.last_seq,
+                "finished_at": self.finished_at,
+            }
+        )
+        return payload
+
+
+class _SpilledMatch(NamedTuple):
+    """已换出到磁盘的对局：只在内存中保留列表概要与版本号。"""
+
+    summary: Dict[str, Any]
+    last_seq: int
+    path: Path
+
+
+class _MatchState:
+    """单局的写入状态：每局独立加锁，写入后发布新快照并唤醒推送订阅者。"""
+
+    def __init__(self, snapshot: _MatchSnapshot) -> None:
+        self.lock = Lock()
+        self.changed = Condition(self.lock)
+        self.snapshot = snapshot
+
+    def next_seq(self) -> int:
+        return self.snapshot.last_seq + 1
+
+    def publish(self, seq: int, **changes: Any) -> None:
+        """发布新快照（调用方需持有 self.lock）。"""
+        snapshot = self.snapshot
+        self.snapshot = replace(
+            snapshot,
+            last_seq=seq,
+            log_length=len(snapshot.log),
+            updates_length=len(snapshot.updates),
+            **changes,
+        )
+        self.changed.notify_all()
+
+
 class GameStateStore:
-    """线程安全的游戏状态存储，用于对外提供观战数据。"""
+    """线程安全的游戏状态存储，用于对外提供观战数据。
+
+    每局对局独立加锁，只有写入方（游戏线程）会持锁；每次写入发布一份不可变快照，
+    观战读取直接引用当前快照，不加锁也不深拷贝，HTTP 读者不会阻塞游戏线程。
+    读取接口返回的日志条目与存储共享，调用方不应修改。
 
-    def __init__(self) -> None:
-        self._lock = Lock()
-        self._matches: Dict[str, Dict[str, Any]] = {}
+    传入 journal 时，每次写入都会在持有对局锁时追加到该局的日志文件，
+    进程重启后可通过 recover() 从日志重建对局。对局结束后日志压缩为一条快照记录，
+    写入归档或换出文件后删除，日志目录中只留下尚未持久化到别处的对局；从存档导入的对局不写日志。
+
+    设置 max_matches / max_entries 后，驻留内存的对局数或日志条目总数超限时，
+    按最近访问顺序把已结束且非活跃的对局换出到 spill_dir，再次访问时自动加载回来。
+
+    传入 archive 时，对局结束后整局写入 SQLite 归档，供统计查询使用。
+    """
+
+    def __init__(
+        self,
+        journal: Optional[MatchJournal] = None,
+        *,
+        archive: Optional[MatchArchive] = None,
+        spill_dir: Optional[Path] = None,
+        max_matches: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        if (max_matches is not None or max_entries is not None) and spill_dir is None:
+            raise ValueError("设置对局保留上限时必须指定换出目录")
+        self._journal = journal
+        self._archive = archive
+        self._spill_dir = Path(spill_dir) if spill_dir is not None else None
+        self._max_matches = max_matches
+        self._max_entries = max_entries
+        self._lock = Lock()  # 只保护对局表的替换，不参与单局读写
+        # 对局表按写时复制替换，读者拿到的字典引用不会再被修改
+        self._matches: Dict[str, _MatchState] = {}
+        self._spilled: Dict[str, _SpilledMatch] = {}  # 同样按写时复制替换
+        self._spilling: Set[str] = set()  # 正在写换出文件的对局，受 self._lock 保护，避免被重复选中
+        self._spill_index_lock = Lock()  # 串行化换出索引文件的写入
+        # match_id -> 最近访问时刻，读者直接赋值无需加锁，换出时取最久未访问者
+        self._access_clock = count(1)
+        self._last_access: Dict[str, int] = {}
+        # 按 (created_at, match_id) 升序排列的对局索引，同样写时复制，分页查询用二分定位
+        self._index: List[Tuple[str, str]] = []
+        self._index_keys: Dict[str, Tuple[str, str]] = {}
         self._active_match_id: Optional[str] = None
+        # 对局列表概要（新增对局、阶段与存活玩家）变化时递增，供列表接口生成ETag
+        self._catalog_counter = count(1)
+        self._catalog_version = 0
 
     @property
     def active_match_id(self) -> Optional[str]:
-        with self._lock:
-            return self._active_match_id
+        return self._active_match_id
+
+    def start_match(self, players: List[str], *, seed: Optional[int] = None) -> str:
+        """初始化一局新的对局并返回match_id，新对局成为活跃对局。
 
-    def start_match(self, players: List[str]) -> str:
-        """初始化一局新的对局并返回match_id。"""
+        多局并行时，写入接口应显式传入 match_id，活跃对局只作为未指定时的默认目标。
+        seed 为对局的随机种子，随对局数据与存档保存，用于重跑回放。
+        """
         match_id = uuid4().hex
-        with self._lock:
-            self._active_match_id = match_id
-            self._matches[match_id] = {
-                "created_at": _utc_iso(),
+        snapshot = _MatchSnapshot(
+            match_id=match_id,
+            created_at=_utc_iso(),
+            players=tuple(players),
+            alive_players=tuple(players),
+            dead_players=(),
+            phase=None,
+            round=1,
+            last_seq=0,
+            log=[],
+            log_length=0,
+            updates=[],
+            updates_length=0,
+            extra=MappingProxyType({} if seed is None else {"seed": seed}),
+        )
+        self._journal_append(
+            match_id,
+            {
+                "type": "start",
+                "match_id": match_id,
+                "created_at": snapshot.created_at,
                 "players": list(players),
-                "alive_players": list(players),
-                "dead_players": [],
-                "phase": None,
-                "round": 1,
-                "speech_log": [],
-            }
+                "seed": seed,
+            },
+        )
+        self._register(_MatchState(snapshot), activate=True)
         return match_id
 
-    def set_phase(self, phase: str, round_number: int) -> None:
+    def set_phase(self, phase: str, round_number: int, *, match_id: Optional[str] = None) -> None:
         """记录当前阶段与轮次。"""
-        with self._lock:
-            match = self._get_active_match()
-            if match is None:
-                return
-            match["phase"] = phase
-            match["round"] = round_number
+        state = self._writable_state(match_id)
+        if state is None:
+            return
+        with state.lock:
+            seq = state.next_seq()
+            self._journal_append(
+                state.snapshot.match_id, {"type": "phase", "seq": seq, "phase": phase, "round": round_number}
+            )
+            state.publish(seq, phase=phase, round=round_number)
+        self._bump_catalog()
+        # 日志条目随进行中的对局增长，在阶段切换时顺带检查保留上限
+        self._enforce_retention()
 
-    def update_players(self, alive_players: List[str], dead_players: List[str]) -> None:
+    def update_players(
+        self,
+        alive_players: List[str],
+        dead_players: List[str],
+        *,
+        match_id: Optional[str] = None,
+    ) -> None:
         """同步存活与死亡玩家列表。"""
-        with self._lock:
-            match = self._get_active_match()
-            if match is None:
-                return
-            match["alive_players"] = list(alive_players)
-            match["dead_players"] = list(dead_players)
+        state = self._writable_state(match_id)
+        if state is None:
+            return
+        with state.lock:
+            seq = state.next_seq()
+            self._journal_append(
+                state.snapshot.match_id,
+                {
+                    "type": "players",
+                    "seq": seq,
+                    "alive_players": list(alive_players),
+                    "dead_players": list(dead_players),
+                },
+            )
+            state.publish(
+                seq,
+                alive_players=tuple(alive_players),
+                dead_players=tuple(dead_players),
+            )
+        self._bump_catalog()
 
     def record_speech(
         self,
@@ -67,23 +261,74 @@ class GameStateStore:
         content: str,
         round_number: int,
         phase: str,
+        match_id: Optional[str] = None,
     ) -> None:
         """追加一条玩家发言记录。"""
-        with self._lock:
-            match = self._get_active_match()
-            if match is None:
+        entry = {
+            "player_id": player_id,
+            "role": role,
+            "content": content,
+            "round": round_number,
+            "phase": phase,
+            "speaker_type": "player",
+            "display_name": player_id,
+            "channel": "speech",
+        }
+        self._append_log_entry(entry, match_id)
+
+    def begin_speech(
+        self,
+        *,
+        player_id: str,
+        role: str,
+        round_number: int,
+        phase: str,
+        match_id: Optional[str] = None,
+    ) -> Optional[int]:
+        """追加一条生成中的发言记录，返回其在日志中的下标供后续更新。"""
+        entry = {
+            "player_id": player_id,
+            "role": role,
+            "content": "",
+            "round": round_number,
+            "phase": phase,
+            "speaker_type": "player",
+            "display_name": player_id,
+            "channel": "speech",
+            "status": "streaming",
+        }
+        return self._append_log_entry(entry, match_id)
+
+    def update_speech(
+        self,
+        entry_index: int,
+        content: str,
+        *,
+        final: bool = False,
+        match_id: Optional[str] = None,
+    ) -> None:
+        """更新生成中发言的内容，final 为真时标记为已完成。"""
+        state = self._writable_state(match_id)
+        if state is None:
+            return
+        with state.lock:
+            log = state.snapshot.log
+            if not 0 <= entry_index < len(log):
                 return
-            entry = {
-                "player_id": player_id,
-                "role": role,
-                "content": content,
-                "round": round_number,
-                "phase": phase,
-                "speaker_type": "player",
-                "display_name": player_id,
-                "channel": "speech",
-            }
-            self._append_log_entry(match, entry)
+            # 条目发布后不再修改，更新时整体替换为新字典，已被读者引用的旧条目保持不变
+            entry = dict(log[entry_index])
+            entry["content"] = content
+            if final:
+                entry["status"] = "final"
+            seq = state.next_seq()
+            # 生成中的增量只用于实时观战，日志只记录最终内容
+            if final:
+                self._journal_append(
+                    state.snapshot.match_id, {"type": "update", "seq": seq, "index": entry_index, "entry": entry}
+                )
+            log[entry_index] = entry
+            state.snapshot.updates.append((seq, entry_index))
+            state.publish(seq)
 
     def record_system_event(
         self,
@@ -93,79 +338,518 @@ class GameStateStore:
         round_number: Optional[int] = None,
         phase: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        match_id: Optional[str] = None,
     ) -> None:
         """记录一条系统（上帝）发言。"""
-        with self._lock:
-            match = self._get_active_match()
-            if match is None:
-                return
-            entry: Dict[str, Any] = {
-                "player_id": None,
-                "role": None,
-                "content": content,
-                "round": round_number,
-                "phase": phase,
-                "speaker_type": "system",
-                "display_name": "上帝",
-                "channel": channel,
-            }
-            if metadata:
-                entry["metadata"] = metadata
-            self._append_log_entry(match, entry)
+        entry: Dict[str, Any] = {
+            "player_id": None,
+            "role": None,
+            "content": content,
+            "round": round_number,
+            "phase": phase,
+            "speaker_type": "system",
+            "display_name": "上帝",
+            "channel": channel,
+        }
+        if metadata:
+            entry["metadata"] = metadata
+        self._append_log_entry(entry, match_id)
 
     def list_matches(self) -> List[Dict[str, Any]]:
-        """返回可供观战的对局概要列表。"""
-        with self._lock:
-            results = []
-            for match_id, payload in self._matches.items():
-                results.append(
-                    {
-                        "match_id": match_id,
-                        "created_at": payload.get("created_at"),
-                        "round": payload.get("round"),
-                        "phase": payload.get("phase"),
-                        "alive_players": list(payload.get("alive_players", [])),
-                    }
-                )
-            return results
+        """按创建时间升序返回全部对局概要（含已换出的对局）。"""
+        summaries = (self._summary_of(match_id) for _, match_id in self._index)
+        return [summary for summary in summaries if summary is not None]
+
+    def page_matches(
+        self,
+        *,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        phase: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """按创建时间倒序分页返回对局概要。
+
+        创建时间范围（ISO 8601 字符串，不含端点）与游标通过二分在索引上定位，
+        状态与阶段在定位后的区间内逐条过滤，无过滤条件时开销只与页大小有关。
+        next_cursor 为空表示没有更多结果；游标格式错误时抛出 ValueError。
+        """
+        index = self._index
+        lo, hi = 0, len(index)
+        if cursor:
+            created_at, sep, match_id = cursor.rpartition(_CURSOR_SEPARATOR)
+            if not sep or not match_id:
+                raise ValueError("cursor 格式错误")
+            hi = bisect_left(index, (created_at, match_id))
+        if created_before is not None:
+            hi = min(hi, bisect_left(index, (created_before,)))
+        if created_after is not None:
+            lo = bisect_right(index, (created_after, chr(0x10FFFF)))
+
+        matches: List[Dict[str, Any]] = []
+        next_cursor: Optional[str] = None
+        position = hi
+        while position > lo:
+            position -= 1
+            summary = self._summary_of(index[position][1])
+            if summary is None:
+                continue
+            if status is not None and summary.get("status") != status:
+                continue
+            if phase is not None and summary.get("phase") != phase:
+                continue
+            matches.append(summary)
+            if len(matches) >= limit:
+                if position > lo:
+                    next_cursor = _CURSOR_SEPARATOR.join(index[position])
+                break
+        return {"matches": matches, "next_cursor": next_cursor}
+
+    def catalog_version(self) -> int:
+        """对局列表概要的版本号，列表内容不变时保持不变。"""
+        return self._catalog_version
+
+    def match_version(self, match_id: str) -> Optional[int]:
+        """对局的版本号（即最新序号），对局不存在时返回None。"""
+        state = self._matches.get(match_id)
+        if state is None:
+            spilled = self._spilled.get(match_id)
+            return spilled.last_seq if spilled is not None else None
+        return state.snapshot.last_seq
 
     def get_match(self, match_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """获取指定对局的详细信息。"""
-        with self._lock:
-            resolved_id = match_id or self._active_match_id
-            if resolved_id is None:
-                return None
-            payload = self._matches.get(resolved_id)
-            if payload is None:
-                return None
-            result = deepcopy(payload)
-            result["match_id"] = resolved_id
-            return result
+        resolved_id = match_id or self._active_match_id
+        if resolved_id is None:
+            return None
+        state = self._state_for(resolved_id)
+        if state is None:
+            return None
+        return state.snapshot.to_payload()
+
+    def get_log_since(self, match_id: str, after: int) -> Optional[Dict[str, Any]]:
+        """增量获取日志：返回序号大于 after 的新条目及其后被更新过的旧条目。
+
+        只读取当前快照，响应中的 cursor 作为下次请求的 after。
+        """
+        state = self._state_for(match_id)
+        if state is None:
+            return None
+        snapshot = state.snapshot
+        # 直接在共享日志上二分并按下标取条目，游标之前的部分不做任何拷贝
+        log = snapshot.log
+        start = bisect_right(log, after, hi=snapshot.log_length, key=lambda entry: entry["seq"])
+        updates = snapshot.updates
+        first_update = bisect_right(updates, after, hi=snapshot.updates_length, key=lambda update: update[0])
+        changed = {index for _, index in updates[first_update:snapshot.updates_length] if index < start}
+        indexes = sorted(changed) + list(range(start, snapshot.log_length))
+        return {
+            "match_id": match_id,
+            "cursor": snapshot.last_seq,
+            "phase": snapshot.phase,
+            "round": snapshot.round,
+            "alive_players": list(snapshot.alive_players),
+            "dead_players": list(snapshot.dead_players),
+            "finished_at": snapshot.finished_at,
+            "entries": [log[index] for index in indexes],
+        }
+
+    def wait_for_update(self, match_id: str, after: int, timeout: Optional[float] = None) -> bool:
+        """阻塞直到对局序号超过 after 或超时；对局不存在时立即返回 True。"""
+        state = self._state_for(match_id)
+        if state is None:
+            return True
+        with state.changed:
+            # 导入同名对局或对局被换出都会替换状态对象，此时也视为有更新
+            return state.changed.wait_for(
+                lambda: state.snapshot.last_seq > after or self._matches.get(match_id) is not state,
+                timeout=timeout,
+            )
 
     def import_match(self, payload: Dict[str, Any], *, activate: bool = False) -> str:
-        """导入一局对局数据，返回新的 match_id。"""
+        """导入一局对局数据，返回新的 match_id。
+
+        导入的数据来自存档文件，已持久化在别处，不写入对局日志，重启后也不会被恢复。
+        """
+        match_id = payload.get("match_id") or uuid4().hex
+        snapshot = _snapshot_from_payload(match_id, deepcopy(payload))
+        self._replace(_MatchState(snapshot), activate=activate)
+        return match_id
+
+    def finish_match(self, match_id: str, *, outcome: Optional[Dict[str, Any]] = None) -> None:
+        """标记对局结束，并刷新关闭该局的日志文件。
+
+        outcome 为对局结果（如 winner、roles、teams），并入对局数据一同保存。
+        """
+        state = self._matches.get(match_id)
+        if state is None:
+            return
+        with state.lock:
+            if state.snapshot.finished_at is not None:
+                return
+            seq = state.next_seq()
+            finished_at = _utc_iso()
+            outcome = deepcopy(outcome or {})
+            self._journal_append(
+                match_id, {"type": "finish", "seq": seq, "finished_at": finished_at, "outcome": outcome}
+            )
+            state.publish(
+                seq,
+                finished_at=finished_at,
+                extra=MappingProxyType({**state.snapshot.extra, **outcome}),
+            )
+        self._bump_catalog()
+        archived = False
+        if self._archive is not None:
+            try:
+                self._archive.archive_match(state.snapshot.to_payload())
+                archived = True
+            except Exception:  # noqa: BLE001
+                logger.exception(f"归档对局失败: {match_id}")
+        if self._journal is not None:
+            if archived:
+                self._journal.delete(match_id)
+            else:
+                # 尚未持久化到别处，压缩为一条快照，重启时只需读取一条记录
+                self._journal.rewrite(match_id, [{"type": "snapshot", "payload": state.snapshot.to_payload()}])
+        self._enforce_retention()
+
+    def recover(self) -> List[str]:
+        """重启后恢复对局，返回从日志恢复的 match_id 列表。
+
+        先按换出索引登记上次运行已换出的对局，再回放其余对局日志；已换出或已归档对局的
+        残留日志直接删除。进程中断时仍未结束的对局标记为 interrupted 并结束，之后可正常换出。
+        """
+        self._load_spill_index()
+        if self._journal is None:
+            return []
+        recovered: List[str] = []
+        for match_id, records in self._journal.load_all():
+            if match_id in self._matches:
+                continue
+            if match_id in self._spilled or (
+                self._archive is not None
+                and any(record.get("type") == "finish" for record in records)
+                and self._archive.has_match(match_id)
+            ):
+                # 换出或归档后、删除日志前进程退出留下的日志
+                self._journal.delete(match_id)
+                continue
+            payload = _payload_from_records(records)
+            if payload is None:
+                logger.warning(f"对局日志缺少起始记录，跳过: {match_id}")
+                continue
+            self._register(_MatchState(_snapshot_from_payload(match_id, payload)), activate=False)
+            if payload.get("finished_at") is None:
+                self.finish_match(match_id, outcome={"interrupted": True})
+            recovered.append(match_id)
+        return recovered
+
+    def _replace(self, state: _MatchState, *, activate: bool) -> None:
+        match_id = state.snapshot.match_id
+        previous = self._matches.get(match_id)
+        self._register(state, activate=activate)
+        if previous is not None:
+            with previous.changed:
+                previous.changed.notify_all()
+
+    def _register(self, state: _MatchState, *, activate: bool) -> None:
+        match_id = state.snapshot.match_id
         with self._lock:
-            match_id = payload.get("match_id") or uuid4().hex
-            data = deepcopy(payload)
-            data["match_id"] = match_id
-            self._matches[match_id] = data
+            matches = dict(self._matches)
+            matches[match_id] = state
+            self._matches = matches
+            if match_id in self._spilled:
+                spilled = dict(self._spilled)
+                del spilled[match_id]
+                self._spilled = spilled
+            self._index_match(match_id, state.snapshot.created_at)
             if activate:
                 self._active_match_id = match_id
-            return match_id
-
-    def _append_log_entry(self, match: Dict[str, Any], entry: Dict[str, Any]) -> None:
-        payload = dict(entry)
-        payload.setdefault("timestamp", _utc_iso())
-        payload.setdefault("round", match.get("round"))
-        payload.setdefault("phase", match.get("phase"))
-        payload.setdefault("channel", "speech")
-        if "metadata" in payload and payload["metadata"] is not None:
-            payload["metadata"] = deepcopy(payload["metadata"])
-        payload.setdefault("speaker_type", "player")
-        payload.setdefault("display_name", payload.get("player_id"))
-        match["speech_log"].append(payload)
-
-    def _get_active_match(self) -> Optional[Dict[str, Any]]:
-        if self._active_match_id is None:
+        self._last_access[match_id] = next(self._access_clock)
+        self._bump_catalog()
+        self._enforce_retention(keep=match_id)
+
+    def _index_match(self, match_id: str, created_at: Optional[str]) -> None:
+        # 调用方需持有 self._lock
+        key = (created_at or "", match_id)
+        previous = self._index_keys.get(match_id)
+        if previous == key:
+            return
+        index = list(self._index)
+        if previous is not None:
+            del index[bisect_left(index, previous)]
+        insort(index, key)
+        self._index = index
+        self._index_keys[match_id] = key
+
+    def _summary_of(self, match_id: str) -> Optional[Dict[str, Any]]:
+        state = self._matches.get(match_id)
+        if state is not None:
+            return state.snapshot.summary()
+        spilled = self._spilled.get(match_id)
+        return dict(spilled.summary) if spilled is not None else None
+
+    def _state_for(self, match_id: str) -> Optional[_MatchState]:
+        """取驻留内存的对局状态，已换出的对局从磁盘加载回来。"""
+        state = self._matches.get(match_id)
+        if state is None:
+            spilled = self._spilled.get(match_id)
+            if spilled is None:
+                return None
+            state = self._reload(match_id, spilled)
+            if state is None:
+                return None
+        self._last_access[match_id] = next(self._access_clock)
+        return state
+
+    def _reload(self, match_id: str, spilled: _SpilledMatch) -> Optional[_MatchState]:
+        try:
+            with spilled.path.open("r", encoding="utf-8") as fp:
+                payload = json.load(fp)
+        except (OSError, json.JSONDecodeError):
+            logger.exception(f"加载已换出的对局失败: {spilled.path}")
+            return None
+        state = _MatchState(_snapshot_from_payload(match_id, payload))
+        with self._lock:
+            current = self._matches.get(match_id)
+            if current is not None or self._spilled.get(match_id) is not spilled:
+                # 其他线程已先一步加载或导入了同名对局
+                return current
+            matches = dict(self._matches)
+            matches[match_id] = state
+            self._matches = matches
+            remaining = dict(self._spilled)
+            del remaining[match_id]
+            self._spilled = remaining
+        self._last_access[match_id] = next(self._access_clock)
+        self._enforce_retention(keep=match_id)
+        return state
+
+    def _enforce_retention(self, keep: Optional[str] = None) -> None:
+        """驻留对局超出上限时，按最近访问顺序换出已结束的对局。"""
+        if self._max_matches is None and self._max_entries is None:
+            return
+        while True:
+            with self._lock:
+                victim = self._pick_victim(keep)
+                if victim is None:
+                    return
+                self._spilling.add(victim.snapshot.match_id)
+            try:
+                spilled = self._spill(victim)
+            finally:
+                with self._lock:
+                    self._spilling.discard(victim.snapshot.match_id)
+            if not spilled:
+                return
+
+    def _pick_victim(self, keep: Optional[str]) -> Optional[_MatchState]:
+        # 调用方需持有 self._lock
+        # 其他线程正在换出的对局视为已移出，不再计入上限，也不会被再次选中
+        matches = {match_id: state for match_id, state in self._matches.items() if match_id not in self._spilling}
+        over_matches = self._max_matches is not None and len(matches) > self._max_matches
+        over_entries = self._max_entries is not None and (
+            sum(state.snapshot.log_length for state in matches.values()) > self._max_entries
+        )
+        if not (over_matches or over_entries):
+            return None
+        candidates = [
+            state for match_id, state in matches.items()
+            if state.snapshot.finished_at is not None and match_id not in (keep, self._active_match_id)
+        ]
+        if not candidates:
             return None
-        return self._matches.get(self._active_match_id)
+        return min(candidates, key=lambda state: self._last_access.get(state.snapshot.match_id, 0))
+
+    def _spill(self, state: _MatchState) -> bool:
+        """把已结束的对局写入换出目录并移出内存；写入失败时保留在内存中。"""
+        snapshot = state.snapshot
+        path = self._spill_dir / f"{snapshot.match_id}.json"
+        tmp_path: Optional[Path] = None
+        try:
+            self._spill_dir.mkdir(parents=True, exist_ok=True)
+            # 临时文件名唯一，同一对局即使被重新加载后再次换出也不会与未完成的写入冲突
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self._spill_dir, prefix=f".{snapshot.match_id}.", suffix=".tmp",
+                delete=False,
+            ) as fp:
+                tmp_path = Path(fp.name)
+                json.dump(snapshot.to_payload(), fp, ensure_ascii=False, separators=(",", ":"))
+            tmp_path.replace(path)
+        except OSError:
+            logger.exception(f"换出对局失败: {snapshot.match_id}")
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            return False
+        with self._lock:
+            if self._matches.get(snapshot.match_id) is not state:
+                return True
+            matches = dict(self._matches)
+            del matches[snapshot.match_id]
+            self._matches = matches
+            spilled = dict(self._spilled)
+            spilled[snapshot.match_id] = _SpilledMatch(snapshot.summary(), snapshot.last_seq, path)
+            self._spilled = spilled
+        with state.changed:
+            state.changed.notify_all()
+        self._record_spill(snapshot.match_id, spilled[snapshot.match_id])
+        if self._journal is not None:
+            self._journal.delete(snapshot.match_id)
+        return True
+
+    def _spill_index_path(self) -> Path:
+        return self._spill_dir / _SPILL_INDEX_NAME
+
+    def _record_spill(self, match_id: str, spilled: _SpilledMatch) -> None:
+        """把换出对局写入索引文件。
+
+        重新加载回内存的对局其换出文件仍然有效，索引中保留该项，重启后仍可按需加载。
+        """
+        with self._spill_index_lock:
+            index = self._read_spill_index()
+            index[match_id] = {"summary": spilled.summary, "last_seq": spilled.last_seq, "file": spilled.path.name}
+            path = self._spill_index_path()
+            tmp_path = path.with_name(path.name + ".tmp")
+            try:
+                with tmp_path.open("w", encoding="utf-8") as fp:
+                    json.dump(index, fp, ensure_ascii=False, separators=(",", ":"))
+                tmp_path.replace(path)
+            except OSError:
+                logger.exception(f"写入换出索引失败: {path}")
+
+    def _read_spill_index(self) -> Dict[str, Any]:
+        path = self._spill_index_path()
+        if not path.exists():
+            return {}
+        try:
+            with path.open("r", encoding="utf-8") as fp:
+                return json.load(fp)
+        except (OSError, json.JSONDecodeError):
+            logger.exception(f"读取换出索引失败: {path}")
+            return {}
+
+    def _load_spill_index(self) -> None:
+        """按索引登记上次运行换出的对局，换出文件已丢失的项跳过。"""
+        if self._spill_dir is None:
+            return
+        with self._spill_index_lock:
+            index = self._read_spill_index()
+        with self._lock:
+            spilled = dict(self._spilled)
+            for match_id, item in index.items():
+                path = self._spill_dir / item["file"]
+                if match_id in self._matches or match_id in spilled or not path.exists():
+                    continue
+                spilled[match_id] = _SpilledMatch(item["summary"], item["last_seq"], path)
+                self._index_match(match_id, item["summary"].get("created_at"))
+            self._spilled = spilled
+        self._bump_catalog()
+
+    def _append_log_entry(self, entry: Dict[str, Any], match_id: Optional[str] = None) -> Optional[int]:
+        """追加日志条目并发布快照，返回条目下标；对局不存在时返回None。"""
+        state = self._writable_state(match_id)
+        if state is None:
+            return None
+        with state.lock:
+            snapshot = state.snapshot
+            payload = dict(entry)
+            payload.setdefault("timestamp", _utc_iso())
+            payload.setdefault("round", snapshot.round)
+            payload.setdefault("phase", snapshot.phase)
+            payload.setdefault("channel", "speech")
+            if "metadata" in payload and payload["metadata"] is not None:
+                payload["metadata"] = deepcopy(payload["metadata"])
+            payload.setdefault("speaker_type", "player")
+            payload.setdefault("display_name", payload.get("player_id"))
+            payload["seq"] = seq = state.next_seq()
+            self._journal_append(snapshot.match_id, {"type": "entry", "entry": payload})
+            snapshot.log.append(payload)
+            state.publish(seq)
+            return len(snapshot.log) - 1
+
+    def _journal_append(self, match_id: str, record: Dict[str, Any]) -> None:
+        # 在对局锁内调用，保证日志顺序与序号一致
+        if self._journal is not None:
+            self._journal.append(match_id, record)
+
+    def _bump_catalog(self) -> None:
+        # count 的 next 在 CPython 中是原子的，不同对局的写入无需互斥
+        self._catalog_version = next(self._catalog_counter)
+
+    def _writable_state(self, match_id: Optional[str]) -> Optional[_MatchState]:
+        """写入目标：指定的对局，未指定时为活跃对局。"""
+        resolved_id = match_id or self._active_match_id
+        if resolved_id is None:
+            return None
+        return self._matches.get(resolved_id)
+
+
+def _snapshot_from_payload(match_id: str, data: Dict[str, Any]) -> _MatchSnapshot:
+    log: List[Dict[str, Any]] = data.get("speech_log") or []
+    # 旧存档没有序号时按顺序补齐
+    if any("seq" not in entry for entry in log):
+        for seq, entry in enumerate(log, 1):
+            entry["seq"] = seq
+    return _MatchSnapshot(
+        match_id=match_id,
+        created_at=data.get("created_at"),
+        players=tuple(data.get("players", [])),
+        alive_players=tuple(data.get("alive_players", [])),
+        dead_players=tuple(data.get("dead_players", [])),
+        phase=data.get("phase"),
+        round=data.get("round"),
+        last_seq=max([data.get("last_seq") or 0] + [entry["seq"] for entry in log]),
+        log=log,
+        log_length=len(log),
+        updates=[],
+        updates_length=0,
+        finished_at=data.get("finished_at"),
+        extra=MappingProxyType({k: v for k, v in data.items() if k not in _SNAPSHOT_KEYS}),
+    )
+
+
+def _payload_from_records(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """按顺序回放对局日志记录，得到与 get_match 相同结构的数据；缺少起始记录时返回None。"""
+    payload: Optional[Dict[str, Any]] = None
+    for record in records:
+        kind = record.get("type")
+        if kind == "start":
+            payload = {
+                "created_at": record.get("created_at"),
+                "players": record.get("players", []),
+                "alive_players": record.get("players", []),
+                "dead_players": [],
+                "phase": None,
+                "round": 1,
+                "speech_log": [],
+                "last_seq": 0,
+            }
+            if record.get("seed") is not None:
+                payload["seed"] = record["seed"]
+            continue
+        if kind == "snapshot":
+            payload = record["payload"]
+            continue
+        if payload is None:
+            continue
+        if kind == "phase":
+            payload["phase"] = record.get("phase")
+            payload["round"] = record.get("round")
+        elif kind == "players":
+            payload["alive_players"] = record.get("alive_players", [])
+            payload["dead_players"] = record.get("dead_players", [])
+        elif kind == "entry":
+            payload["speech_log"].append(record["entry"])
+        elif kind == "update":
+            index = record.get("index", -1)
+            if 0 <= index < len(payload["speech_log"]):
+                payload["speech_log"][index] = record["entry"]
+        elif kind == "finish":
+            payload["finished_at"] = record.get("finished_at")
+            payload.update(record.get("outcome") or {})
+        seq = record.get("seq") or record.get("entry", {}).get("seq") or 0
+        payload["last_seq"] = max(payload.get("last_seq") or 0, seq)
+    return payload
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    created_at TEXT,
+    finished_at TEXT,
+    rounds INTEGER,
+    winner TEXT,
+    player_count INTEGER,
+    entry_count INTEGER
+);
+CREATE TABLE IF NOT EXISTS players (
+    match_id TEXT NOT NULL REFERENCES matches(match_id) ON DELETE CASCADE,
+    player_id TEXT NOT NULL,
+    role TEXT,
+    team TEXT,
+    alive INTEGER NOT NULL,
+    PRIMARY KEY (match_id, player_id)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    match_id TEXT NOT NULL REFERENCES matches(match_id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    round INTEGER,
+    phase TEXT,
+    channel TEXT,
+    speaker_type TEXT,
+    player_id TEXT,
+    target_id TEXT,
+    role TEXT,
+    content TEXT,
+    metadata TEXT,
+    timestamp TEXT,
+    PRIMARY KEY (match_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_matches_created_at ON matches(created_at);
+CREATE INDEX IF NOT EXISTS idx_players_role ON players(role);
+CREATE INDEX IF NOT EXISTS idx_entries_round ON entries(match_id, round);
+CREATE INDEX IF NOT EXISTS idx_entries_channel ON entries(channel, match_id);
+CREATE INDEX IF NOT EXISTS idx_entries_player ON entries(player_id, match_id);
+"""
+
+_ENTRY_COLUMNS = (
+    "seq", "round", "phase", "channel", "speaker_type", "player_id",
+    "target_id", "role", "content", "metadata", "timestamp",
+)
+
+
+class MatchArchive:
+    """基于 SQLite 的已结束对局归档，按对局、轮次、频道与玩家建索引，供统计查询直接使用。
+
+    每个线程持有独立连接，数据库使用 WAL 模式，写入归档时不阻塞并发查询。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def archive_match(self, payload: Dict[str, Any]) -> None:
+        """写入（或覆盖）一局对局的概要、玩家与全部日志条目。"""
+        match_id = payload["match_id"]
+        log = payload.get("speech_log", [])
+        roles = payload.get("roles") or {}
+        teams = payload.get("teams") or {}
+        alive = set(payload.get("alive_players", []))
+        players = list(payload.get("players", [])) or sorted(set(roles) | alive)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+            conn.execute(
+                "INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    match_id,
+                    payload.get("created_at"),
+                    payload.get("finished_at"),
+                    payload.get("round"),
+                    payload.get("winner"),
+                    len(players),
+                    len(log),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO players VALUES (?, ?, ?, ?, ?)",
+                [
+                    (match_id, player_id, roles.get(player_id), teams.get(player_id), int(player_id in alive))
+                    for player_id in players
+                ],
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO entries (match_id, {', '.join(_ENTRY_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in _ENTRY_COLUMNS)})",
+                (_entry_row(match_id, entry) for entry in log),
+            )
+
+    def has_match(self, match_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM matches WHERE match_id = ?", (match_id,)))
+
+    def list_matches(self, *, limit: int = 50, offset: int = 0, winner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按创建时间倒序列出归档对局概要。"""
+        sql = "SELECT * FROM matches"
+        params: List[Any] = []
+        if winner is not None:
+            sql += " WHERE winner = ?"
+            params.append(winner)
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        return self._query(sql, params)
+
+    def get_entries(
+        self,
+        match_id: str,
+        *,
+        round_number: Optional[int] = None,
+        channel: Optional[str] = None,
+        player_id: Optional[str] = None,
+        limit: int = 500,
+        after: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """按轮次、频道、玩家过滤某局的日志条目，after 为上一页最后一条的序号。"""
+        clauses = ["match_id = ?", "seq > ?"]
+        params: List[Any] = [match_id, after]
+        for column, value in (("round", round_number), ("channel", channel), ("player_id", player_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        sql = f"SELECT * FROM entries WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?"
+        params.append(limit)
+        rows = self._query(sql, params)
+        for row in rows:
+            row["metadata"] = json.loads(row["metadata"]) if row["metadata"] else None
+        return rows
+
+    def role_win_rates(self) -> List[Dict[str, Any]]:
+        """各角色在有胜负结果的对局中的出场次数与胜率。"""
+        rows = self._query(
+            """
+            SELECT p.role AS role,
+                   COUNT(*) AS games,
+                   SUM(CASE WHEN p.team = m.winner THEN 1 ELSE 0 END) AS wins
+            FROM players p JOIN matches m ON m.match_id = p.match_id
+            WHERE m.winner IS NOT NULL AND p.role IS NOT NULL
+            GROUP BY p.role
+            ORDER BY p.role
+            """
+        )
+        for row in rows:
+            row["win_rate"] = row["wins"] / row["games"] if row["games"] else 0.0
+        return rows
+
+    def vote_patterns(self) -> List[Dict[str, Any]]:
+        """按投票者角色与被投者角色统计的投票次数。"""
+        return self._query(
+            """
+            SELECT voter.role AS voter_role, target.role AS target_role, COUNT(*) AS votes
+            FROM entries e
+            JOIN players voter ON voter.match_id = e.match_id AND voter.player_id = e.player_id
+            JOIN players target ON target.match_id = e.match_id AND target.player_id = e.target_id
+            WHERE e.channel = 'vote'
+            GROUP BY voter.role, target.role
+            ORDER BY votes DESC
+            """
+        )
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _query(self, sql: str, params: Any = ()) -> List[Dict[str, Any]]:
+        cursor = self._connect().execute(sql, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+
+def _entry_row(match_id: str, entry: Dict[str, Any]) -> Tuple[Any, ...]:
+    metadata = entry.get("metadata") or {}
+    # 投票、放逐等系统事件的当事人记录在 metadata 中
+    player_id = entry.get("player_id") or metadata.get("from")
+    target_id = metadata.get("to") or metadata.get("target")
+    return (
+        match_id,
+        entry.get("seq"),
+        entry.get("round"),
+        entry.get("phase"),
+        entry.get("channel"),
+        entry.get("speaker_type"),
+        player_id,
+        target_id,
+        entry.get("role"),
+        entry.get("content"),
+        json.dumps(metadata, ensure_ascii=False) if metadata else None,
+        entry.get("timestamp"),
+    )
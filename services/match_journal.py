@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from utils.logger import logger
+
+FSYNC_POLICIES = {"always", "interval", "never"}
+
+
+class _JournalFile:
+    """单局日志文件句柄，写入经过缓冲，按策略刷盘。"""
+
+    def __init__(self, path: Path, mode: str) -> None:
+        self.path = path
+        self.lock = Lock()
+        self.fp: IO[str] = path.open(mode, encoding="utf-8")
+        self.last_sync = time.monotonic()
+        self.dirty = False  # 有已写入但尚未 fsync 的记录
+
+    def sync(self) -> None:
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.last_sync = time.monotonic()
+        self.dirty = False
+
+
+class MatchJournal:
+    """按对局追加写入的 JSON Lines 日志，用于进程崩溃后重建状态存储。
+
+    每条记录写入后都会 flush 到操作系统，进程崩溃不会丢失已追加的记录；fsync 策略决定
+    机器掉电或系统崩溃时的丢失窗口：
+    - always: 每条记录写入后立即 fsync，最安全也最慢
+    - interval: 写入时距上次 fsync 超过 fsync_interval 秒则立即 fsync，另有后台线程每隔
+      fsync_interval 秒同步仍有未落盘记录的文件，写入停顿时也不会无限期积压，最多丢失约两个间隔内的记录
+    - never: 不主动 fsync，由操作系统决定何时落盘
+    """
+
+    def __init__(self, directory: Path, *, fsync: str = "interval", fsync_interval: float = 1.0) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"不支持的日志刷盘策略: {fsync}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = Lock()
+        self._files: Dict[str, _JournalFile] = {}
+        self._stopped = Event()
+        self._syncer: Optional[Thread] = None
+        if fsync == "interval":
+            self._syncer = Thread(target=self._sync_loop, name="match-journal-fsync", daemon=True)
+            self._syncer.start()
+
+    def path_for(self, match_id: str) -> Path:
+        return self.directory / f"{match_id}.jsonl"
+
+    def append(self, match_id: str, record: Dict[str, Any]) -> None:
+        """追加一条记录，按需打开对局日志文件。"""
+        journal_file = self._open(match_id)
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with journal_file.lock:
+            journal_file.fp.write(line)
+            journal_file.fp.flush()
+            journal_file.dirty = True
+            if self.fsync == "always" or (
+                self.fsync == "interval"
+                and time.monotonic() - journal_file.last_sync >= self.fsync_interval
+            ):
+                journal_file.sync()
+
+    def rewrite(self, match_id: str, records: List[Dict[str, Any]]) -> None:
+        """用给定记录覆盖对局日志并关闭文件，用于导入完整对局数据。"""
+        self.close(match_id)
+        journal_file = _JournalFile(self.path_for(match_id), "w")
+        with journal_file.lock:
+            for record in records:
+                journal_file.fp.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            if self.fsync != "never":
+                journal_file.sync()
+            journal_file.fp.close()
+
+    def delete(self, match_id: str) -> None:
+        """关闭并删除对局日志，对局已持久化到换出文件或归档后调用。"""
+        with self._lock:
+            journal_file = self._files.pop(match_id, None)
+        if journal_file is not None:
+            with journal_file.lock:
+                journal_file.fp.close()
+        self.path_for(match_id).unlink(missing_ok=True)
+
+    def close(self, match_id: str) -> None:
+        """刷新并关闭对局日志文件，对局结束时调用。"""
+        with self._lock:
+            journal_file = self._files.pop(match_id, None)
+        if journal_file is None:
+            return
+        with journal_file.lock:
+            if self.fsync == "never":
+                journal_file.fp.flush()
+            else:
+                journal_file.sync()
+            journal_file.fp.close()
+
+    def close_all(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            match_ids = list(self._files)
+        for match_id in match_ids:
+            self.close(match_id)
+
+    def _sync_loop(self) -> None:
+        """interval 策略的后台同步：定期 fsync 有未落盘记录且超过间隔的文件。"""
+        while not self._stopped.wait(self.fsync_interval):
+            with self._lock:
+                journal_files = list(self._files.values())
+            for journal_file in journal_files:
+                with journal_file.lock:
+                    if (
+                        journal_file.dirty
+                        and not journal_file.fp.closed
+                        and time.monotonic() - journal_file.last_sync >= self.fsync_interval
+                    ):
+                        journal_file.sync()
+
+    def load_all(self) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """按文件修改时间顺序读出所有对局日志。"""
+        paths = sorted(self.directory.glob("*.jsonl"), key=lambda path: path.stat().st_mtime)
+        for path in paths:
+            records = self._read(path)
+            if records:
+                yield path.stem, records
+
+    def _open(self, match_id: str) -> _JournalFile:
+        with self._lock:
+            journal_file = self._files.get(match_id)
+            if journal_file is None:
+                journal_file = _JournalFile(self.path_for(match_id), "a")
+                self._files[match_id] = journal_file
+            return journal_file
+
+    @staticmethod
+    def _read(path: Path) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        with path.open("r", encoding="utf-8") as fp:
+            for line_no, line in enumerate(fp, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 崩溃时最后一行可能只写了一半
+                    logger.warning(f"跳过损坏的对局日志记录: {path}:{line_no}")
+        return records
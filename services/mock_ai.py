@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+LatencySampler = Callable[[random.Random], float]
+
+DEFAULT_SPEECHES = [
+    "我是好人，昨晚没有拿到有效信息，先听听后面玩家的发言。",
+    "我觉得 {target} 的发言有些可疑，建议大家重点关注。",
+    "我暂时没有明确的怀疑对象，投票时会结合大家的意见。",
+    "{target} 的站边前后矛盾，我这轮倾向于投他。",
+]
+
+_ALIVE_PATTERN = re.compile(r"存活玩家:\s*(.*)")
+_SELF_PATTERN = re.compile(r"你是玩家\s*(\S+?)，")
+_TEAM_PATTERN = re.compile(r"全体成员:\s*(.*?)。")
+
+
+def stream_chunks(content: str, model: Optional[str] = None, size: int = 4) -> Iterator[SimpleNamespace]:
+    """把完整内容切成与 OpenAI 流式接口结构一致的增量片段"""
+    for start in range(0, len(content), size):
+        delta = SimpleNamespace(role="assistant", content=content[start:start + size])
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)],
+            model=model,
+        )
+
+
+def parse_latency(spec: Optional[str]) -> LatencySampler:
+    """解析延迟分布描述，返回采样函数（单位：秒）
+
+    支持 ``fixed:0.2``、``uniform:0.1,0.5``、``gauss:0.3,0.05``，空值表示无延迟。
+    """
+    if not spec:
+        return lambda rng: 0.0
+    kind, _, raw_args = spec.partition(":")
+    args = [float(value) for value in raw_args.split(",") if value.strip()]
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0]
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "gauss" and len(args) == 2:
+        return lambda rng: max(rng.gauss(args[0], args[1]), 0.0)
+    raise ValueError(f"无法解析的模拟延迟配置: {spec}")
+
+
+class MockChatClient:
+    """离线模拟的聊天补全客户端，接口与 OpenAI 客户端的 chat.completions.create 一致
+
+    每次调用的结果只由种子与提示内容决定，与调用顺序和并发无关，便于复现。
+    """
+
+    def __init__(
+        self,
+        *,
+        seed: Optional[str] = None,
+        abstain_rate: Optional[float] = None,
+        speeches: Optional[List[str]] = None,
+        latency: Optional[LatencySampler] = None,
+    ) -> None:
+        self.seed = seed if seed is not None else os.getenv("AI_MOCK_SEED", "0")
+        self.abstain_rate = (
+            abstain_rate if abstain_rate is not None else float(os.getenv("AI_MOCK_ABSTAIN_RATE", "0"))
+        )
+        env_speeches = [s for s in os.getenv("AI_MOCK_SPEECHES", "").split("|") if s]
+        self.speeches = speeches or env_speeches or list(DEFAULT_SPEECHES)
+        self.latency = latency or parse_latency(os.getenv("AI_MOCK_LATENCY"))
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs: Any) -> Any:
+        rng = self._rng_for(kwargs)
+        delay = self.latency(rng)
+        if delay > 0:
+            time.sleep(delay)
+        response = self._complete(kwargs, rng)
+        if kwargs.get("stream"):
+            return stream_chunks(response.choices[0].message.content, kwargs.get("model"))
+        return response
+
+    def close(self) -> None:
+        """与真实客户端保持一致，模拟客户端无需释放资源"""
+
+    def _complete(self, kwargs: Dict[str, Any], rng: random.Random) -> SimpleNamespace:
+        prompt = kwargs["messages"][-1]["content"]
+        if '"target_id"' in prompt:
+            content = json.dumps({"target_id": self._pick_target(prompt, rng)})
+        else:
+            target = self._pick_target(prompt, rng) or "大家"
+            content = rng.choice(self.speeches).format(target=target)
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+            model=kwargs.get("model"),
+        )
+
+    def _pick_target(self, prompt: str, rng: random.Random) -> Optional[str]:
+        if self.abstain_rate and rng.random() < self.abstain_rate:
+            return None
+        alive_match = _ALIVE_PATTERN.search(prompt)
+        if not alive_match:
+            return None
+        excluded = set()
+        self_match = _SELF_PATTERN.search(prompt)
+        if self_match:
+            excluded.add(self_match.group(1))
+        team_match = _TEAM_PATTERN.search(prompt)
+        if team_match:
+            excluded.update(pid.strip() for pid in team_match.group(1).split(","))
+        candidates = [
+            pid.strip() for pid in alive_match.group(1).split(",")
+            if pid.strip() and pid.strip() not in excluded
+        ]
+        return rng.choice(candidates) if candidates else None
+
+    def _rng_for(self, kwargs: Dict[str, Any]) -> random.Random:
+        digest = hashlib.sha256(
+            json.dumps(kwargs.get("messages", []), ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return random.Random(f"{self.seed}:{digest}")
+
+
+class MockAsyncChatClient(MockChatClient):
+    """MockChatClient 的异步版本，延迟通过 asyncio.sleep 模拟"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.acreate))
+
+    async def acreate(self, **kwargs: Any) -> Any:
+        rng = self._rng_for(kwargs)
+        delay = self.latency(rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        response = self._complete(kwargs, rng)
+        if kwargs.get("stream"):
+            return _async_iter(stream_chunks(response.choices[0].message.content, kwargs.get("model")))
+        return response
+
+
+async def _async_iter(chunks: Iterator[SimpleNamespace]):
+    for chunk in chunks:
+        yield chunk
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+
+class PromptLayout:
+    """按前缀缓存友好的顺序组织用户提示
+
+    顺序为：公共游戏状态 → 玩家私有信息 → 本次调用指令。静态规则放在
+    system 消息里位于最前，因此同一阶段内连续调用的玩家共享
+    “静态规则 + 公共状态” 这一段前缀，推理服务端的前缀/KV缓存可以复用。
+    """
+
+    def __init__(self, public: List[str], private: List[str], instruction: List[str]) -> None:
+        self.public = [line for line in public if line]
+        self.private = [line for line in private if line]
+        self.instruction = [line for line in instruction if line]
+
+    def render(self) -> str:
+        return "\n\n".join(
+            "\n".join(section)
+            for section in (self.public, self.private, self.instruction)
+            if section
+        )
+
+
+class PrefixReuseTracker:
+    """统计同一对局内相邻两次同类请求之间实际可复用的提示前缀长度
+
+    按 (match_id, 请求类型) 分别记录上一次请求，多局并行或同一服务被多局共享时，
+    不会拿其他对局的提示来比较；只保留最近 max_keys 个键的上一次请求文本。
+    """
+
+    def __init__(self, max_keys: int = 1024) -> None:
+        self._lock = Lock()
+        self._max_keys = max_keys
+        self._last: "OrderedDict[Tuple[Optional[str], str], str]" = OrderedDict()
+        self._reused: Dict[str, int] = {}
+        self._total: Dict[str, int] = {}
+
+    def observe(self, match_id: Optional[str], kind: str, text: str) -> int:
+        """记录一次请求，返回与同一对局上一次同类请求的公共前缀长度"""
+        key = (match_id, kind)
+        with self._lock:
+            previous = self._last.pop(key, "")
+            reused = len(os.path.commonprefix([previous, text]))
+            self._last[key] = text
+            if len(self._last) > self._max_keys:
+                self._last.popitem(last=False)
+            self._reused[kind] = self._reused.get(kind, 0) + reused
+            self._total[kind] = self._total.get(kind, 0) + len(text)
+            return reused
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """按请求类型汇总复用字符数、总字符数与复用率"""
+        with self._lock:
+            return {
+                kind: {
+                    "reused_chars": self._reused[kind],
+                    "total_chars": self._total[kind],
+                    "reuse_ratio": self._reused[kind] / self._total[kind] if self._total[kind] else 0.0,
+                }
+                for kind in self._total
+            }
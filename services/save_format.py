@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, Optional
+
+SAVE_FORMATS = {"json", "jsonl.gz"}
+FORMAT_NAME = "llm-lrs-match"
+FORMAT_VERSION = 1
+
+
+def format_of(path: Path) -> str:
+    """根据文件名后缀判断存档格式。"""
+    return "jsonl.gz" if Path(path).name.endswith(".jsonl.gz") else "json"
+
+
+def write_match(path: Path, payload: Dict[str, Any]) -> None:
+    """按后缀对应的格式写入存档，先写临时文件再替换，写入中断不会留下半个存档。
+
+    jsonl.gz 格式第一行是不含日志的头部记录，之后每行一条日志条目，逐条压缩写出。
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if format_of(path) == "json":
+        with tmp_path.open("w", encoding="utf-8") as fp:
+            json.dump(payload, fp, ensure_ascii=False, indent=2)
+    else:
+        log = payload.get("speech_log", [])
+        header = {key: value for key, value in payload.items() if key != "speech_log"}
+        header.update({"format": FORMAT_NAME, "version": FORMAT_VERSION, "entry_count": len(log)})
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as fp:
+            _write_line(fp, header)
+            for entry in log:
+                _write_line(fp, entry)
+    os.replace(tmp_path, path)
+
+
+def read_match(path: Path, *, limit: Optional[int] = None) -> Dict[str, Any]:
+    """读取存档，limit 给定时只读取前 limit 条日志。
+
+    jsonl.gz 格式边解压边解析，读取前 N 条的开销与 N 成正比，与文件大小无关。
+    """
+    if format_of(path) == "json":
+        payload = _read_json(path)
+        if limit is not None:
+            payload["speech_log"] = payload.get("speech_log", [])[:limit]
+        return payload
+    with gzip.open(path, "rt", encoding="utf-8") as fp:
+        header = _read_header_line(fp, path)
+        for key in ("format", "version", "entry_count"):
+            header.pop(key, None)
+        header["speech_log"] = list(islice(_iter_lines(fp), limit))
+        return header
+
+
+def _read_header_line(fp: IO[str], path: Path) -> Dict[str, Any]:
+    header = json.loads(fp.readline() or "null")
+    if not isinstance(header, dict) or header.get("format") != FORMAT_NAME:
+        raise ValueError(f"无法识别的存档格式: {path}")
+    if header.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"存档版本过新: {path}")
+    return header
+
+
+def _iter_lines(fp: IO[str]) -> Iterator[Dict[str, Any]]:
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    with Path(path).open("r", encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def _write_line(fp: IO[str], record: Dict[str, Any]) -> None:
+    fp.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+    fp.write("\n")
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+_SENTENCE_END = re.compile(r"[。！？!?\n]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本token数：中日韩字符按1个计，其余字符按4个折1个"""
+    cjk = sum(1 for ch in text if "　" <= ch <= "鿿" or "＀" <= ch <= "￯")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class SpeechContextBuilder:
+    """在token预算内组装发言历史上下文
+
+    最近的 recent_count ~ 2*recent_count-1 条发言原文保留，本轮更早的发言与往轮发言折叠为摘要；
+    recent_count 为 0 时不保留原文，全部折叠为摘要。
+    往轮摘要不会再变化，缓存在 game_state['speech_summaries'] 中按轮次复用。
+    """
+
+    def __init__(self, max_tokens: int = 2000, recent_count: int = 6, summary_chars: int = 40) -> None:
+        if recent_count < 0:
+            raise ValueError(f"保留原文的发言条数不能为负数: {recent_count}")
+        self.max_tokens = max_tokens
+        self.recent_count = recent_count
+        self.summary_chars = summary_chars
+
+    @classmethod
+    def from_env(cls) -> "SpeechContextBuilder":
+        return cls(
+            max_tokens=int(os.getenv("AI_SPEECH_CONTEXT_TOKENS", "2000")),
+            recent_count=int(os.getenv("AI_SPEECH_RECENT_COUNT", "6")),
+        )
+
+    def build(self, game_state: Dict[str, Any]) -> str:
+        """返回可直接拼入提示的发言历史文本，无历史时返回空串"""
+        current: List[Dict[str, Any]] = list(game_state.get('speech_history', []))
+        # 折叠边界按 recent_count 整块推进，相邻发言者之间前缀保持不变，利于服务端前缀缓存
+        if self.recent_count == 0:
+            split = len(current)
+        else:
+            split = max((len(current) - self.recent_count) // self.recent_count, 0) * self.recent_count
+        older, recent = current[:split], current[split:]
+
+        # 最近发言原文优先；超出预算时把最早的几条也折叠进摘要
+        verbatim_lines = [self._verbatim(speech) for speech in recent]
+        budget = self.max_tokens
+        while verbatim_lines and sum(estimate_tokens(line) for line in verbatim_lines) > budget:
+            verbatim_lines.pop(0)
+            older.append(recent.pop(0))
+        budget -= sum(estimate_tokens(line) for line in verbatim_lines)
+
+        sections: List[str] = []
+        if older:
+            older_text = "本轮早前发言摘要:\n" + self._summarize(older)
+            if estimate_tokens(older_text) <= budget:
+                sections.append(older_text)
+                budget -= estimate_tokens(older_text)
+
+        # 往轮摘要从最近一轮往前放，直到预算用完
+        past_lines: List[str] = []
+        for round_number, summary in reversed(list(self._past_round_summaries(game_state).items())):
+            line = f"第{round_number}轮: {summary}"
+            if estimate_tokens(line) > budget:
+                break
+            past_lines.insert(0, line)
+            budget -= estimate_tokens(line)
+        if past_lines:
+            sections.insert(0, "往轮发言摘要:\n" + "\n".join(past_lines))
+
+        if verbatim_lines:
+            sections.append("发言历史:\n" + "\n".join(verbatim_lines))
+        if not sections:
+            return ""
+        return "\n" + "\n".join(sections) + "\n"
+
+    def _past_round_summaries(self, game_state: Dict[str, Any]) -> "OrderedDict[int, str]":
+        current_round = game_state.get('round_number')
+        by_round: Dict[int, List[Dict[str, Any]]] = {}
+        for speech in game_state.get('speech_archive', []):
+            if speech.get('round') != current_round:
+                by_round.setdefault(speech.get('round'), []).append(speech)
+
+        cache: Dict[int, str] = game_state.setdefault('speech_summaries', {})
+        summaries: "OrderedDict[int, str]" = OrderedDict()
+        for round_number in sorted(by_round):
+            if round_number not in cache:
+                cache[round_number] = self._summarize(by_round[round_number], separator="; ")
+            summaries[round_number] = cache[round_number]
+        return summaries
+
+    def _summarize(self, speeches: List[Dict[str, Any]], separator: str = "\n") -> str:
+        return separator.join(
+            f"玩家{speech['player_id']}: {self._first_sentence(speech['content'])}" for speech in speeches
+        )
+
+    def _first_sentence(self, content: str) -> str:
+        text = content.split("</think>")[-1].strip()
+        match = _SENTENCE_END.search(text)
+        sentence = text[:match.start()] if match else text
+        if len(sentence) > self.summary_chars:
+            return sentence[:self.summary_chars] + "…"
+        return sentence
+
+    @staticmethod
+    def _verbatim(speech: Dict[str, Any]) -> str:
+        return f"玩家{speech['player_id']}({speech['role']}): {speech['content']}"
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from copy import deepcopy
+from dataclasses import asdict, dataclass, field
+from itertools import product
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.engine.game_loop import GameLoop
+from services.ai_decision import AIDecisionService
+from utils.logger import logger
+
+# 锦标赛矩阵中模型配置可覆盖的环境变量，对应 AIDecisionService 读取的配置
+_MODEL_ENV_KEYS = {"provider": "AI_PROVIDER", "model": "AI_MODEL_NAME"}
+
+# 工作进程内按模型缓存的决策服务，同一进程内的对局共享连接池
+_WORKER_SERVICES: Dict[Tuple[Tuple[str, str], ...], AIDecisionService] = {}
+
+
+@dataclass(frozen=True)
+class MatchSpec:
+    """锦标赛中的一局：角色配置、模型与种子的一个组合。"""
+
+    index: int
+    distribution: str
+    role_distribution: Dict[str, int]
+    model: str
+    model_env: Dict[str, str]
+    seed: int
+
+    @property
+    def cell(self) -> str:
+        return f"{self.distribution}/{self.model}"
+
+
+@dataclass
+class _CellStats:
+    games: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    rounds: int = 0
+    wins: Counter = field(default_factory=Counter)
+    role_games: Counter = field(default_factory=Counter)
+    role_wins: Counter = field(default_factory=Counter)
+    latencies: List[float] = field(default_factory=list)
+
+
+def expand_matrix(matrix: Dict[str, Any]) -> List[MatchSpec]:
+    """把配置矩阵展开成对局列表。
+
+    矩阵格式::
+
+        {
+          "role_distributions": {"standard": {"werewolf": 3, "villager": 5, ...}},
+          "models": [{"name": "mock", "provider": "mock", "env": {"AI_MOCK_LATENCY": "fixed:0"}}],
+          "seeds": [1, 2, 3],   # 或 "games": 100，等价于种子 0..99
+        }
+
+    每个角色配置与模型的组合各自跑一遍全部种子；玩家人数取角色数之和。
+    """
+    distributions = matrix.get("role_distributions") or {}
+    models = matrix.get("models") or [{"name": "default"}]
+    if not distributions:
+        raise ValueError("锦标赛矩阵缺少 role_distributions")
+    if "seeds" in matrix:
+        seeds = [int(seed) for seed in matrix["seeds"]]
+    else:
+        seeds = list(range(int(matrix.get("games", 1))))
+    if not seeds:
+        raise ValueError("锦标赛矩阵至少需要一局对局")
+
+    specs: List[MatchSpec] = []
+    for (dist_name, distribution), model, seed in product(distributions.items(), models, seeds):
+        if sum(distribution.values()) < 2:
+            raise ValueError(f"角色配置 {dist_name} 至少需要两名玩家")
+        specs.append(
+            MatchSpec(
+                index=len(specs),
+                distribution=dist_name,
+                role_distribution=dict(distribution),
+                model=model.get("name") or model.get("model") or model.get("provider", "default"),
+                model_env=_model_env(model),
+                seed=seed,
+            )
+        )
+    return specs
+
+
+def run_match(spec: MatchSpec, base_config: Dict[str, Any], game_timeout: Optional[float] = None) -> Dict[str, Any]:
+    """在当前进程内以模拟模式跑完一局并返回结果摘要，异常不会向外抛出。"""
+    players = [f"player{i}" for i in range(1, sum(spec.role_distribution.values()) + 1)]
+    config = deepcopy(base_config)
+    config.update(
+        {
+            "ROLE_DISTRIBUTION": dict(spec.role_distribution),
+            "SIMULATION_MODE": True,
+            "RANDOM_SEED": spec.seed,
+            "players": players,
+        }
+    )
+    result: Dict[str, Any] = {**asdict(spec), "cell": spec.cell, "winner": None, "rounds": 0, "error": None}
+    ai_service = _TimedAIService(_service_for(spec))
+    started = time.perf_counter()
+    try:
+        game = GameLoop(config, ai_service=ai_service)
+        game.initialize_game(players)
+        game.start_async()
+        game.wait_for_completion(timeout=game_timeout)
+        if game.is_running():
+            # 超时的对局（例如模型一直弃票导致无人出局）直接终止，不计入胜负
+            game.stop()
+            game.wait_for_completion()
+            result["error"] = "timeout"
+        outcome = game.match_outcome()
+        result.update(
+            match_id=game.match_id,
+            winner=outcome["winner"],
+            rounds=game.game_state["round_number"],
+            roles=outcome["roles"],
+            teams=outcome["teams"],
+        )
+    except Exception as exc:  # noqa: BLE001
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["duration"] = time.perf_counter() - started
+    result["latencies"] = ai_service.latencies
+    return result
+
+
+def run_tournament(
+    specs: List[MatchSpec],
+    base_config: Dict[str, Any],
+    *,
+    workers: Optional[int] = None,
+    game_timeout: Optional[float] = None,
+    quiet: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """并行运行全部对局，按完成顺序逐个产出结果。
+
+    workers 为 0 时在当前进程内依次运行（便于调试），否则使用 spawn 方式启动的进程池，
+    每个工作进程各自创建模型客户端，不继承父进程的连接。
+    """
+    if workers == 0:
+        with _quiet_logger(quiet):
+            for spec in specs:
+                yield run_match(spec, base_config, game_timeout)
+        return
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(quiet,)
+    ) as pool:
+        futures: List[Future] = [pool.submit(run_match, spec, base_config, game_timeout) for spec in specs]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+class TournamentReport:
+    """流式汇总对局结果：按角色配置与模型分组的阵营胜率、角色胜率、平均轮数与AI请求延迟分位数。"""
+
+    def __init__(self) -> None:
+        self._cells: Dict[str, _CellStats] = defaultdict(_CellStats)
+
+    def add(self, result: Dict[str, Any]) -> None:
+        stats = self._cells[result["cell"]]
+        stats.games += 1
+        stats.latencies.extend(result.get("latencies", []))
+        if result.get("error"):
+            stats.errors += 1
+            if result["error"] == "timeout":
+                stats.timeouts += 1
+            return
+        winner = result.get("winner")
+        stats.rounds += result.get("rounds", 0)
+        stats.wins[winner or "NONE"] += 1
+        teams = result.get("teams") or {}
+        for player_id, role in (result.get("roles") or {}).items():
+            stats.role_games[role] += 1
+            if winner and teams.get(player_id) == winner:
+                stats.role_wins[role] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {cell: self._summarize(stats) for cell, stats in sorted(self._cells.items())}
+
+    @staticmethod
+    def _summarize(stats: _CellStats) -> Dict[str, Any]:
+        completed = stats.games - stats.errors
+        latencies = sorted(stats.latencies)
+        return {
+            "games": stats.games,
+            "completed": completed,
+            "errors": stats.errors,
+            "timeouts": stats.timeouts,
+            "avg_rounds": stats.rounds / completed if completed else None,
+            "team_win_rate": {team: count / completed for team, count in sorted(stats.wins.items())},
+            "role_win_rate": {
+                role: stats.role_wins[role] / games for role, games in sorted(stats.role_games.items())
+            },
+            "latency_ms": {
+                "count": len(latencies),
+                **{f"p{q}": _percentile(latencies, q) * 1000 if latencies else None for q in (50, 90, 99)},
+            },
+        }
+
+
+class _TimedAIService:
+    """包装决策服务，记录每次AI请求的耗时（秒）。"""
+
+    def __init__(self, service: AIDecisionService) -> None:
+        self._service = service
+        self._lock = Lock()
+        self.latencies: List[float] = []
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._service, name)
+        if not callable(attr) or not name.startswith(("get_", "stream_")):
+            return attr
+        return self._timed(attr)
+
+    def _timed(self, method: Callable[..., Any]) -> Callable[..., Any]:
+        def call(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.latencies.append(elapsed)
+
+        return call
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩法求分位数，sorted_values 需已排序且非空。"""
+    rank = max(math.ceil(q / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _model_env(model: Dict[str, Any]) -> Dict[str, str]:
+    env = {env_key: str(model[key]) for key, env_key in _MODEL_ENV_KEYS.items() if model.get(key)}
+    env.update({key: str(value) for key, value in (model.get("env") or {}).items()})
+    return env
+
+
+def _service_for(spec: MatchSpec) -> AIDecisionService:
+    """按模型配置取本进程的决策服务，首次使用时在对应环境变量下创建。"""
+    key = tuple(sorted(spec.model_env.items()))
+    service = _WORKER_SERVICES.get(key)
+    if service is None:
+        with _patched_env(spec.model_env):
+            service = AIDecisionService()
+        _WORKER_SERVICES[key] = service
+    return service
+
+
+@contextmanager
+def _patched_env(values: Dict[str, str]) -> Iterator[None]:
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+@contextmanager
+def _quiet_logger(quiet: bool) -> Iterator[None]:
+    previous = logger.logger.level
+    if quiet:
+        logger.logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.logger.setLevel(previous)
+
+
+def _init_worker(quiet: bool) -> None:
+    # 成千上万局的逐阶段日志只会拖慢工作进程
+    if quiet:
+        logger.logger.setLevel(logging.WARNING)
@@ -0,0 +1,60 @@
+import pytest
+
+from services.ai_cache import CacheMissError, CompletionCache, RecordingChatClient, completion_key
+from services.ai_decision import AIDecisionService
+from services.mock_ai import MockChatClient
+
+
+def make_game_state():
+    players = [f"player{i}" for i in range(1, 5)]
+    return {
+        'alive_players': players,
+        'dead_players': [],
+        'round_number': 1,
+        'players': {pid: object() for pid in players},
+    }
+
+
+def request_kwargs(prompt, temperature=0.7):
+    return {
+        'model': 'm',
+        'messages': [{'role': 'system', 'content': 's'}, {'role': 'user', 'content': prompt}],
+        'temperature': temperature,
+        'max_tokens': 10,
+    }
+
+
+def test_completion_key_depends_on_sampling_parameters():
+    assert completion_key(request_kwargs('p')) == completion_key(request_kwargs('p'))
+    assert completion_key(request_kwargs('p')) != completion_key(request_kwargs('p', temperature=0.1))
+
+
+def test_record_then_replay_from_disk(tmp_path):
+    path = tmp_path / 'cache.jsonl'
+    recorder = RecordingChatClient(MockChatClient(seed='1'), CompletionCache(path), 'record')
+    recorded = recorder.chat.completions.create(**request_kwargs('你好'))
+
+    replayer = RecordingChatClient(None, CompletionCache(path), 'replay')
+    replayed = replayer.chat.completions.create(**request_kwargs('你好'))
+
+    assert replayed.choices[0].message.content == recorded.choices[0].message.content
+    with pytest.raises(CacheMissError):
+        replayer.chat.completions.create(**request_kwargs('没见过'))
+
+
+def test_service_replay_mode_never_builds_live_client(tmp_path, monkeypatch):
+    path = tmp_path / 'cache.jsonl'
+    game_state = make_game_state()
+    monkeypatch.setenv('AI_CACHE_PATH', str(path))
+    monkeypatch.setenv('AI_PROVIDER', 'mock')
+    monkeypatch.setenv('AI_CACHE_MODE', 'record')
+    recorded = AIDecisionService().get_player_action('player1', 'villager', game_state, 'DAY_VOTE')
+
+    monkeypatch.setenv('AI_PROVIDER', 'openai')
+    monkeypatch.setenv('AI_MODEL_NAME', 'mock')
+    monkeypatch.setenv('AI_CACHE_MODE', 'replay')
+    monkeypatch.setattr('services.ai_decision.OpenAI', None)
+    replay_service = AIDecisionService()
+
+    assert replay_service.get_player_action('player1', 'villager', game_state, 'DAY_VOTE') == recorded
+    assert replay_service.get_player_action('player2', 'villager', game_state, 'DAY_VOTE') == {'target_id': None}
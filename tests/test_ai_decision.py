@@ -1,6 +1,17 @@
+import asyncio
+
 import pytest
 
-from services.ai_decision import AIDecisionService
+from services.ai_decision import AIDecisionService, reset_client_registry
+from services.prompt_layout import PrefixReuseTracker
+from services.speech_context import SpeechContextBuilder
+
+
+@pytest.fixture(autouse=True)
+def clean_client_registry():
+    reset_client_registry()
+    yield
+    reset_client_registry()
 
 
 def make_service():
@@ -126,3 +137,67 @@ def test_init_custom_provider_sets_default_base_url(monkeypatch):
 
     assert captured_kwargs['api_key'] == 'not-needed'
     assert captured_kwargs['base_url'] == 'http://localhost:11434/v1'
+
+
+def test_services_share_client_for_same_endpoint(monkeypatch):
+    created = []
+
+    class DummyClient:
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+
+    monkeypatch.setenv('AI_PROVIDER', 'ollama')
+    monkeypatch.setenv('OPENAI_BASE_URL', 'http://gateway:8000/v1')
+    monkeypatch.setattr('services.ai_decision.OpenAI', DummyClient)
+
+    first = AIDecisionService()
+    second = AIDecisionService()
+    monkeypatch.setenv('OPENAI_BASE_URL', 'http://other:8000/v1')
+    third = AIDecisionService()
+
+    assert first.client is second.client
+    assert third.client is not first.client
+    assert len(created) == 2
+
+
+class DummyAsyncCompletions:
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return DummyResponse([self.content])
+
+
+class DummyAsyncClient:
+    def __init__(self, content):
+        self.chat = type('Chat', (), {})()
+        self.chat.completions = DummyAsyncCompletions(content)
+
+
+def test_async_action_and_speech_share_async_client():
+    service = make_service()
+    service.model = 'test-model'
+    service.speech_context = SpeechContextBuilder()
+    service.prefix_tracker = PrefixReuseTracker()
+    service._async_client = DummyAsyncClient('<think>x</think>{"target_id": "player2"}')
+    game_state = {
+        'alive_players': ['player1', 'player2'],
+        'dead_players': [],
+        'round_number': 1,
+        'players': {'player1': object(), 'player2': object()},
+    }
+
+    async def scenario():
+        return await asyncio.gather(
+            service.get_player_action_async('player1', 'villager', game_state, 'DAY_VOTE'),
+            service.get_player_speech_async('player1', 'villager', game_state),
+        )
+
+    decision, speech = asyncio.run(scenario())
+
+    assert decision == {'target_id': 'player2'}
+    assert speech == '{"target_id": "player2"}'
+    calls = service.async_client.chat.completions.calls
+    assert [call['max_tokens'] for call in calls] == [400, 4096]
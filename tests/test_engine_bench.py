@@ -0,0 +1,27 @@
+from bench.engine_bench import bench_size, compare, role_distribution
+
+
+def test_role_distribution_scales_with_lobby_size():
+    for size in (12, 50, 200):
+        distribution = role_distribution(size)
+        assert sum(distribution.values()) == size
+        assert distribution['werewolf'] == size // 4
+
+
+def test_bench_size_reports_throughput_phases_and_allocations():
+    result = bench_size(12, 1)
+
+    assert result['games_per_sec'] > 0
+    assert set(result['phase_ms_per_game']) == {'night', 'discussion', 'vote', 'other'}
+    assert result['router_ms_per_game'] > 0
+    assert result['peak_alloc_kb'] > 0
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    results = [{'players': 12, 'games_per_sec': 70.0}, {'players': 50, 'games_per_sec': 3.0}]
+    baseline = {'12': {'games_per_sec': 80.0}, '50': {'games_per_sec': 5.0}}
+
+    regressions = compare(results, baseline, tolerance=0.2)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith('50人局')
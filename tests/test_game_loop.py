@@ -0,0 +1,174 @@
+import copy
+import threading
+import time
+
+import pytest
+
+from config.game_config import PHASE_CONFIG, ROLE_COOLDOWNS
+from core.engine.config_validator import ConfigValidator
+from core.engine.game_loop import GameLoop
+from core.engine.phase_manager import GamePhase
+
+
+class StubAIService:
+    """替代真实 AIDecisionService，按玩家编号返回固定目标"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def get_player_action(self, player_id, role, game_state, phase):
+        with self._lock:
+            self.calls.append((player_id, role, phase))
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            alive = game_state['alive_players']
+            index = alive.index(player_id)
+            return {'target_id': alive[(index + 1) % len(alive)]}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def get_team_action(self, player_ids, role, game_state, phase):
+        with self._lock:
+            self.calls.append((tuple(player_ids), role, phase))
+        villagers = [pid for pid in game_state['alive_players'] if pid not in player_ids]
+        return {'target_id': villagers[0]}
+
+    def get_player_speech(self, player_id, role, game_state):
+        return f"{player_id} 过"
+
+
+def build_config(players, max_concurrency=1, wolf_pack_decision=False, **overrides):
+    config = {
+        'PHASE_CONFIG': copy.deepcopy(PHASE_CONFIG),
+        'ROLE_COOLDOWNS': copy.deepcopy(ROLE_COOLDOWNS),
+        'SEER_CONFIG': {'max_checks': 3, 'allow_self_check': False},
+        'ROLE_DISTRIBUTION': {'werewolf': 2, 'villager': len(players) - 2},
+        'WITCH_CONFIG': {'can_save_self': True},
+        'HUNTER_CONFIG': {'can_shoot_dead': True},
+        'GUARD_CONFIG': {'max_protects': 3},
+        'AI_CONFIG': {
+            'max_concurrency': max_concurrency,
+            'wolf_pack_decision': wolf_pack_decision,
+        },
+        'players': players,
+    }
+    config.update(overrides)
+    return config
+
+
+@pytest.fixture
+def make_game(monkeypatch):
+    def _make(players, *, max_concurrency=1, wolf_pack_decision=False, ai_service=None, **overrides):
+        service = ai_service or StubAIService()
+        monkeypatch.setattr('core.engine.game_loop.AIDecisionService', lambda: service)
+        game = GameLoop(build_config(players, max_concurrency, wolf_pack_decision, **overrides))
+        game.initialize_game(players)
+        game.game_state['current_phase'] = GamePhase.DAY_VOTE
+        return game, service
+
+    return _make
+
+
+def test_vote_phase_collects_concurrently_and_counts_in_seat_order(make_game):
+    players = [f"player{i}" for i in range(1, 7)]
+    game, service = make_game(players, max_concurrency=6, ai_service=StubAIService(delay=0.05))
+
+    game._handle_vote_phase()
+
+    assert service.max_in_flight > 1
+    assert list(game.vote_manager.votes) == players
+
+
+def test_vote_phase_serial_when_concurrency_is_one(make_game):
+    players = [f"player{i}" for i in range(1, 5)]
+    game, service = make_game(players, max_concurrency=1, ai_service=StubAIService(delay=0.01))
+
+    game._handle_vote_phase()
+
+    assert service.max_in_flight == 1
+    assert [call[0] for call in service.calls] == players
+
+
+def werewolf_ids(game):
+    return [pid for pid, player in game.players.items() if player.role.get_role_name() == 'werewolf']
+
+
+def test_night_phase_wolves_decide_concurrently(make_game):
+    players = [f"player{i}" for i in range(1, 7)]
+    game, service = make_game(players, max_concurrency=4, ai_service=StubAIService(delay=0.05))
+    wolves = werewolf_ids(game)
+
+    game._handle_night_phase()
+
+    wolf_calls = [call for call in service.calls if call[1] == 'werewolf']
+    assert sorted(call[0] for call in wolf_calls) == sorted(wolves)
+    assert service.max_in_flight == len(wolves)
+
+
+def test_night_phase_pack_mode_issues_single_request(make_game):
+    players = [f"player{i}" for i in range(1, 7)]
+    game, service = make_game(players, wolf_pack_decision=True)
+    wolves = werewolf_ids(game)
+    expected_victim = [pid for pid in players if pid not in wolves][0]
+
+    game._handle_night_phase()
+
+    assert service.calls == [(tuple(wolves), 'werewolf', 'NIGHT')]
+    assert expected_victim in game.game_state['dead_players']
+
+
+def test_simulation_mode_runs_full_game_without_phase_sleeps(make_game):
+    players = [f"player{i}" for i in range(1, 7)]
+    game, _ = make_game(players, SIMULATION_MODE=True)
+
+    started = time.monotonic()
+    game.run()
+
+    assert time.monotonic() - started < 2
+    assert game.phase_manager.current_phase == GamePhase.GAME_OVER
+
+
+def test_zero_duration_rejected_outside_simulation_mode():
+    players = [f"player{i}" for i in range(1, 5)]
+    config = build_config(players)
+    config['PHASE_CONFIG'][GamePhase.NIGHT]['duration'] = 0
+
+    with pytest.raises(ValueError):
+        ConfigValidator.validate(config)
+
+    config['SIMULATION_MODE'] = True
+    assert ConfigValidator.validate(config) is True
+
+
+def test_generated_seed_is_saved_and_replay_reproduces_roles(tmp_path):
+    from services.game_controller import GameController
+    from services.game_state_store import GameStateStore
+
+    players = [f"player{i}" for i in range(1, 7)]
+    store = GameStateStore()
+    controller = GameController(
+        base_config=build_config(players, SIMULATION_MODE=True),
+        players=players,
+        state_store=store,
+        save_dir=tmp_path,
+        ai_service=StubAIService(),
+    )
+    original = controller.start()
+    controller.wait_for_completion()
+    saved = controller.save(match_id=original['match_id'])
+
+    replayed = controller.replay(saved['filename'])
+    controller.wait_for_completion()
+
+    first, second = store.get_match(original['match_id']), store.get_match(replayed['match_id'])
+    assert isinstance(original['seed'], int)
+    assert first['seed'] == second['seed'] == original['seed'] == replayed['seed']
+    assert first['roles'] == second['roles']
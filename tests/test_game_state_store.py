@@ -0,0 +1,230 @@
+import threading
+
+import pytest
+
+from services.game_state_store import GameStateStore
+
+
+def make_store():
+    store = GameStateStore()
+    store.start_match(['player1', 'player2'])
+    return store
+
+
+def test_streaming_speech_is_visible_before_completion():
+    store = make_store()
+
+    index = store.begin_speech(player_id='player1', role='seer', round_number=1, phase='DAY_DISCUSSION')
+    store.update_speech(index, '我是')
+    partial = store.get_match()['speech_log'][index]
+    store.update_speech(index, '我是预言家', final=True)
+    final = store.get_match()['speech_log'][index]
+
+    assert partial['content'] == '我是'
+    assert partial['status'] == 'streaming'
+    assert final['content'] == '我是预言家'
+    assert final['status'] == 'final'
+
+
+def record(store, content, player_id='player1'):
+    store.record_speech(
+        player_id=player_id, role='villager', content=content, round_number=1, phase='DAY_DISCUSSION'
+    )
+
+
+def test_log_since_returns_only_new_entries():
+    store = make_store()
+    record(store, '第一句')
+    cursor = store.get_log_since(store.active_match_id, 0)['cursor']
+    record(store, '第二句')
+    store.record_system_event(content='天黑了', channel='phase_change')
+
+    delta = store.get_log_since(store.active_match_id, cursor)
+
+    assert [entry['content'] for entry in delta['entries']] == ['第二句', '天黑了']
+    assert delta['cursor'] > cursor
+    assert store.get_log_since(store.active_match_id, delta['cursor'])['entries'] == []
+
+
+def test_log_since_includes_entries_updated_after_cursor():
+    store = make_store()
+    index = store.begin_speech(player_id='player1', role='seer', round_number=1, phase='DAY_DISCUSSION')
+    record(store, '后来的发言', player_id='player2')
+    cursor = store.get_log_since(store.active_match_id, 0)['cursor']
+
+    store.update_speech(index, '我是预言家', final=True)
+    delta = store.get_log_since(store.active_match_id, cursor)
+
+    assert [(entry['seq'], entry['content']) for entry in delta['entries']] == [(1, '我是预言家')]
+
+
+def test_import_assigns_sequence_numbers_to_legacy_logs():
+    store = GameStateStore()
+    match_id = store.import_match({'speech_log': [{'content': 'a'}, {'content': 'b'}]})
+
+    delta = store.get_log_since(match_id, 1)
+
+    assert [entry['content'] for entry in delta['entries']] == ['b']
+    assert delta['cursor'] == 2
+    assert store.get_log_since('missing', 0) is None
+
+
+def test_wait_for_update_wakes_on_phase_change_and_times_out():
+    store = make_store()
+    cursor = store.get_log_since(store.active_match_id, 0)['cursor']
+
+    assert store.wait_for_update(store.active_match_id, cursor, timeout=0.01) is False
+
+    threading.Timer(0.05, store.set_phase, args=('NIGHT', 1)).start()
+
+    assert store.wait_for_update(store.active_match_id, cursor, timeout=5) is True
+    assert store.get_log_since(store.active_match_id, cursor)['phase'] == 'NIGHT'
+
+
+def test_readers_get_stable_snapshots_without_copying_entries():
+    store = make_store()
+    record(store, '第一句')
+    snapshot = store.get_match()
+
+    record(store, '第二句')
+    store.set_phase('NIGHT', 1)
+
+    assert [entry['content'] for entry in snapshot['speech_log']] == ['第一句']
+    assert snapshot['phase'] is None
+    assert store.get_match()['speech_log'][0] is snapshot['speech_log'][0]
+
+
+def test_streaming_update_does_not_mutate_published_entry():
+    store = make_store()
+    index = store.begin_speech(player_id='player1', role='seer', round_number=1, phase='DAY_DISCUSSION')
+    published = store.get_log_since(store.active_match_id, 0)['entries'][0]
+
+    store.update_speech(index, '我是预言家', final=True)
+
+    assert published['content'] == ''
+    assert store.get_match()['speech_log'][index]['content'] == '我是预言家'
+
+
+def play_finished_match(store, speeches=1):
+    match_id = store.start_match(['player1', 'player2'])
+    for i in range(speeches):
+        record(store, f'发言{i}')
+    store.finish_match(match_id)
+    return match_id
+
+
+def test_finished_matches_beyond_limit_are_spilled_and_reloaded(tmp_path):
+    store = GameStateStore(spill_dir=tmp_path, max_matches=2)
+    first = play_finished_match(store)
+    second = play_finished_match(store)
+    store.get_match(first)  # first 最近被访问，应优先换出 second
+    third = play_finished_match(store)
+
+    assert (tmp_path / f'{second}.json').exists()
+    assert not (tmp_path / f'{first}.json').exists()
+    assert [match['match_id'] for match in store.list_matches()] == [first, second, third]
+    assert store.match_version(second) == 2
+
+    reloaded = store.get_match(second)
+
+    assert [entry['content'] for entry in reloaded['speech_log']] == ['发言0']
+    assert store.get_log_since(second, 1)['cursor'] == 2
+
+
+def test_entry_limit_never_evicts_running_match(tmp_path):
+    store = GameStateStore(spill_dir=tmp_path, max_entries=3)
+    finished = play_finished_match(store, speeches=2)
+    running = store.start_match(['player1', 'player2'])
+    for i in range(3):
+        record(store, f'进行中{i}')
+    store.set_phase('NIGHT', 2)
+
+    assert (tmp_path / f'{finished}.json').exists()
+    assert len(store.get_match(running)['speech_log']) == 3
+
+
+def test_retention_limits_require_spill_dir():
+    with pytest.raises(ValueError):
+        GameStateStore(max_matches=1)
+
+
+def import_at(store, match_id, created_at, **extra):
+    return store.import_match({'match_id': match_id, 'created_at': created_at, **extra})
+
+
+def test_page_matches_walks_newest_first_with_cursor():
+    store = GameStateStore()
+    for day in range(1, 6):
+        import_at(store, f'm{day}', f'2026-01-0{day}T00:00:00+00:00')
+
+    first = store.page_matches(limit=2)
+    second = store.page_matches(limit=2, cursor=first['next_cursor'])
+    last = store.page_matches(limit=2, cursor=second['next_cursor'])
+
+    assert [m['match_id'] for m in first['matches']] == ['m5', 'm4']
+    assert [m['match_id'] for m in second['matches']] == ['m3', 'm2']
+    assert [m['match_id'] for m in last['matches']] == ['m1']
+    assert last['next_cursor'] is None
+
+
+def test_page_matches_filters_by_status_phase_and_created_range():
+    store = GameStateStore()
+    import_at(store, 'old', '2026-01-01T00:00:00+00:00', finished_at='x', phase='DAY_VOTE')
+    import_at(store, 'mid', '2026-01-02T00:00:00+00:00', phase='NIGHT')
+    import_at(store, 'new', '2026-01-03T00:00:00+00:00', finished_at='x', phase='NIGHT')
+
+    def ids(**filters):
+        return [m['match_id'] for m in store.page_matches(**filters)['matches']]
+
+    assert ids(status='finished') == ['new', 'old']
+    assert ids(phase='NIGHT', status='in_progress') == ['mid']
+    assert ids(created_after='2026-01-01T00:00:00+00:00', created_before='2026-01-03T00:00:00+00:00') == ['mid']
+    with pytest.raises(ValueError):
+        store.page_matches(cursor='garbage')
+
+
+def test_writes_with_explicit_match_id_target_that_match():
+    store = make_store()
+    first = store.active_match_id
+    second = store.start_match(['player3', 'player4'])
+
+    store.record_speech(
+        player_id='player1', role='villager', content='给第一局', round_number=1, phase='DAY_DISCUSSION',
+        match_id=first,
+    )
+    store.set_phase('NIGHT', 2, match_id=first)
+    record(store, '给当前对局', player_id='player3')
+
+    assert [entry['content'] for entry in store.get_match(first)['speech_log']] == ['给第一局']
+    assert store.get_match(first)['phase'] == 'NIGHT'
+    assert [entry['content'] for entry in store.get_match(second)['speech_log']] == ['给当前对局']
+
+
+def test_concurrent_finishes_spill_each_victim_once(tmp_path, monkeypatch):
+    from services import game_state_store
+
+    failures = []
+    monkeypatch.setattr(game_state_store.logger, 'exception', failures.append)
+    store = GameStateStore(spill_dir=tmp_path, max_matches=1)
+    match_ids = [store.start_match(['player1', 'player2']) for _ in range(8)]
+    for match_id in match_ids:
+        store.record_speech(
+            player_id='player1', role='villager', content=match_id, round_number=1, phase='DAY_DISCUSSION',
+            match_id=match_id,
+        )
+    barrier = threading.Barrier(len(match_ids))
+
+    def finish(match_id):
+        barrier.wait()
+        store.finish_match(match_id)
+
+    threads = [threading.Thread(target=finish, args=(match_id,)) for match_id in match_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    assert not list(tmp_path.glob('*.tmp'))
+    for match_id in match_ids:
+        assert store.get_match(match_id)['speech_log'][0]['content'] == match_id
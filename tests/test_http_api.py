@@ -0,0 +1,224 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+from interfaces.http.api import create_app
+from services.game_state_store import GameStateStore
+from services.match_archive import MatchArchive
+
+
+@pytest.fixture
+def store():
+    store = GameStateStore()
+    store.start_match(['player1', 'player2'])
+    return store
+
+
+@pytest.fixture
+def client(store, tmp_path):
+    app = create_app(store, tmp_path)
+    return app.test_client()
+
+
+def record(store, content):
+    store.record_speech(
+        player_id='player1', role='villager', content=content, round_number=1, phase='DAY_DISCUSSION'
+    )
+
+
+def test_speech_log_after_returns_delta(client, store):
+    record(store, '第一句')
+    cursor = client.get(f"/api/matches/{store.active_match_id}/speech-log").get_json()['last_seq']
+    record(store, '第二句')
+
+    delta = client.get(f"/api/matches/{store.active_match_id}/speech-log?after={cursor}").get_json()
+
+    assert [entry['content'] for entry in delta['entries']] == ['第二句']
+    assert client.get(f"/api/matches/{store.active_match_id}/speech-log?after=x").status_code == 400
+
+
+def test_event_stream_pushes_updates_after_last_event_id(client, store):
+    record(store, '旧发言')
+    cursor = store.get_log_since(store.active_match_id, 0)['cursor']
+
+    threading.Timer(0.05, record, args=(store, '新发言')).start()
+    response = client.get(
+        f"/api/matches/{store.active_match_id}/events",
+        headers={'Last-Event-ID': str(cursor)},
+        buffered=False,
+    )
+    event = next(iter(response.response))
+    event = event.decode('utf-8') if isinstance(event, bytes) else event
+    response.close()
+
+    lines = dict(line.split(': ', 1) for line in event.strip().splitlines())
+    payload = json.loads(lines['data'])
+    assert response.mimetype == 'text/event-stream'
+    assert lines['event'] == 'update'
+    assert int(lines['id']) == payload['cursor'] > cursor
+    assert [entry['content'] for entry in payload['entries']] == ['新发言']
+
+
+def test_event_stream_unknown_match_returns_404(client):
+    assert client.get('/api/matches/missing/events').status_code == 404
+
+
+def test_speech_log_answers_matching_etag_with_304(client, store):
+    url = f"/api/matches/{store.active_match_id}/speech-log"
+    record(store, '第一句')
+    first = client.get(url)
+
+    cached = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    record(store, '第二句')
+    changed = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_match_list_etag_ignores_speeches_but_tracks_phase(client, store):
+    etag = client.get('/api/matches').headers['ETag']
+
+    record(store, '不影响列表')
+    unchanged = client.get('/api/matches', headers={'If-None-Match': etag})
+    store.set_phase('NIGHT', 1)
+    changed = client.get('/api/matches', headers={'If-None-Match': etag})
+
+    assert unchanged.status_code == 304
+    assert changed.status_code == 200
+    assert changed.get_json()['matches'][0]['phase'] == 'NIGHT'
+
+
+def test_archive_endpoints_require_archive_and_validate_params(client, store, tmp_path):
+    assert client.get('/api/archive/stats/roles').status_code == 503
+
+    archive_client = create_app(store, tmp_path, archive=MatchArchive(tmp_path / 'archive.sqlite3')).test_client()
+
+    assert archive_client.get('/api/archive/matches?limit=x').status_code == 400
+    assert archive_client.get('/api/archive/matches').get_json() == {'matches': []}
+
+
+def test_match_list_is_paginated_and_rejects_bad_cursor(client, store):
+    store.start_match(['player3'])
+
+    page = client.get('/api/matches?limit=1').get_json()
+    rest = client.get(f"/api/matches?limit=1&cursor={page['next_cursor']}").get_json()
+
+    assert page['matches'][0]['match_id'] == store.active_match_id
+    assert len(rest['matches']) == 1
+    assert rest['next_cursor'] is None
+    assert client.get('/api/matches?cursor=bad').status_code == 400
+
+
+def test_large_json_responses_are_gzipped_when_accepted(store, tmp_path):
+    app = create_app(store, tmp_path, compress_min_size=100)
+    client = app.test_client()
+    for i in range(20):
+        record(store, f'第{i}句发言')
+    url = f"/api/matches/{store.active_match_id}/speech-log"
+
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    plain = client.get(url)
+
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+    assert 'Content-Encoding' not in plain.headers
+
+
+def test_event_stream_ends_after_max_duration(store, tmp_path):
+    client = create_app(store, tmp_path, compress_min_size=0, sse_max_duration=0.05).test_client()
+
+    response = client.get(f"/api/matches/{store.active_match_id}/events?after=999")
+    body = response.get_data(as_text=True)
+
+    assert body.startswith('retry: 1000')
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_game_pool_routes_report_games_and_404_unknown_match(store, tmp_path):
+    from services.game_controller import GameController
+
+    controller = GameController(
+        base_config={}, players=['player1', 'player2'], state_store=store, save_dir=tmp_path,
+        max_concurrent_games=3,
+    )
+    pool_client = create_app(store, tmp_path, controller=controller).test_client()
+
+    listing = pool_client.get('/api/games').get_json()
+
+    assert listing == {'games': [], 'running_games': 0, 'max_concurrent_games': 3}
+    assert pool_client.get('/api/games/missing/status').status_code == 404
+    assert pool_client.post('/api/games/missing/pause').status_code == 404
+    assert pool_client.post('/api/games/missing/explode').status_code == 404
+
+
+def test_save_preview_and_load_reject_paths_outside_save_dir(store, tmp_path):
+    from services.game_controller import GameController
+
+    save_dir = tmp_path / 'saves'
+    (tmp_path / 'secret.json').write_text(json.dumps({'match_id': 'secret', 'speech_log': []}), encoding='utf-8')
+    controller = GameController(base_config={}, players=['player1'], state_store=store, save_dir=save_dir)
+    pool_client = create_app(store, tmp_path, controller=controller).test_client()
+
+    assert pool_client.get('/api/game/saves/..%2Fsecret.json/preview').status_code == 404
+    for filename in ('../secret.json', str(tmp_path / 'secret.json')):
+        with pytest.raises(ValueError):
+            controller.preview(filename)
+        with pytest.raises(ValueError):
+            controller.load(filename)
+        assert pool_client.post('/api/game/load', json={'filename': filename}).status_code == 400
+        assert pool_client.post('/api/game/save', json={'filename': filename}).status_code == 400
+
+
+def test_event_stream_closes_after_match_finishes(client, store):
+    record(store, '最后一句')
+    store.finish_match(store.active_match_id, outcome={'winner': 'VILLAGER'})
+
+    body = client.get(f"/api/matches/{store.active_match_id}/events").get_data(as_text=True)
+    events = [dict(line.split(': ', 1) for line in chunk.splitlines()) for chunk in body.strip().split('\n\n')]
+
+    assert [event['event'] for event in events] == ['update', 'end']
+    assert json.loads(events[0]['data'])['finished_at'] is not None
+    assert events[1]['id'] == events[0]['id']
+
+
+def test_event_stream_rejects_subscribers_beyond_limit(store, tmp_path):
+    client = create_app(store, tmp_path, sse_max_duration=5, sse_max_streams=1).test_client()
+    url = f"/api/matches/{store.active_match_id}/events"
+
+    first = client.get(url, buffered=False)
+    rejected = client.get(url, buffered=False)
+    first.close()
+    again = client.get(url, buffered=False)
+    again.close()
+
+    assert first.status_code == 200
+    assert rejected.status_code == 503
+    assert again.status_code == 200
+
+
+def test_prefix_reuse_endpoint_reports_controller_ai_stats(client, store, tmp_path):
+    from types import SimpleNamespace
+
+    from services.game_controller import GameController
+    from services.prompt_layout import PrefixReuseTracker
+
+    tracker = PrefixReuseTracker()
+    tracker.observe('m1', 'action', 'abcX')
+    tracker.observe('m1', 'action', 'abcY')
+    controller = GameController(
+        base_config={}, players=['player1'], state_store=store, save_dir=tmp_path / 'saves',
+        ai_service=SimpleNamespace(prefix_tracker=tracker),
+    )
+    stats_client = create_app(store, tmp_path, controller=controller).test_client()
+
+    kinds = stats_client.get('/api/ai/prefix-reuse').get_json()['kinds']
+
+    assert kinds['action']['reused_chars'] == 3
+    assert kinds['action']['total_chars'] == 8
+    assert client.get('/api/ai/prefix-reuse').status_code == 503
@@ -0,0 +1,64 @@
+from services.game_state_store import GameStateStore
+from services.match_archive import MatchArchive
+
+
+def play_archived_match(store, winner):
+    match_id = store.start_match(['player1', 'player2', 'player3'])
+    store.set_phase('DAY_DISCUSSION', 1)
+    store.record_speech(
+        player_id='player1', role='seer', content='我查验了player3', round_number=1, phase='DAY_DISCUSSION'
+    )
+    store.set_phase('DAY_VOTE', 1)
+    store.record_system_event(
+        content='player1 投票给了 player3', channel='vote', round_number=1, phase='DAY_VOTE',
+        metadata={'from': 'player1', 'to': 'player3'},
+    )
+    store.update_players(['player1', 'player2'], ['player3'])
+    store.finish_match(match_id, outcome={
+        'winner': winner,
+        'roles': {'player1': 'seer', 'player2': 'villager', 'player3': 'werewolf'},
+        'teams': {'player1': 'VILLAGER', 'player2': 'VILLAGER', 'player3': 'WEREWOLF'},
+    })
+    return match_id
+
+
+def test_finished_match_is_archived_with_indexed_entries(tmp_path):
+    archive = MatchArchive(tmp_path / 'archive.sqlite3')
+    store = GameStateStore(archive=archive)
+    match_id = play_archived_match(store, 'VILLAGER')
+
+    [match] = archive.list_matches()
+    votes = archive.get_entries(match_id, channel='vote')
+
+    assert match['match_id'] == match_id
+    assert match['winner'] == 'VILLAGER'
+    assert [(entry['player_id'], entry['target_id']) for entry in votes] == [('player1', 'player3')]
+    assert votes[0]['metadata'] == {'from': 'player1', 'to': 'player3'}
+    assert [entry['content'] for entry in archive.get_entries(match_id, player_id='player1', round_number=1)] == [
+        '我查验了player3', 'player1 投票给了 player3',
+    ]
+
+
+def test_role_win_rates_and_vote_patterns_aggregate_matches(tmp_path):
+    archive = MatchArchive(tmp_path / 'archive.sqlite3')
+    store = GameStateStore(archive=archive)
+    play_archived_match(store, 'VILLAGER')
+    play_archived_match(store, 'WEREWOLF')
+
+    rates = {row['role']: row for row in archive.role_win_rates()}
+
+    assert rates['seer']['games'] == 2
+    assert rates['seer']['win_rate'] == 0.5
+    assert rates['werewolf']['wins'] == 1
+    assert archive.vote_patterns() == [{'voter_role': 'seer', 'target_role': 'werewolf', 'votes': 2}]
+
+
+def test_archiving_same_match_twice_replaces_rows(tmp_path):
+    archive = MatchArchive(tmp_path / 'archive.sqlite3')
+    store = GameStateStore(archive=archive)
+    match_id = play_archived_match(store, 'VILLAGER')
+
+    archive.archive_match(store.get_match(match_id))
+
+    assert len(archive.list_matches()) == 1
+    assert len(archive.get_entries(match_id)) == 2
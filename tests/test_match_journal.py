@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+from services.game_state_store import GameStateStore
+from services.match_journal import MatchJournal
+
+
+def play_short_match(store):
+    match_id = store.start_match(['player1', 'player2'], seed=7)
+    store.set_phase('DAY_DISCUSSION', 1)
+    store.record_speech(
+        player_id='player1', role='villager', content='我是好人', round_number=1, phase='DAY_DISCUSSION'
+    )
+    index = store.begin_speech(player_id='player2', role='seer', round_number=1, phase='DAY_DISCUSSION')
+    store.update_speech(index, '我是')
+    store.update_speech(index, '我是预言家', final=True)
+    store.update_players(['player2'], ['player1'])
+    return match_id
+
+
+def test_recover_rebuilds_match_from_journal(tmp_path):
+    store = GameStateStore(journal=MatchJournal(tmp_path, fsync='always'))
+    match_id = play_short_match(store)
+    store.finish_match(match_id)
+    expected = store.get_match(match_id)
+
+    recovered_store = GameStateStore(journal=MatchJournal(tmp_path))
+
+    assert recovered_store.recover() == [match_id]
+    assert recovered_store.get_match(match_id) == expected
+    assert recovered_store.active_match_id is None
+
+
+def test_recover_skips_truncated_tail_of_unfinished_match(tmp_path):
+    journal = MatchJournal(tmp_path, fsync='never')
+    store = GameStateStore(journal=journal)
+    match_id = play_short_match(store)
+    journal.close(match_id)
+    with journal.path_for(match_id).open('a', encoding='utf-8') as fp:
+        fp.write('{"type": "entry", "entry": {"cont')
+
+    recovered = GameStateStore(journal=MatchJournal(tmp_path))
+    recovered.recover()
+    match = recovered.get_match(match_id)
+
+    assert [entry['content'] for entry in match['speech_log']] == ['我是好人', '我是预言家']
+    assert match['dead_players'] == ['player1']
+    # 中断时未结束的对局恢复后标记为 interrupted 并结束，之后可以被换出
+    assert match['finished_at'] is not None
+    assert match['interrupted'] is True
+    assert match['seed'] == 7
+
+
+def test_imported_saves_are_not_journaled_or_recovered(tmp_path):
+    store = GameStateStore(journal=MatchJournal(tmp_path))
+    match_id = store.import_match({
+        'match_id': 'saved', 'speech_log': [{'content': 'a'}], 'winner': 'villagers',
+        'finished_at': '2025-01-01T00:00:00+00:00',
+    })
+
+    assert store.get_match(match_id)['winner'] == 'villagers'
+    assert not list(tmp_path.glob('*.jsonl'))
+
+    recovered = GameStateStore(journal=MatchJournal(tmp_path))
+
+    assert recovered.recover() == []
+    assert recovered.get_match(match_id) is None
+
+
+def test_journal_rejects_unknown_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        MatchJournal(tmp_path, fsync='sometimes')
+
+
+def test_appended_records_reach_the_file_before_close(tmp_path):
+    journal = MatchJournal(tmp_path, fsync='never')
+
+    journal.append('m1', {'type': 'start'})
+
+    assert journal.path_for('m1').read_text(encoding='utf-8').strip() == '{"type":"start"}'
+    journal.close_all()
+
+
+def test_interval_policy_syncs_idle_files_in_background(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr('services.match_journal.os.fsync', synced.append)
+    journal = MatchJournal(tmp_path, fsync='interval', fsync_interval=0.05)
+
+    journal.append('m1', {'type': 'start'})
+    deadline = time.monotonic() + 2
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    journal.close_all()
+
+    assert synced
+
+
+def test_finished_matches_leave_no_journal_once_spilled_or_archived(tmp_path):
+    from services.match_archive import MatchArchive
+
+    journal_dir, spill_dir = tmp_path / 'journal', tmp_path / 'saves'
+    store = GameStateStore(journal=MatchJournal(journal_dir), spill_dir=spill_dir, max_matches=1)
+    first = play_short_match(store)
+    store.finish_match(first)
+    second = play_short_match(store)
+    store.finish_match(second)
+
+    assert sorted(path.stem for path in journal_dir.glob('*.jsonl')) == [second]
+    assert (spill_dir / f'{first}.json').exists()
+
+    archived_store = GameStateStore(
+        journal=MatchJournal(journal_dir), archive=MatchArchive(tmp_path / 'archive.sqlite3'),
+    )
+    third = play_short_match(archived_store)
+    archived_store.finish_match(third)
+
+    assert not (journal_dir / f'{third}.jsonl').exists()
+
+
+def test_restart_restores_spilled_matches_without_replaying_or_rewriting(tmp_path):
+    journal_dir, spill_dir = tmp_path / 'journal', tmp_path / 'saves'
+    store = GameStateStore(journal=MatchJournal(journal_dir), spill_dir=spill_dir, max_matches=1)
+    first = play_short_match(store)
+    store.finish_match(first)
+    second = play_short_match(store)
+    store.finish_match(second)
+    crashed = play_short_match(store)
+    spill_mtime = (spill_dir / f'{first}.json').stat().st_mtime_ns
+    # 只有进行中的对局还留有日志，已换出的对局日志已删除
+    assert [path.stem for path in journal_dir.glob('*.jsonl')] == [crashed]
+
+    restarted = GameStateStore(journal=MatchJournal(journal_dir), spill_dir=spill_dir, max_matches=1)
+    recovered = restarted.recover()
+
+    assert recovered == [crashed]
+    assert (spill_dir / f'{first}.json').stat().st_mtime_ns == spill_mtime
+    assert {match['match_id'] for match in restarted.list_matches()} == {first, second, crashed}
+    assert restarted.get_match(first)['speech_log'][0]['content'] == '我是好人'
+    assert restarted.get_match(crashed)['interrupted'] is True
+    assert len(restarted._matches) <= 1
+
+    again = GameStateStore(journal=MatchJournal(journal_dir), spill_dir=spill_dir, max_matches=1)
+    assert again.recover() == []
+    assert {match['match_id'] for match in again.list_matches()} == {first, second, crashed}
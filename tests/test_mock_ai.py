@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from services.ai_decision import AIDecisionService
+from services.mock_ai import MockChatClient, parse_latency
+
+
+def make_game_state():
+    players = [f"player{i}" for i in range(1, 7)]
+    return {
+        'alive_players': players,
+        'dead_players': [],
+        'round_number': 1,
+        'players': {pid: object() for pid in players},
+    }
+
+
+@pytest.fixture
+def mock_service(monkeypatch):
+    monkeypatch.setenv('AI_PROVIDER', 'mock')
+    monkeypatch.setenv('AI_MOCK_SEED', '42')
+    monkeypatch.delenv('AI_MOCK_LATENCY', raising=False)
+    return AIDecisionService()
+
+
+def test_mock_provider_returns_valid_non_self_target(mock_service):
+    game_state = make_game_state()
+
+    decision = mock_service.get_player_action('player1', 'villager', game_state, 'DAY_VOTE')
+
+    assert decision['target_id'] in game_state['alive_players']
+    assert decision['target_id'] != 'player1'
+
+
+def test_mock_provider_is_deterministic_for_same_seed(mock_service, monkeypatch):
+    game_state = make_game_state()
+    first = [mock_service.get_player_action(pid, 'villager', game_state, 'DAY_VOTE') for pid in game_state['alive_players']]
+    speech = mock_service.get_player_speech('player2', 'seer', game_state)
+
+    again = AIDecisionService()
+
+    assert [again.get_player_action(pid, 'villager', game_state, 'DAY_VOTE') for pid in game_state['alive_players']] == first
+    assert again.get_player_speech('player2', 'seer', game_state) == speech
+
+
+def test_mock_team_action_excludes_team_members(mock_service):
+    game_state = make_game_state()
+    wolves = ['player1', 'player2']
+
+    decision = mock_service.get_team_action(wolves, 'werewolf', game_state, 'NIGHT')
+
+    assert decision['target_id'] not in wolves
+
+
+def test_mock_client_abstain_rate_and_injected_latency():
+    samples = []
+
+    def latency(rng):
+        samples.append(rng)
+        return 0.0
+
+    client = MockChatClient(seed='1', abstain_rate=1.0, latency=latency)
+    prompt = '你是玩家 player1，角色是 villager。\n存活玩家: player1, player2\n回复文本格式: {"target_id": "playerX"}'
+
+    response = client.chat.completions.create(messages=[{'role': 'user', 'content': prompt}])
+
+    assert response.choices[0].message.content == '{"target_id": null}'
+    assert len(samples) == 1
+
+
+@pytest.mark.parametrize('spec, low, high', [
+    (None, 0.0, 0.0),
+    ('fixed:0.2', 0.2, 0.2),
+    ('uniform:0.1,0.3', 0.1, 0.3),
+])
+def test_parse_latency_specs(spec, low, high):
+    sampler = parse_latency(spec)
+
+    value = sampler(random.Random(0))
+
+    assert low <= value <= high
+
+
+def test_parse_latency_rejects_unknown_spec():
+    with pytest.raises(ValueError):
+        parse_latency('poisson:3')
+
+
+def test_stream_player_speech_reports_growing_visible_text(mock_service):
+    game_state = make_game_state()
+    deltas = []
+
+    speech = mock_service.stream_player_speech('player1', 'villager', game_state, on_delta=deltas.append)
+
+    assert deltas
+    assert deltas[-1] == speech
+    assert all(speech.startswith(delta) for delta in deltas)
+    assert speech == mock_service.get_player_speech('player1', 'villager', game_state)
+
+
+def test_visible_speech_hides_unfinished_reasoning():
+    assert AIDecisionService._visible_speech('<think>思考中') == ''
+    assert AIDecisionService._visible_speech('<think>想好了</think>发言') == '发言'
@@ -0,0 +1,59 @@
+from services.ai_decision import AIDecisionService
+from services.prompt_layout import PrefixReuseTracker, PromptLayout
+from services.speech_context import SpeechContextBuilder
+
+
+def make_service():
+    service = AIDecisionService.__new__(AIDecisionService)
+    service.speech_context = SpeechContextBuilder()
+    return service
+
+
+def make_game_state():
+    return {
+        'alive_players': ['player1', 'player2', 'player3'],
+        'dead_players': [],
+        'round_number': 2,
+        'speech_history': [
+            {'player_id': 'player1', 'role': 'seer', 'content': '我查验了player3', 'round': 2},
+        ],
+    }
+
+
+def test_layout_orders_public_before_private_and_instruction():
+    layout = PromptLayout(public=['公共'], private=['私有'], instruction=['指令'])
+
+    assert layout.render() == '公共\n\n私有\n\n指令'
+
+
+def test_consecutive_speakers_share_public_prefix():
+    service = make_service()
+    game_state = make_game_state()
+
+    first = service._build_speech_prompt('player2', 'villager', game_state)
+    second = service._build_speech_prompt('player3', 'werewolf', game_state)
+
+    shared = first[:first.index('你是玩家')]
+    assert second.startswith(shared)
+    assert '我查验了player3' in shared
+    assert 'werewolf' not in shared
+
+
+def test_prefix_reuse_tracker_reports_common_prefix():
+    tracker = PrefixReuseTracker()
+
+    assert tracker.observe('m1', 'speech', 'abcX') == 0
+    assert tracker.observe('m1', 'speech', 'abcY') == 3
+    assert tracker.stats()['speech']['reused_chars'] == 3
+    assert tracker.stats()['speech']['total_chars'] == 8
+
+
+def test_prefix_reuse_tracker_compares_only_within_the_same_match():
+    tracker = PrefixReuseTracker(max_keys=2)
+
+    tracker.observe('m1', 'speech', 'match1-a')
+    assert tracker.observe('m2', 'speech', 'match2-a') == 0
+    assert tracker.observe('m1', 'speech', 'match1-b') == len('match1-')
+    tracker.observe('m3', 'speech', 'match3-a')  # 超出 max_keys，淘汰最久未用的 m2
+
+    assert tracker.observe('m2', 'speech', 'match2-b') == 0
@@ -0,0 +1,55 @@
+import pytest
+
+from core.engine.roster import AliveRoster
+from modules.roles.seer import Seer
+from modules.roles.villager import Villager
+from modules.roles.werewolf import Werewolf
+
+
+def make_roster():
+    roster = AliveRoster(['p1', 'p2', 'p3', 'p4'])
+    for player_id, role_type in zip(roster, (Werewolf, Villager, Werewolf, Seer)):
+        roster.assign_role(player_id, role_type)
+    return roster
+
+
+def test_roster_reads_like_the_alive_list():
+    roster = make_roster()
+
+    assert roster == ['p1', 'p2', 'p3', 'p4']
+    assert 'p3' in roster and 'p9' not in roster
+    assert roster[1] == 'p2' and roster.index('p4') == 3
+    assert ', '.join(roster) == 'p1, p2, p3, p4'
+
+
+def test_discard_keeps_seat_order_and_role_index_in_sync():
+    roster = make_roster()
+
+    assert roster.discard('p1') is True
+    assert roster.discard('p1') is False
+    with pytest.raises(ValueError):
+        roster.remove('p1')
+
+    assert roster == ['p2', 'p3', 'p4']
+    assert roster.with_role(Werewolf) == ['p3']
+
+
+def test_reassigned_role_moves_player_between_buckets_in_seat_order():
+    roster = make_roster()
+
+    roster.assign_role('p2', Werewolf)
+
+    assert roster.with_role(Werewolf) == ['p1', 'p2', 'p3']
+    assert roster.with_role(Villager) == []
+
+
+def test_iteration_survives_deaths_mid_loop():
+    roster = make_roster()
+
+    seen = []
+    for player_id in roster:
+        seen.append(player_id)
+        roster.discard('p4')
+
+    assert seen == ['p1', 'p2', 'p3', 'p4']
+    assert len(roster) == 3
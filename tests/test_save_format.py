@@ -0,0 +1,73 @@
+import gzip
+import json
+
+import pytest
+
+from services.game_controller import GameController
+from services.game_state_store import GameStateStore
+from services.save_format import read_match, write_match
+
+
+def make_payload(entries=3):
+    return {
+        'match_id': 'm1',
+        'players': ['player1', 'player2'],
+        'phase': 'NIGHT',
+        'speech_log': [{'seq': i, 'content': f'发言{i}'} for i in range(1, entries + 1)],
+    }
+
+
+@pytest.mark.parametrize('name', ['match.json', 'match.jsonl.gz'])
+def test_round_trip_preserves_match(tmp_path, name):
+    payload = make_payload()
+
+    write_match(tmp_path / name, payload)
+
+    assert read_match(tmp_path / name) == payload
+    assert read_match(tmp_path / name, limit=1)['speech_log'] == payload['speech_log'][:1]
+
+
+def test_compressed_save_has_header_line_and_reads_prefix_only(tmp_path):
+    path = tmp_path / 'match.jsonl.gz'
+    write_match(path, make_payload())
+    with gzip.open(path, 'rt', encoding='utf-8') as fp:
+        lines = fp.read().splitlines()
+    # 破坏末尾条目：只读取前两条时不应解析到它
+    with gzip.open(path, 'wt', encoding='utf-8') as fp:
+        fp.write('\n'.join(lines[:-1] + ['{broken']) + '\n')
+
+    header = json.loads(lines[0])
+    preview = read_match(path, limit=2)
+
+    assert header['format'] == 'llm-lrs-match'
+    assert header['entry_count'] == 3
+    assert 'speech_log' not in header
+    assert [entry['seq'] for entry in preview['speech_log']] == [1, 2]
+    assert 'entry_count' not in preview
+
+
+def test_unknown_compressed_file_is_rejected(tmp_path):
+    path = tmp_path / 'other.jsonl.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as fp:
+        fp.write('{"hello": 1}\n')
+
+    with pytest.raises(ValueError):
+        read_match(path)
+
+
+def test_controller_saves_compressed_and_loads_back(tmp_path):
+    store = GameStateStore()
+    store.start_match(['player1', 'player2'])
+    store.record_speech(player_id='player1', role='villager', content='你好', round_number=1, phase='DAY_DISCUSSION')
+    controller = GameController(
+        base_config={}, players=['player1', 'player2'], state_store=store,
+        save_dir=tmp_path, save_format='jsonl.gz',
+    )
+
+    saved = controller.save()
+    loaded_id = controller.load(saved['filename'], activate=False)['match_id']
+
+    assert saved['filename'].endswith('.jsonl.gz')
+    assert controller.list_saves()[0]['format'] == 'jsonl.gz'
+    assert controller.preview(saved['filename'], limit=0)['speech_log'] == []
+    assert store.get_match(loaded_id)['speech_log'][0]['content'] == '你好'
@@ -0,0 +1,67 @@
+import pytest
+
+from services.speech_context import SpeechContextBuilder, estimate_tokens
+
+
+def speech(player_id, content, round_number):
+    return {'player_id': player_id, 'role': 'villager', 'content': content, 'round': round_number}
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens('狼人杀') == 3
+    assert estimate_tokens('abcdefgh') == 2
+
+
+def test_empty_history_yields_empty_context():
+    assert SpeechContextBuilder().build({'speech_history': [], 'round_number': 1}) == ''
+
+
+def test_recent_speeches_verbatim_and_older_folded_into_summary():
+    history = [speech(f"p{i}", f"第{i}条发言。后面还有很多补充内容", 1) for i in range(1, 6)]
+    builder = SpeechContextBuilder(max_tokens=1000, recent_count=2)
+
+    text = builder.build({'speech_history': history, 'round_number': 1})
+
+    assert '玩家p5(villager): 第5条发言。后面还有很多补充内容' in text
+    assert '玩家p4(villager)' in text
+    assert '玩家p1: 第1条发言' in text
+    assert '玩家p1(villager)' not in text
+
+
+def test_prompt_stays_within_budget_as_history_grows():
+    long_text = '我认为这个玩家很可疑' * 20
+    history = [speech(f"p{i}", long_text, 2) for i in range(1, 13)]
+    builder = SpeechContextBuilder(max_tokens=300, recent_count=6)
+
+    text = builder.build({'speech_history': history, 'round_number': 2})
+
+    assert estimate_tokens(text) <= 300 + 20
+    assert '玩家p12(villager)' in text
+
+
+def test_past_round_summaries_are_cached_in_game_state():
+    game_state = {
+        'speech_history': [speech('p1', '今天先听', 2)],
+        'speech_archive': [speech('p2', '我是预言家。查验p3是狼', 1)],
+        'round_number': 2,
+    }
+    builder = SpeechContextBuilder()
+
+    text = builder.build(game_state)
+    game_state['speech_archive'][0]['content'] = '已被修改'
+
+    assert '第1轮: 玩家p2: 我是预言家' in text
+    assert game_state['speech_summaries'] == {1: '玩家p2: 我是预言家'}
+    assert '我是预言家' in builder.build(game_state)
+
+
+def test_zero_recent_count_folds_every_speech_into_summary():
+    history = [speech(f"p{i}", f"第{i}条发言", 1) for i in range(1, 4)]
+    builder = SpeechContextBuilder(recent_count=0)
+
+    text = builder.build({'speech_history': history, 'round_number': 1})
+
+    assert '玩家p3: 第3条发言' in text
+    assert '(villager)' not in text
+    with pytest.raises(ValueError):
+        SpeechContextBuilder(recent_count=-1)
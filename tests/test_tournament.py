@@ -0,0 +1,55 @@
+import pytest
+
+from main import build_base_config
+from services.tournament import TournamentReport, expand_matrix, run_tournament
+
+SMALL = {'werewolf': 2, 'villager': 4}
+
+
+def test_expand_matrix_crosses_distributions_models_and_seeds():
+    specs = expand_matrix({
+        'role_distributions': {'small': SMALL, 'big': {'werewolf': 3, 'villager': 9}},
+        'models': [{'name': 'a', 'provider': 'mock'}, {'name': 'b', 'provider': 'mock', 'env': {'AI_MOCK_SEED': 7}}],
+        'games': 3,
+    })
+
+    assert len(specs) == 2 * 2 * 3
+    assert [spec.index for spec in specs] == list(range(12))
+    assert {spec.cell for spec in specs} == {'small/a', 'small/b', 'big/a', 'big/b'}
+    assert specs[3].model_env == {'AI_PROVIDER': 'mock', 'AI_MOCK_SEED': '7'}
+    with pytest.raises(ValueError):
+        expand_matrix({'models': [{'name': 'a'}], 'games': 1})
+
+
+def test_report_aggregates_team_role_rounds_and_latency():
+    report = TournamentReport()
+    base = {'cell': 'small/mock', 'error': None}
+    report.add({**base, 'winner': 'WEREWOLF', 'rounds': 2, 'latencies': [0.001, 0.003],
+                'roles': {'p1': 'werewolf', 'p2': 'villager'}, 'teams': {'p1': 'WEREWOLF', 'p2': 'VILLAGER'}})
+    report.add({**base, 'winner': 'VILLAGER', 'rounds': 4, 'latencies': [0.002],
+                'roles': {'p1': 'werewolf', 'p2': 'villager'}, 'teams': {'p1': 'WEREWOLF', 'p2': 'VILLAGER'}})
+    report.add({**base, 'error': 'timeout', 'latencies': [0.004]})
+
+    stats = report.summary()['small/mock']
+
+    assert (stats['games'], stats['completed'], stats['timeouts']) == (3, 2, 1)
+    assert stats['avg_rounds'] == 3
+    assert stats['team_win_rate'] == {'VILLAGER': 0.5, 'WEREWOLF': 0.5}
+    assert stats['role_win_rate'] == {'villager': 0.5, 'werewolf': 0.5}
+    assert stats['latency_ms']['count'] == 4
+    assert stats['latency_ms']['p50'] == pytest.approx(2.0)
+    assert stats['latency_ms']['p99'] == pytest.approx(4.0)
+
+
+def test_in_process_tournament_runs_mock_games_to_completion():
+    specs = expand_matrix({
+        'role_distributions': {'small': SMALL},
+        'models': [{'name': 'mock', 'provider': 'mock'}],
+        'seeds': [1, 2],
+    })
+
+    results = list(run_tournament(specs, build_base_config([], simulate=True), workers=0, game_timeout=30))
+
+    assert sorted(result['seed'] for result in results) == [1, 2]
+    assert all(result['error'] is None and result['winner'] for result in results)
+    assert all(result['latencies'] for result in results)
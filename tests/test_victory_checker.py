@@ -0,0 +1,58 @@
+import random
+
+from core.engine.victory_checker import Team, VictoryChecker
+
+
+def recount(checker):
+    """按存活玩家重新统计阵营人数，作为增量计数的对照。"""
+    counts = {team: 0 for team in Team}
+    for player_id in checker.alive_players:
+        counts[checker.players[player_id]] += 1
+    return counts
+
+
+def test_winner_tracks_kills_and_is_cached_until_roster_changes():
+    checker = VictoryChecker()
+    for player_id, team in [('w1', Team.WEREWOLF), ('v1', Team.VILLAGER), ('v2', Team.VILLAGER)]:
+        checker.register_player(player_id, team)
+
+    assert checker.check_victory() is None
+    checker.remove_player('v1')
+    assert checker.check_victory() is Team.WEREWOLF
+    assert checker.get_winner() is Team.WEREWOLF
+
+    checker.change_player_team('w1', Team.VILLAGER)
+    assert checker.get_winner() is Team.VILLAGER
+
+
+def test_reregistering_a_player_moves_them_between_teams():
+    checker = VictoryChecker()
+    for player_id, team in [('w1', Team.WEREWOLF), ('v1', Team.VILLAGER), ('v2', Team.VILLAGER)]:
+        checker.register_player(player_id, team)
+    checker.register_player('w1', Team.LOVERS)
+    checker.register_player('v1', Team.LOVERS)
+    checker.remove_player('v2')
+
+    assert checker.check_victory() is Team.LOVERS
+
+
+def test_incremental_counts_match_full_recount_under_random_changes():
+    rng = random.Random(7)
+    checker = VictoryChecker()
+    teams = [Team.WEREWOLF, Team.VILLAGER, Team.LOVERS, Team.NEUTRAL]
+    players = [f"player{i}" for i in range(30)]
+    for player_id in players:
+        checker.register_player(player_id, rng.choice(teams))
+
+    for _ in range(200):
+        player_id = rng.choice(players)
+        operation = rng.randrange(3)
+        if operation == 0:
+            checker.remove_player(player_id)
+        elif operation == 1:
+            checker.change_player_team(player_id, rng.choice(teams))
+        else:
+            checker.register_player(player_id, rng.choice(teams))
+        checker.check_victory()
+        expected = recount(checker)
+        assert all(checker._alive_counts[team] == expected[team] for team in Team)
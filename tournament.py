@@ -0,0 +1,81 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+from main import build_base_config
+from services.tournament import TournamentReport, expand_matrix, run_tournament
+from utils.logger import logger
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="狼人杀AI批量锦标赛：按配置矩阵并行跑多局并汇总结果")
+    parser.add_argument("matrix", type=Path, help="配置矩阵 JSON 文件（角色配置、模型、种子/局数）")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="工作进程数，默认等于CPU核数；0 表示在当前进程内依次运行",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("logs") / "tournament",
+        help="结果目录：results.jsonl 逐局写入，report.json 为汇总报告",
+    )
+    parser.add_argument(
+        "--game-timeout",
+        type=float,
+        default=120.0,
+        help="单局最长运行秒数，超时的对局终止并计为错误",
+    )
+    parser.add_argument("--verbose", action="store_true", help="保留每局的逐阶段日志")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with args.matrix.open("r", encoding="utf-8") as fp:
+        matrix = json.load(fp)
+    specs = expand_matrix(matrix)
+    base_config = build_base_config([], simulate=True)
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    report = TournamentReport()
+    started = time.monotonic()
+    logger.info(f"锦标赛开始：共 {len(specs)} 局")
+    with (args.output / "results.jsonl").open("w", encoding="utf-8") as results:
+        for done, result in enumerate(
+            run_tournament(
+                specs,
+                base_config,
+                workers=args.workers,
+                game_timeout=args.game_timeout,
+                quiet=not args.verbose,
+            ),
+            1,
+        ):
+            report.add(result)
+            # 逐局落盘，中途中断也保留已完成对局的结果；延迟明细只进汇总，不逐局写出
+            record = {key: value for key, value in result.items() if key != "latencies"}
+            results.write(json.dumps(record, ensure_ascii=False) + "\n")
+            results.flush()
+            if done % 50 == 0 or done == len(specs):
+                logger.info(f"已完成 {done}/{len(specs)} 局，用时 {time.monotonic() - started:.1f}s")
+
+    summary = report.summary()
+    with (args.output / "report.json").open("w", encoding="utf-8") as fp:
+        json.dump(summary, fp, ensure_ascii=False, indent=2)
+    for cell, stats in summary.items():
+        latency = stats['latency_ms']
+        percentiles = "/".join(
+            "-" if latency[key] is None else f"{latency[key]:.1f}" for key in ("p50", "p90", "p99")
+        )
+        logger.info(
+            f"{cell}: {stats['completed']}/{stats['games']} 局完成，平均 {stats['avg_rounds'] or 0:.1f} 轮，"
+            f"阵营胜率 {stats['team_win_rate']}，AI延迟 p50/p90/p99 = {percentiles} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -57,7 +57,11 @@ class GameLogger:
     def critical(self, message: str):
         """记录严重错误信息"""
         self.logger.critical(message)
-        
+
+    def exception(self, message: str):
+        """记录异常信息（附带堆栈）"""
+        self.logger.exception(message)
+
     def game_event(self, event_type: str, details: str):
         """记录游戏事件
         